@@ -0,0 +1,159 @@
+"""
+JWT authentication with a cached user lookup
+
+simplejwt loads the User row on every authenticated request. Here a compact
+snapshot of the user is cached in Redis under a per-user version, and in a
+small per-process LRU in front of it, so most requests cost one Redis GET
+and no query. Saving a user bumps its version (see signals.py), which makes
+every cached snapshot of that user unreachable at once.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from redis.exceptions import RedisError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from utils.redis_client import get_redis
+
+from .revocation import is_revoked
+
+import logging
+auth_logger = logging.getLogger('authentication')
+
+# Everything request handling needs; password, reset_token and last_login
+# stay deferred and are loaded on first access
+SNAPSHOT_FIELDS = (
+    'id', 'email', 'username', 'full_name', 'phone', 'gender', 'avatar', 'avatar_variants', 'avatar_pending',
+    'is_staff', 'is_superuser', 'is_active', 'is_deleted',
+)
+
+
+def version_key(user_id):
+    return f'auth:user-version:{user_id}'
+
+
+def snapshot_key(user_id, version):
+    return f'auth:user:{user_id}:{version}'
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU whose entries also expire after ``ttl`` seconds"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_snapshots = LRUCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_LOCAL_TTL)
+
+
+def invalidate_user(user_id):
+    """Make every cached snapshot of the user stale"""
+    try:
+        get_redis().incr(version_key(user_id))
+    except RedisError as e:
+        auth_logger.warning(f"Failed to invalidate cached user {user_id}: {str(e)}")
+
+
+def load_snapshot(user_id):
+    """Read the snapshot fields of a user from the database, or None"""
+    return get_user_model().objects.filter(pk=user_id).values(*SNAPSHOT_FIELDS).first()
+
+
+def get_user_snapshot(user_id):
+    """
+    Snapshot of a user from the local LRU, Redis or the database, in that order
+
+    Returns:
+        dict: Snapshot field values, or None if the user does not exist
+    """
+    client = get_redis()
+    version = client.get(version_key(user_id)) or '0'
+    key = snapshot_key(user_id, version)
+
+    snapshot = local_snapshots.get(key)
+    if snapshot is not None:
+        return snapshot
+
+    cached = client.get(key)
+    if cached is not None:
+        snapshot = json.loads(cached)
+    else:
+        snapshot = load_snapshot(user_id)
+        if snapshot is None:
+            return None
+        client.set(key, json.dumps(snapshot), ex=settings.AUTH_USER_CACHE_TTL)
+    local_snapshots.set(key, snapshot)
+    return snapshot
+
+
+def user_from_snapshot(snapshot):
+    """Build a User instance with only the snapshot fields loaded"""
+    User = get_user_model()
+    fields = [field.attname for field in User._meta.concrete_fields if field.attname in snapshot]
+    return User.from_db(DEFAULT_DB_ALIAS, fields, [snapshot[name] for name in fields])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that rejects revoked tokens and resolves the user from the snapshot cache"""
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_revoked(validated_token):
+            raise InvalidToken(_("Token has been revoked"))
+        return validated_token
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Revocation compares against the password hash, which is never cached
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        try:
+            snapshot = get_user_snapshot(user_id)
+        except RedisError as e:
+            auth_logger.warning(f"User cache unavailable, loading user {user_id} from the database: {str(e)}")
+            return super().get_user(validated_token)
+
+        if snapshot is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not snapshot['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user_from_snapshot(snapshot)
@@ -0,0 +1,130 @@
+"""
+Username and email availability filter
+
+A shared Redis Bloom filter holds every normalized username and email in
+use. A "definitely not present" answer means the identifier is free and the
+database is never asked; "possibly present" (or any Redis trouble, or a
+filter that has not been built yet) falls back to the indexed lookup.
+
+Identifiers are added when a user is saved and never removed, so freed or
+changed identifiers only cost an extra query until the next rebuild. The
+filter is rebuilt daily by beat, and a lookup that finds no filter (fresh
+deploy, flushed Redis) queues a rebuild at once.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from kombu.exceptions import OperationalError
+from redis.exceptions import RedisError
+
+from utils.bloom import RedisBloomFilter
+from utils.metrics import increment
+from utils.redis_client import get_redis
+
+auth_logger = logging.getLogger('authentication')
+
+BLOOM_KEY_PREFIX = 'auth:identifiers:bloom'
+BUILD_REQUESTED_KEY = f'{BLOOM_KEY_PREFIX}:build-requested'
+BUILD_REQUEST_TTL = 10 * 60
+
+
+def username_item(username):
+    return f'u:{username.strip().lower()}'
+
+
+def email_item(email):
+    return f'e:{email.strip().lower()}'
+
+
+def get_identifier_bloom():
+    return RedisBloomFilter(
+        get_redis(), BLOOM_KEY_PREFIX,
+        settings.AUTH_IDENTIFIER_BLOOM_CAPACITY, settings.AUTH_IDENTIFIER_BLOOM_ERROR_RATE
+    )
+
+
+def remember_user_identifiers(user):
+    """Add a saved user's username and email to the filter"""
+    if not settings.AUTH_IDENTIFIER_BLOOM:
+        return
+    items = [username_item(user.username)] if user.username else []
+    if user.email:
+        items.append(email_item(user.email))
+    try:
+        get_identifier_bloom().add(*items)
+    except RedisError as e:
+        auth_logger.warning(f"Identifier filter update failed for user {user.pk}: {str(e)}")
+
+
+def request_identifier_bloom_build():
+    """Queue a filter rebuild, at most once per BUILD_REQUEST_TTL across processes"""
+    try:
+        if not get_redis().set(BUILD_REQUESTED_KEY, 1, nx=True, ex=BUILD_REQUEST_TTL):
+            return
+        from .tasks import rebuild_identifier_filter
+        rebuild_identifier_filter.delay()
+    except (RedisError, OperationalError) as e:
+        auth_logger.warning(f"Failed to queue identifier filter build: {str(e)}")
+
+
+def identifier_in_use(username=None, email=None):
+    """
+    Whether the username or email is already taken (case-insensitive)
+
+    Returns:
+        bool: True if any given identifier belongs to a user
+    """
+    User = get_user_model()
+    checks = [(username_item(username), User.objects.by_username(username))] if username else []
+    if email:
+        checks.append((email_item(email), User.objects.by_email(email)))
+
+    if settings.AUTH_IDENTIFIER_BLOOM and checks:
+        redis_failed = False
+        try:
+            answers = get_identifier_bloom().might_contain(*[item for item, _ in checks])
+        except RedisError as e:
+            auth_logger.warning(f"Identifier filter lookup failed: {str(e)}")
+            answers, redis_failed = None, True
+        if answers is not None:
+            checks = [check for check, maybe in zip(checks, answers) if maybe]
+            increment('identifier_bloom_checks_total', result='maybe' if checks else 'absent')
+        elif not redis_failed:
+            request_identifier_bloom_build()
+
+    return any(queryset.exists() for _, queryset in checks)
+
+
+def rebuild_identifier_bloom(batch_size=5000):
+    """
+    Rebuild the filter from the user table
+
+    Users saved while the rebuild runs are added to the old key and would be
+    lost in the swap, so anything created past the scanned range is replayed
+    once the new filter is live.
+
+    Returns:
+        int: Number of identifiers added
+    """
+    User = get_user_model()
+    bloom = get_identifier_bloom()
+    last_id = User.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    def batches():
+        batch = []
+        for username, email in User.objects.filter(id__lte=last_id).values_list('username', 'email').iterator(
+            chunk_size=batch_size
+        ):
+            batch.append(username_item(username))
+            batch.append(email_item(email))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    count = bloom.rebuild(batches())
+    for user in User.objects.filter(id__gt=last_id).only('id', 'username', 'email'):
+        remember_user_identifiers(user)
+    return count
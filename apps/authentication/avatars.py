@@ -0,0 +1,166 @@
+"""
+Avatar processing pipeline
+
+Uploads are written to a staging path and recorded in ``User.avatar_pending``.
+Staged files always get STAGING_EXTENSION rather than the client's extension,
+so an unvalidated upload in public storage is never served as HTML or SVG;
+``tasks.process_avatar`` then validates the image, applies and strips EXIF
+orientation, crops it square and writes one WebP file per AVATAR_VARIANT_SIZES
+entry. The new files replace the old ones in a single conditional UPDATE that
+only matches while the staged upload is still the user's latest, so an older
+upload finishing late never overwrites a newer one.
+"""
+import logging
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .authentication import invalidate_user
+
+auth_logger = logging.getLogger('authentication')
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+STAGING_EXTENSION = '.upload'
+
+
+class InvalidAvatar(ValueError):
+    pass
+
+
+def stage_avatar(user, upload):
+    """
+    Store an uploaded avatar for background processing
+
+    Returns:
+        str: Storage name of the staged file
+    """
+    name = default_storage.save(f'avatars/staging/{user.pk}/{uuid.uuid4().hex}{STAGING_EXTENSION}', upload)
+    get_user_model().objects.filter(pk=user.pk).update(avatar_pending=name)
+    user.avatar_pending = name
+    transaction.on_commit(lambda: invalidate_user(user.pk))
+
+    from .tasks import process_avatar
+    transaction.on_commit(lambda: process_avatar.delay(user.pk, name))
+    return name
+
+
+def render_variants(source):
+    """
+    Decode an image and render the square WebP variants
+
+    Returns:
+        dict: size (as str) -> WebP bytes
+
+    Raises:
+        InvalidAvatar: If the file is not an allowed, sanely sized image
+    """
+    try:
+        with Image.open(source) as probe:
+            if probe.format not in ALLOWED_FORMATS:
+                raise InvalidAvatar(f"Unsupported image format: {probe.format}")
+            if probe.width * probe.height > settings.AVATAR_MAX_PIXELS:
+                raise InvalidAvatar(f"Image is too large: {probe.width}x{probe.height}")
+            probe.verify()
+        source.seek(0)
+        with Image.open(source) as image:
+            image.seek(0)  # first frame of animated GIF/WebP
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError, SyntaxError) as e:
+        raise InvalidAvatar(str(e)) from e
+
+    variants = {}
+    for size in settings.AVATAR_VARIANT_SIZES:
+        resized = ImageOps.fit(image, (size, size), method=Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        # No exif/icc arguments: metadata from the upload is not carried over
+        resized.save(buffer, format='WEBP', quality=settings.AVATAR_WEBP_QUALITY, method=4)
+        variants[str(size)] = buffer.getvalue()
+    return variants
+
+
+def delete_files(names):
+    for name in names:
+        if not name:
+            continue
+        try:
+            default_storage.delete(name)
+        except Exception as e:
+            auth_logger.warning(f"Failed to delete avatar file {name}: {str(e)}")
+
+
+def process_staged_avatar(user_id, staged_name):
+    """
+    Turn a staged upload into avatar variants and swap them in
+
+    Returns:
+        bool: True if the new avatar was applied
+    """
+    User = get_user_model()
+    current = User.objects.filter(pk=user_id, avatar_pending=staged_name).values('avatar', 'avatar_variants').first()
+    if current is None:
+        # Superseded by a newer upload or a delete; that one owns the swap
+        delete_files([staged_name])
+        return False
+
+    try:
+        with default_storage.open(staged_name, 'rb') as source:
+            variants = render_variants(BytesIO(source.read()))
+    except (InvalidAvatar, FileNotFoundError) as e:
+        auth_logger.warning(f"Rejected avatar upload {staged_name} for user {user_id}: {str(e)}")
+        User.objects.filter(pk=user_id, avatar_pending=staged_name).update(avatar_pending=None)
+        invalidate_user(user_id)
+        delete_files([staged_name])
+        return False
+
+    token = uuid.uuid4().hex
+    variant_names = {
+        size: default_storage.save(f'avatars/{user_id}/{token}-{size}.webp', ContentFile(content))
+        for size, content in variants.items()
+    }
+    primary = variant_names[str(max(settings.AVATAR_VARIANT_SIZES))]
+
+    updated = User.objects.filter(
+        pk=user_id, avatar_pending=staged_name, avatar=current['avatar']
+    ).update(avatar=primary, avatar_variants=variant_names, avatar_pending=None)
+    if not updated:
+        delete_files(variant_names.values())
+        delete_files([staged_name])
+        return False
+
+    invalidate_user(user_id)
+    delete_files([staged_name, current['avatar'], *(current['avatar_variants'] or {}).values()])
+    auth_logger.info(f"Avatar processed for user {user_id}")
+    return True
+
+
+def clear_avatar(user):
+    """
+    Remove a user's avatar and any pending upload
+
+    Returns:
+        bool: False if the user had no avatar to remove
+    """
+    User = get_user_model()
+    while True:
+        current = User.objects.filter(pk=user.pk).values('avatar', 'avatar_variants', 'avatar_pending').first()
+        if not current or not (current['avatar'] or current['avatar_pending']):
+            return False
+        # Conditional so a swap landing in between is retried, not orphaned
+        if User.objects.filter(
+            pk=user.pk, avatar=current['avatar'], avatar_pending=current['avatar_pending']
+        ).update(avatar=None, avatar_variants={}, avatar_pending=None):
+            break
+    user.avatar, user.avatar_variants, user.avatar_pending = None, {}, None
+    transaction.on_commit(lambda: invalidate_user(user.pk))
+
+    from .tasks import delete_avatar_files
+    names = [current['avatar'], current['avatar_pending'], *(current['avatar_variants'] or {}).values()]
+    transaction.on_commit(lambda: delete_avatar_files.delay([name for name in names if name]))
+    return True
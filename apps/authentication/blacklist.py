@@ -0,0 +1,62 @@
+"""
+Maintenance of the legacy simplejwt blacklist tables
+
+Revocation now lives in Redis (see revocation.py) and the token_blacklist app
+is not installed, but databases that ran it still carry its tables. They are
+handled with raw SQL, and only if they exist.
+"""
+from django.db import connection, transaction
+
+OUTSTANDING_TABLE = 'token_blacklist_outstandingtoken'
+BLACKLISTED_TABLE = 'token_blacklist_blacklistedtoken'
+
+
+def blacklist_tables_exist():
+    tables = connection.introspection.table_names()
+    return OUTSTANDING_TABLE in tables and BLACKLISTED_TABLE in tables
+
+
+def _delete_batch(table, condition, order_by, params, batch_size):
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE {condition} ORDER BY {order_by} LIMIT %s)',
+            [*params, batch_size]
+        )
+        return cursor.rowcount
+
+
+def purge_blacklist_rows(batch_size, expired_before=None):
+    """
+    Delete blacklist rows in short transactions of at most ``batch_size`` rows
+
+    Blacklisted rows go first since they reference outstanding tokens.
+    Outstanding tokens are deleted oldest expiry first, blacklisted rows in
+    token order, so an interrupted purge leaves the newest rows behind.
+
+    Args:
+        batch_size (int): Rows deleted per transaction
+        expired_before (datetime): Only delete tokens that expired before this; all rows if None
+
+    Returns:
+        dict: Deleted row counts per table, empty if the tables do not exist
+    """
+    if not blacklist_tables_exist():
+        return {}
+
+    if expired_before is None:
+        outstanding_condition, params = 'TRUE', []
+    else:
+        outstanding_condition, params = 'expires_at < %s', [expired_before]
+    blacklisted_condition = f'token_id IN (SELECT id FROM {OUTSTANDING_TABLE} WHERE {outstanding_condition})'
+
+    deleted = {BLACKLISTED_TABLE: 0, OUTSTANDING_TABLE: 0}
+    for table, condition, order_by in (
+        (BLACKLISTED_TABLE, blacklisted_condition, 'token_id'),
+        (OUTSTANDING_TABLE, outstanding_condition, 'expires_at'),
+    ):
+        while True:
+            count = _delete_batch(table, condition, order_by, params, batch_size)
+            deleted[table] += count
+            if count < batch_size:
+                break
+    return deleted
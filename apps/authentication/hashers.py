@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with cost parameters taken from settings
+
+    Keeps the 'argon2' algorithm name, so existing Argon2 hashes verify as
+    before and hashes made with other parameters are upgraded on next login.
+    """
+    time_cost = settings.ARGON2_TIME_COST
+    memory_cost = settings.ARGON2_MEMORY_COST
+    parallelism = settings.ARGON2_PARALLELISM
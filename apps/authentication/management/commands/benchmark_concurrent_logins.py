@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+from django.urls import reverse
+
+from apps.authentication.views import LoginView
+
+PASSWORD = 'benchmark-Password-123'
+USERNAME_PREFIX = 'benchmark-login-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Send concurrent logins through the ASGI handler and report how many were in the view at once "
+        "(peak 1 means they were handled one at a time) and the resulting speedup"
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.in_flight = self.peak_in_flight = 0
+
+    def track_in_flight(self, post):
+        def tracked(view, request, *args, **kwargs):
+            with self.lock:
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                return post(view, request, *args, **kwargs)
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+        return tracked
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8, help="Logins in flight at once")
+        parser.add_argument('--rounds', type=int, default=3, help="Rounds per mode; the fastest one counts")
+
+    async def login(self, client, index):
+        response = await client.post(
+            reverse('Authentication:login'),
+            {'username': f'{USERNAME_PREFIX}{index}', 'password': PASSWORD},
+            content_type='application/json'
+        )
+        if response.status_code != 200:
+            raise CommandError(f"Login failed with {response.status_code}: {response.content[:200]!r}")
+
+    async def run(self, concurrency, rounds):
+        client = AsyncClient()
+        await self.login(client, 0)  # warm up imports, connections and the hashing pool
+
+        sequential = min([await self.timed(self.login(client, 0)) for _ in range(rounds)])
+        concurrent = min([
+            await self.timed(asyncio.gather(*(self.login(client, index) for index in range(concurrency))))
+            for _ in range(rounds)
+        ])
+        return sequential, concurrent
+
+    async def timed(self, awaitable):
+        started = time.perf_counter()
+        await awaitable
+        return time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        concurrency, rounds = options['concurrency'], options['rounds']
+        User = get_user_model()
+        encoded = make_password(PASSWORD)
+        User.objects.bulk_create([
+            User(
+                username=f'{USERNAME_PREFIX}{index}', email=f'{USERNAME_PREFIX}{index}@example.com',
+                password=encoded, full_name='Benchmark', phone='0'
+            )
+            for index in range(concurrency)
+        ])
+        try:
+            # Throttling would refuse a burst of logins from one address
+            with mock.patch.object(LoginView, 'throttle_classes', []), \
+                    mock.patch.object(LoginView, 'post', self.track_in_flight(LoginView.post)):
+                sequential, concurrent = asyncio.run(self.run(concurrency, rounds))
+        finally:
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+        # The speedup is capped by the cores available to PASSWORD_HASH_WORKERS
+        speedup = sequential * concurrency / concurrent
+        self.stdout.write(self.style.SUCCESS(
+            f"one login {sequential * 1000:.1f} ms | {concurrency} concurrent logins {concurrent * 1000:.1f} ms | "
+            f"peak {self.peak_in_flight} in flight | speedup {speedup:.1f}x"
+        ))
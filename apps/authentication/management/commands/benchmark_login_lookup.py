@@ -0,0 +1,70 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from apps.authentication.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark login identifier resolution: the old email/username OR lookup against "
+        "the two-probe lower() index lookup, on synthetic users that are rolled back afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000, help="Synthetic users to insert")
+        parser.add_argument('--lookups', type=int, default=1000, help="Lookups per strategy")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("This benchmark needs PostgreSQL")
+        users, lookups = options['users'], options['lookups']
+
+        with transaction.atomic():
+            self.stdout.write(f"Inserting {users} synthetic users...")
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {User._meta.db_table}
+                        (password, is_superuser, username, full_name, email, phone, is_staff, is_active, is_deleted,
+                         avatar_variants)
+                    SELECT '!', false, 'bench_user_' || n, 'Bench User', 'bench_user_' || n || '@bench.invalid',
+                           '', false, true, false, '{{}}'
+                    FROM generate_series(1, %s) AS n
+                    """,
+                    [users]
+                )
+                cursor.execute(f"ANALYZE {User._meta.db_table}")
+
+            # Half emails, half usernames, with mixed case to exercise normalisation
+            identifiers = []
+            for i in range(lookups):
+                n = random.randint(1, users)
+                identifiers.append(f'Bench_User_{n}@Bench.invalid' if i % 2 else f'BENCH_user_{n}')
+
+            strategies = [
+                ('email OR username (old)', lambda value: User.objects.filter(
+                    Q(email=value) | Q(username=value)
+                ).first()),
+                ('lower() two-probe (new)', User.objects.get_by_identifier),
+            ]
+            for label, lookup in strategies:
+                started = time.perf_counter()
+                for identifier in identifiers:
+                    lookup(identifier)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(self.style.SUCCESS(
+                    f"{label}: {elapsed / lookups * 1000:.3f} ms/lookup, {lookups / elapsed:.0f} lookups/s"
+                ))
+
+            for label, queryset in [
+                ('old plan', User.objects.filter(Q(email=identifiers[0]) | Q(username=identifiers[0]))),
+                ('new plan (email probe)', User.objects.by_email(identifiers[1])),
+                ('new plan (username probe)', User.objects.by_username(identifiers[0])),
+            ]:
+                self.stdout.write(f"{label}:\n{queryset.explain()}")
+
+            transaction.set_rollback(True)
@@ -0,0 +1,44 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+PASSWORD = 'benchmark-Password-123'
+
+
+class Command(BaseCommand):
+    help = "Report password verifications (logins) per second per core for each configured hasher"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help="Verifications per worker")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Threads for the parallel run")
+
+    def handle(self, *args, **options):
+        iterations, workers = options['iterations'], options['workers']
+        self.stdout.write(f"{iterations} verifications per worker, {workers} worker(s)")
+
+        for path in settings.PASSWORD_HASHERS:
+            hasher = import_string(path)()
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as e:  # hasher library not installed
+                self.stdout.write(self.style.WARNING(f"{hasher.algorithm}: skipped ({e})"))
+                continue
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                hasher.verify(PASSWORD, encoded)
+            single = iterations / (time.perf_counter() - started)
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                started = time.perf_counter()
+                list(executor.map(lambda _: hasher.verify(PASSWORD, encoded), range(iterations * workers)))
+                parallel = iterations * workers / (time.perf_counter() - started)
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{hasher.algorithm:<14} {single:8.1f} logins/s on one core | "
+                f"{parallel:8.1f} logins/s on {workers} threads ({parallel / workers:.1f} per core)"
+            ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.authentication.blacklist import purge_blacklist_rows
+
+
+class Command(BaseCommand):
+    help = "Empty the legacy simplejwt blacklist tables now that revoked tokens are kept in Redis"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows deleted per transaction")
+
+    def handle(self, *args, **options):
+        deleted = purge_blacklist_rows(options['batch_size'])
+        if not deleted:
+            self.stdout.write("No token blacklist tables found, nothing to purge.")
+            return
+        for table, count in deleted.items():
+            self.stdout.write(self.style.SUCCESS(f"Deleted {count} rows from {table}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.authentication.availability import rebuild_identifier_bloom
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Redis Bloom filter of usernames and emails used by the availability check"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Identifiers written per Redis pipeline")
+
+    def handle(self, *args, **options):
+        count = rebuild_identifier_bloom(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Identifier filter rebuilt with {count} entries"))
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.3 on 2026-10-19 04:07
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+def check_case_duplicate_emails(apps, schema_editor):
+    """
+    Stop with a readable report if emails differ only by case
+
+    The old unique index on ``email`` was case-sensitive, so such rows can
+    exist and would make the constraint below fail with a bare IntegrityError.
+    Which account to keep is a business decision, so nothing is merged here:
+    merge or rename the listed accounts, then run the migration again.
+    """
+    User = apps.get_model('authentication', 'User')
+    duplicates = (
+        User.objects.annotate(email_lower=django.db.models.functions.text.Lower('email'))
+        .values('email_lower')
+        .annotate(count=models.Count('id'))
+        .filter(count__gt=1)
+        .values_list('email_lower', flat=True)
+    )
+    groups = [
+        list(User.objects.filter(email__iexact=email).order_by('id').values_list('id', 'email'))
+        for email in duplicates
+    ]
+    if groups:
+        report = '\n'.join(
+            '  ' + ', '.join(f'#{user_id} {email}' for user_id, email in group) for group in groups
+        )
+        raise RuntimeError(
+            f"{len(groups)} email address(es) are used by several users, differing only by case:\n{report}\n"
+            "Merge or rename these accounts before applying user_email_lower_uniq."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_user_is_deleted_alter_user_gender'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('username'), name='user_username_lower_idx'),
+        ),
+        migrations.RunPython(check_case_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='user_email_lower_uniq'),
+        ),
+    ]
@@ -1,7 +1,11 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.contrib.auth.models import PermissionsMixin
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.auth.base_user import BaseUserManager
+from django.utils.crypto import get_random_string
 
 from utils import GenderChoices
 from utils.abstract_models import ActiveModel
@@ -44,6 +48,55 @@ class UserManager(BaseUserManager):
         extra_fields.setdefault('is_staff', True)
         return self._create_user(email, password, **extra_fields)
 
+    def by_email(self, email):
+        """Case-insensitive email match, served by the lower(email) unique index"""
+        return self.alias(email_lower=Lower('email')).filter(email_lower=email.strip().lower())
+
+    def by_username(self, username):
+        """Case-insensitive username match, served by the lower(username) index"""
+        return self.alias(username_lower=Lower('username')).filter(username_lower=username.strip().lower())
+
+    def identifiers_in_use(self, email, username):
+        """
+        Which of ``email`` and ``username`` are taken, in a single query
+
+        Both lower() indexes are probed and OR-ed (BitmapOr), so this stays an
+        index lookup.
+
+        Returns:
+            set: Subset of {'email', 'username'}
+        """
+        email, username = email.strip().lower(), username.strip().lower()
+        rows = self.annotate(
+            email_lower=Lower('email'), username_lower=Lower('username')
+        ).filter(
+            Q(email_lower=email) | Q(username_lower=username)
+        ).values_list('email_lower', 'username_lower')[:2]
+        taken = set()
+        for row_email, row_username in rows:
+            if row_email == email:
+                taken.add('email')
+            if row_username == username:
+                taken.add('username')
+        return taken
+
+    def get_by_identifier(self, identifier):
+        """
+        Resolve a login identifier (email or username) to a user
+
+        Runs at most two index probes instead of an OR over both columns, which
+        Postgres can only answer with a sequential scan. Emails win over
+        usernames when both match.
+
+        Returns:
+            User or None
+        """
+        if '@' in identifier:
+            user = self.by_email(identifier).first()
+            if user is not None:
+                return user
+        return self.by_username(identifier).order_by('id').first()
+
 
 class User(AbstractBaseUser, PermissionsMixin, ActiveModel):
     """
@@ -56,6 +109,10 @@ class User(AbstractBaseUser, PermissionsMixin, ActiveModel):
     phone = models.CharField(max_length=50)
     gender = models.CharField(max_length=1, choices=GenderChoices.choices, blank=True, null=True)
     avatar = models.FileField(blank=True, null=True)
+    # size -> storage name of the processed WebP variants; avatar is the largest
+    avatar_variants = models.JSONField(default=dict, blank=True)
+    # Staged upload waiting for tasks.process_avatar
+    avatar_pending = models.FileField(blank=True, null=True)
     is_staff = models.BooleanField(default=False)
 
     # For password reset
@@ -66,5 +123,22 @@ class User(AbstractBaseUser, PermissionsMixin, ActiveModel):
 
     objects = UserManager()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower('email'), name='user_email_lower_uniq'),
+        ]
+        indexes = [
+            models.Index(Lower('username'), name='user_username_lower_idx'),
+        ]
+
     def __str__(self):
         return self.email
+
+    def issue_reset_token(self):
+        """
+        Set a fresh reset_token (not saved) and return the frontend link that uses it
+
+        The link is what goes in emails; the account's password never does.
+        """
+        self.reset_token = get_random_string(32)
+        return f"{settings.BASE_FRONTEND_URL}/reset-password/?token={self.reset_token}&username={self.username}"
@@ -0,0 +1,80 @@
+"""
+Bounded password verification
+
+Password hashing is deliberately slow and CPU bound. Login checks run on a
+fixed-size thread pool (argon2-cffi and hashlib release the GIL), so a login
+burst uses at most PASSWORD_HASH_WORKERS cores per server process and never
+starves the request threads. Each gunicorn worker builds its own pool, so a
+host running N workers hashes on up to N x PASSWORD_HASH_WORKERS threads;
+set it to cores / workers to keep the burst within the machine. Requests that
+cannot get a slot within PASSWORD_HASH_QUEUE_TIMEOUT are refused instead of
+piling up.
+
+Logins for unknown or inactive accounts still pay for one hash
+(``check_dummy_password``), so response times do not reveal which
+identifiers exist, as Django's ModelBackend does.
+
+``LoginView`` itself runs off the ASGI sync view thread
+(``utils.async_views``); otherwise waiting on the pool would still hold that
+single thread and logins would be handled one at a time.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE)
+
+
+class PasswordCheckBusy(Exception):
+    """Raised when every password hashing slot is taken"""
+
+
+def _verify(raw_password, encoded):
+    # Hashing happens here, on the pool; the rehash is returned rather than saved
+    upgraded = []
+    is_correct = check_password(raw_password, encoded, setter=lambda raw: upgraded.append(make_password(raw)))
+    return is_correct, upgraded[0] if upgraded else None
+
+
+def check_user_password(user, raw_password):
+    """
+    Verify a user's password on the hashing pool
+
+    If the stored hash uses an outdated hasher or parameters, it is replaced
+    with one from the preferred hasher (the first in PASSWORD_HASHERS).
+
+    Returns:
+        bool: True if the password is correct
+
+    Raises:
+        PasswordCheckBusy: If no hashing slot frees up in time
+    """
+    if not _slots.acquire(timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT):
+        raise PasswordCheckBusy()
+    try:
+        is_correct, upgraded = _executor.submit(_verify, raw_password, user.password).result()
+    finally:
+        _slots.release()
+
+    if upgraded:
+        user.password = upgraded
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+def check_dummy_password(raw_password):
+    """
+    Hash ``raw_password`` on the pool and discard it, taking as long as a real check
+
+    Raises:
+        PasswordCheckBusy: If no hashing slot frees up in time
+    """
+    if not _slots.acquire(timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT):
+        raise PasswordCheckBusy()
+    try:
+        _executor.submit(make_password, raw_password).result()
+    finally:
+        _slots.release()
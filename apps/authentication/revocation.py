@@ -0,0 +1,101 @@
+"""
+Revoked JWT store
+
+Revoked token IDs (JTIs) live in Redis until the token would have expired
+anyway, so the store never outgrows the set of still-valid revoked tokens
+and no database table is involved.
+
+With AUTH_REVOCATION_BLOOM enabled, each process keeps a Bloom filter of all
+revoked JTIs, rebuilt every AUTH_REVOCATION_BLOOM_REFRESH seconds. Tokens
+that are definitely not in it skip the Redis lookup. A token revoked by
+another process may be accepted here until the next rebuild.
+"""
+import threading
+import time
+
+from django.conf import settings
+from redis.exceptions import RedisError
+from rest_framework_simplejwt.settings import api_settings
+
+from utils.bloom import BloomFilter
+from utils.redis_client import get_redis
+
+import logging
+auth_logger = logging.getLogger('authentication')
+
+REVOKED_INDEX_KEY = 'auth:revoked'  # sorted set of JTIs scored by expiry
+
+
+def revoked_key(jti):
+    return f'auth:revoked:{jti}'
+
+
+class RevocationBloom:
+    """Per-process Bloom filter of revoked JTIs, rebuilt from Redis when stale"""
+
+    def __init__(self):
+        self._bloom = None
+        self._built_at = 0
+        self._lock = threading.Lock()
+
+    def _rebuild(self):
+        client = get_redis()
+        now = time.time()
+        client.zremrangebyscore(REVOKED_INDEX_KEY, '-inf', now)
+        jtis = client.zrangebyscore(REVOKED_INDEX_KEY, now, '+inf')
+        self._bloom = BloomFilter.from_items(jtis, settings.AUTH_REVOCATION_BLOOM_ERROR_RATE)
+        self._built_at = time.monotonic()
+
+    def might_contain(self, jti):
+        with self._lock:
+            if self._bloom is None or time.monotonic() - self._built_at > settings.AUTH_REVOCATION_BLOOM_REFRESH:
+                self._rebuild()
+            return jti in self._bloom
+
+    def add(self, jti):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+
+revocation_bloom = RevocationBloom()
+
+
+def revoke_token(token):
+    """
+    Revoke a validated simplejwt token until it expires
+
+    Returns:
+        bool: False if the token had already expired
+    """
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = token['exp']
+    ttl = int(expires_at - time.time())
+    if ttl <= 0:
+        return False
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.set(revoked_key(jti), 1, ex=ttl)
+    pipe.zadd(REVOKED_INDEX_KEY, {jti: expires_at})
+    pipe.zremrangebyscore(REVOKED_INDEX_KEY, '-inf', time.time())
+    pipe.execute()
+    if settings.AUTH_REVOCATION_BLOOM:
+        revocation_bloom.add(jti)
+    return True
+
+
+def is_revoked(token):
+    """
+    Whether a validated token has been revoked
+
+    Fails open if Redis is unreachable, so an outage does not log everyone out.
+    """
+    jti = token.get(api_settings.JTI_CLAIM)
+    if jti is None:
+        return False
+    try:
+        if settings.AUTH_REVOCATION_BLOOM and not revocation_bloom.might_contain(jti):
+            return False
+        return bool(get_redis().exists(revoked_key(jti)))
+    except RedisError as e:
+        auth_logger.warning(f"Token revocation check failed for jti={jti}: {str(e)}")
+        return False
@@ -1,28 +1,51 @@
 from django.contrib.auth import authenticate
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.crypto import constant_time_compare
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
-from utils.email import send_email_message
-from django.db.models import Q
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 
+from apps.authentication.avatars import stage_avatar
 from apps.authentication.models import User
+from apps.authentication.revocation import is_revoked, revoke_token
+from apps.notifications.outbox import enqueue_email
 
 
 class UserSerializer(serializers.ModelSerializer):
     avatar = serializers.SerializerMethodField()
+    avatar_variants = serializers.SerializerMethodField()
+    avatar_pending = serializers.SerializerMethodField()
     
     class Meta:
         model = User
-        fields = ['id',  'avatar', 'username', 'full_name', 'email', 'phone', 'gender', 'is_active',]
+        fields = [
+            'id',  'avatar', 'avatar_variants', 'avatar_pending',
+            'username', 'full_name', 'email', 'phone', 'gender', 'is_active',
+        ]
         read_only_fields = ['id', 'is_active']
+
+    def _file_url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
     
     def get_avatar(self, obj):
         if obj.avatar:
-            request = self.context.get('request')
-            if request is not None:
-                return request.build_absolute_uri(obj.avatar.url)
-            return obj.avatar.url
+            return self._file_url(obj.avatar.name)
         return None
 
+    def get_avatar_variants(self, obj):
+        return {size: self._file_url(name) for size, name in (obj.avatar_variants or {}).items()}
+
+    def get_avatar_pending(self, obj):
+        return bool(obj.avatar_pending)
+
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
@@ -33,44 +56,47 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ('avatar','username', 'email', 'phone', 'password', 'password2', 'full_name')
         extra_kwargs = {
             'full_name': {'required': True},
-            'email': {'required': True}
+            'email': {'required': True, 'validators': []}  # uniqueness checked in validate()
         }
 
     def validate(self, attrs):
-        if User.objects.filter(email=attrs['email']).exists():
+        taken = User.objects.identifiers_in_use(attrs['email'], attrs['username'])
+        if 'email' in taken:
             raise serializers.ValidationError({"email": "Email is already in use."})
 
-        if User.objects.filter(username=attrs['username']).exists():
+        if 'username' in taken:
             raise serializers.ValidationError({"username": "Username is already in use."})
 
         if attrs['password'] != attrs['password2']:
             raise serializers.ValidationError({"password": "Password fields didn't match."})
         return attrs
 
+    @transaction.atomic
     def create(self, validated_data):
         # Remove password2 from the data
         validated_data.pop('password2', None)
         
         # Create user
         user = User.objects.create_user(
-            avatar=validated_data.get('avatar'),
             username=validated_data['username'],
             email=validated_data['email'],
             phone=validated_data['phone'],
             full_name=validated_data.get('full_name'),
             password=validated_data['password']
         )
+        if validated_data.get('avatar'):
+            stage_avatar(user, validated_data['avatar'])
         
-        # Send welcome email asynchronously using Celery
-        send_email_message.delay(
-            subject="Welcome to Azure Horizon | Login Details",
+        # Welcome email goes out with the user row, via the outbox. Outbox rows
+        # are stored, so it never carries the password
+        enqueue_email(
+            subject="Welcome to Azure Horizon",
             template_name="welcome.html",
             context={
                 "user_id": user.id,
                 "username": user.username,
                 "full_name": user.full_name,
-                "email": user.email,
-                "password": validated_data['password']
+                "email": user.email
             },
             recipient_list=[user.email]
         )
@@ -106,13 +132,28 @@ class LoginSerializer(serializers.Serializer):
         return attrs
 
 
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh that refuses revoked refresh tokens and revokes rotated ones"""
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        if is_revoked(refresh):
+            raise InvalidToken(_("Token has been revoked"))
+        data = super().validate(attrs)
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            revoke_token(refresh)
+        return data
+
+
 class ForgotPasswordSerializer(serializers.Serializer):
     username = serializers.CharField()
 
-    def validate_username(self, value):
-        if not User.objects.filter(Q(email=value) | Q(username=value)).exists():
-            raise serializers.ValidationError("No user is associated with this username.")
-        return value
+    def validate(self, attrs):
+        user = User.objects.get_by_identifier(attrs['username'])
+        if user is None:
+            raise serializers.ValidationError({"username": "No user is associated with this username."})
+        attrs['user'] = user
+        return attrs
 
 
 class PasswordResetSerializer(serializers.Serializer):
@@ -121,12 +162,10 @@ class PasswordResetSerializer(serializers.Serializer):
     new_password = serializers.CharField(min_length=8)
 
     def validate(self, attrs):
-        username = attrs.get('username')
-        token = attrs.get('token')
-        if not User.objects.filter(
-                (Q(email=username) | Q(username=username)) & Q(reset_token=token)
-                ).exists():
+        user = User.objects.get_by_identifier(attrs['username'])
+        if user is None or not user.reset_token or not constant_time_compare(user.reset_token, attrs['token']):
             raise serializers.ValidationError("Invalid token or email/username.")
+        attrs['user'] = user
         return attrs
 
 
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user
+from .availability import remember_user_identifiers
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop cached snapshots once the change is committed (profile, avatar, password, deactivation)"""
+    transaction.on_commit(lambda: invalidate_user(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def add_identifiers_to_filter(sender, instance, update_fields=None, **kwargs):
+    """Keep the availability filter ahead of new and renamed usernames/emails"""
+    if update_fields is not None and not {'username', 'email'} & set(update_fields):
+        return
+    transaction.on_commit(lambda: remember_user_identifiers(instance))
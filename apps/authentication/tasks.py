@@ -0,0 +1,56 @@
+import logging
+import time
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from utils.metrics import increment, observe
+
+from .availability import rebuild_identifier_bloom
+from .avatars import delete_files, process_staged_avatar
+from .blacklist import purge_blacklist_rows
+
+auth_logger = logging.getLogger('authentication')
+
+
+@shared_task
+def process_avatar(user_id, staged_name):
+    """Render WebP variants for a staged avatar upload and swap them in"""
+    return process_staged_avatar(user_id, staged_name)
+
+
+@shared_task
+def delete_avatar_files(names):
+    """Remove replaced or deleted avatar files from storage"""
+    delete_files(names)
+
+
+@shared_task
+def rebuild_identifier_filter():
+    """Rebuild the username/email availability filter from the user table"""
+    count = rebuild_identifier_bloom()
+    auth_logger.info(f"Identifier filter rebuilt with {count} entries")
+    return count
+
+
+@shared_task
+def purge_expired_tokens(batch_size=None):
+    """
+    Delete expired rows from the legacy token blacklist tables
+
+    Runs in short batches by expires_at and records the rows removed and the
+    time taken.
+
+    Returns:
+        dict: Deleted row counts per table, empty if the tables do not exist
+    """
+    started = time.monotonic()
+    deleted = purge_blacklist_rows(batch_size or settings.TOKEN_PURGE_BATCH_SIZE, expired_before=timezone.now())
+    duration = time.monotonic() - started
+
+    observe('token_purge_duration_seconds', duration)
+    for table, count in deleted.items():
+        increment('token_purge_rows_total', count, table=table)
+    auth_logger.info(f"Expired token purge finished in {duration:.2f}s: {deleted}")
+    return deleted
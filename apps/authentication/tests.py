@@ -0,0 +1,147 @@
+import asyncio
+import uuid
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+from rest_framework.test import APIClient
+
+from apps.notifications.models import EmailOutbox
+from utils.redis_client import get_redis
+
+from .availability import BUILD_REQUESTED_KEY, get_identifier_bloom, identifier_in_use, rebuild_identifier_bloom
+from .avatars import STAGING_EXTENSION, stage_avatar
+
+
+class LoginViewTests(TransactionTestCase):
+    """Logins run off the ASGI sync thread, so each one uses its own DB connection"""
+
+    def setUp(self):
+        get_user_model().objects.create_user(
+            email='guest@example.com', username='guest', password='pw12345678', full_name='Guest', phone='1'
+        )
+        self.url = reverse('Authentication:login')
+
+    def test_login_view_is_async(self):
+        self.assertTrue(asyncio.iscoroutinefunction(resolve(self.url).func))
+
+    async def test_concurrent_logins(self):
+        client = AsyncClient()
+        responses = await asyncio.gather(*(
+            client.post(self.url, {'username': username, 'password': password}, content_type='application/json')
+            for username, password in [('guest', 'pw12345678'), ('GUEST@example.com', 'pw12345678'), ('guest', 'wrong')]
+        ))
+
+        self.assertEqual([response.status_code for response in responses], [200, 200, 401])
+        self.assertIn('access', responses[0].json())
+
+    def test_unknown_and_inactive_accounts_still_hash(self):
+        get_user_model().objects.create_user(
+            email='gone@example.com', username='gone', password='pw12345678', full_name='Gone', phone='2',
+            is_active=False
+        )
+        client = APIClient(REMOTE_ADDR=random_ip())
+        for username in ('nobody', 'gone'):
+            with mock.patch('apps.authentication.passwords.make_password', wraps=make_password) as dummy, \
+                    mock.patch('apps.authentication.passwords.check_password', wraps=check_password) as check:
+                response = client.post(self.url, {'username': username, 'password': 'pw12345678'}, format='json')
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.data, {'detail': 'Invalid Credentials'})
+            self.assertEqual(dummy.call_count + check.call_count, 1, username)
+
+
+def random_ip():
+    # A fresh address per run, buckets live in Redis
+    return '10.' + '.'.join(str(uuid.uuid4().int % 250) for _ in range(3))
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'user_check': '2/min'},
+})
+class ThrottleTests(TransactionTestCase):
+    def setUp(self):
+        self.client = APIClient(REMOTE_ADDR=random_ip())
+
+    def check(self, **extra):
+        return self.client.get(reverse('Authentication:user-check'), {'username': uuid.uuid4().hex}, **extra)
+
+    def test_forwarded_for_does_not_pick_the_ip_bucket(self):
+        # 404: the random username is free
+        self.assertEqual(self.check(HTTP_X_FORWARDED_FOR='192.0.2.1').status_code, 404)
+        self.assertEqual(self.check(HTTP_X_FORWARDED_FOR='192.0.2.2').status_code, 404)
+        self.assertEqual(self.check(HTTP_X_FORWARDED_FOR='192.0.2.3').status_code, 429)
+
+    def test_clients_behind_one_proxy_get_separate_buckets(self):
+        client_a, client_b = random_ip(), random_ip()
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            self.assertEqual(self.check(HTTP_X_FORWARDED_FOR=client_a).status_code, 404)
+            self.assertEqual(self.check(HTTP_X_FORWARDED_FOR=client_a).status_code, 404)
+            self.assertEqual(self.check(HTTP_X_FORWARDED_FOR=client_b).status_code, 404)
+            # A client-supplied entry in front of the proxy's does not open a new bucket
+            self.assertEqual(self.check(HTTP_X_FORWARDED_FOR=f'192.0.2.9, {client_a}').status_code, 429)
+
+
+class IdentifierBloomTests(TransactionTestCase):
+    def setUp(self):
+        get_redis().delete(get_identifier_bloom().key, BUILD_REQUESTED_KEY)
+        get_user_model().objects.create_user(
+            email='guest@example.com', username='guest', password='pw12345678', full_name='Guest', phone='1'
+        )
+
+    def test_missing_filter_queues_one_rebuild(self):
+        get_redis().delete(get_identifier_bloom().key)
+
+        with mock.patch('apps.authentication.tasks.rebuild_identifier_filter.delay') as delay:
+            self.assertTrue(identifier_in_use(username='guest'))
+            self.assertFalse(identifier_in_use(username='someone-else'))
+        delay.assert_called_once_with()
+
+        rebuild_identifier_bloom()
+        with mock.patch('apps.authentication.tasks.rebuild_identifier_filter.delay') as delay, \
+                self.assertNumQueries(0):
+            self.assertFalse(identifier_in_use(username='someone-else', email='someone@example.com'))
+        delay.assert_not_called()
+        self.assertTrue(identifier_in_use(email='GUEST@example.com'))
+
+
+class RegisterTests(TestCase):
+    @mock.patch('apps.authentication.tasks.rebuild_identifier_filter.delay')
+    def test_welcome_email_carries_no_credentials(self, rebuild):
+        response = APIClient().post(reverse('Authentication:register'), {
+            'username': 'newguest', 'email': 'newguest@example.com', 'phone': '1', 'full_name': 'New Guest',
+            'password': 'pw-Secret-123', 'password2': 'pw-Secret-123',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        email = EmailOutbox.objects.get(template_name='welcome.html')
+        self.assertNotIn('pw-Secret-123', str(email.context))
+        # No reset link either: it would be a takeover link that never expires
+        self.assertIsNone(get_user_model().objects.get(username='newguest').reset_token)
+        self.assertNotIn('reset-password', str(email.context))
+
+
+@override_settings(STORAGES={
+    **settings.STORAGES, 'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'}
+})
+class AvatarStagingTests(TestCase):
+    """Unvalidated uploads sit in public storage until processed"""
+
+    def test_upload_is_staged_under_a_fixed_extension(self):
+        user = get_user_model().objects.create_user(
+            email='guest@example.com', username='guest', password='pw12345678', full_name='Guest', phone='1'
+        )
+        upload = SimpleUploadedFile('avatar.html', b'<script>alert(1)</script>', content_type='text/html')
+
+        name = stage_avatar(user, upload)
+
+        self.assertTrue(name.endswith(STAGING_EXTENSION))
+        self.assertNotIn('.html', name)
+        self.assertTrue(default_storage.exists(name))
+        user.refresh_from_db()
+        self.assertEqual(user.avatar_pending, name)
@@ -1,7 +1,4 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView
-
-
 from .views import (
     UserCheckView, 
     RegisterView, 
@@ -11,7 +8,8 @@ from .views import (
     ForgotPasswordView, 
     PasswordResetView,
     ProfileUpdateView,
-    AvatarUpdateView
+    AvatarUpdateView,
+    RevocableTokenRefreshView
 )
 
 app_name = 'Authentication'
@@ -22,7 +20,7 @@ urlpatterns = [
     path('user-check/', UserCheckView.as_view(), name='user-check'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', RevocableTokenRefreshView.as_view(), name='token_refresh'),
 
     # Profile endpoints
     path('profile/', ProfileView.as_view(), name='profile'),
@@ -1,33 +1,44 @@
 import logging
 auth_logger = logging.getLogger('authentication')
-from django.conf import settings
-from django.contrib.auth import get_user_model, authenticate
-from django.utils.crypto import get_random_string
+from utils.throttling import EarlyThrottleMixin, TokenBucketThrottle
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import etag
 from rest_framework import status, generics
 from rest_framework.generics import RetrieveAPIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
 from rest_framework_simplejwt.tokens import RefreshToken, AccessToken, TokenError
+from rest_framework_simplejwt.views import TokenRefreshView
 
-from django.db.models import Q
+from utils.async_views import off_request_thread
+from utils.conditional import get_version, request_etag
+
+from .authentication import CachedJWTAuthentication, version_key
+from .availability import identifier_in_use
+from .avatars import clear_avatar, stage_avatar
+from .passwords import PasswordCheckBusy, check_dummy_password, check_user_password
+from .revocation import revoke_token
 from .serializers import (
     UserSerializer, 
     RegisterSerializer, 
     ForgotPasswordSerializer, 
     PasswordResetSerializer,
     ProfileUpdateSerializer,
-    AvatarUpdateSerializer
+    AvatarUpdateSerializer,
+    RevocableTokenRefreshSerializer
 )
-from utils.email import send_email_message
+from apps.notifications.outbox import enqueue_email
 
 User = get_user_model()
 
 
-class UserCheckView(RetrieveAPIView):
+class UserCheckView(EarlyThrottleMixin, RetrieveAPIView):
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'user_check'
     serializer_class = UserSerializer
     queryset = User.objects.all()
     lookup_field = 'username'
@@ -35,15 +46,8 @@ class UserCheckView(RetrieveAPIView):
     def get(self, request, *args, **kwargs):
         username = request.query_params.get('username')
         email = request.query_params.get('email')
-        if username:
-            user = User.objects.filter(username=username).first()
-            if user:
-                return Response({'status': True}, status=status.HTTP_200_OK)
-
-        if email:
-            user = User.objects.filter(email=email).first()
-            if user:
-                return Response({'status': True}, status=status.HTTP_200_OK)
+        if identifier_in_use(username=username, email=email):
+            return Response({'status': True}, status=status.HTTP_200_OK)
 
         return Response({'status': False}, status=status.HTTP_404_NOT_FOUND)
 
@@ -58,14 +62,23 @@ class RegisterView(generics.CreateAPIView):
 
         response_data = {
             'user': UserSerializer(user).data,
-            'message': 'User registered successfully. Please check your email for login credentials.'
+            'message': 'User registered successfully. Please check your email.'
         }
         
         return Response(response_data, status=status.HTTP_201_CREATED)
 
 
-class LoginView(APIView):
+class LoginView(EarlyThrottleMixin, APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'login'
+    throttle_identifier_fields = ('username',)
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Password checks block for tens of milliseconds; run logins concurrently
+        # instead of one at a time on the ASGI worker's sync view thread
+        return off_request_thread(super().as_view(**initkwargs))
     
     def post(self, request, *args, **kwargs):
         username = request.data.get('username')
@@ -76,14 +89,23 @@ class LoginView(APIView):
                 {'detail': 'Please provide both username/email and password'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        user = User.objects.filter(Q(email=username) | Q(username=username)).first()
-        if user is None:
-            return Response({'detail': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
-
-        email = user.email
-        user = authenticate(request, email=email, password=password)
+        user = User.objects.get_by_identifier(username)
+        try:
+            if user is None:
+                # Hash anyway, so unknown identifiers take as long as wrong passwords
+                check_dummy_password(password)
+                is_valid = False
+            else:
+                is_valid = check_user_password(user, password) and user.is_active
+        except PasswordCheckBusy:
+            auth_logger.warning("Login rejected: password hashing pool is saturated")
+            return Response(
+                {'detail': 'Too many login attempts right now, please try again shortly.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'}
+            )
 
-        if user is None:
+        if not is_valid:
             return Response(
                 {'detail': 'Invalid Credentials'},
                 status=status.HTTP_401_UNAUTHORIZED
@@ -105,32 +127,20 @@ class LoginView(APIView):
 
 class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     def post(self, request, format=None):
         try:
-            # Blacklist refresh token (if provided)
+            # Revoke refresh token (if provided)
             refresh_token = request.data.get("refresh")
             if refresh_token:
-                token = RefreshToken(refresh_token)
-                token.blacklist()
+                revoke_token(RefreshToken(refresh_token))
 
-            # Blacklist access token (from Authorization header)
+            # Revoke access token (from Authorization header) until it expires
             auth_header = request.headers.get("Authorization")
             if auth_header and auth_header.startswith("Bearer "):
                 access_token_str = auth_header.split(" ")[1]
-                access_token = AccessToken(access_token_str)
-
-                # Store access token in blacklist
-                outstanding_token, _ = OutstandingToken.objects.get_or_create(
-                    jti=access_token["jti"],
-                    defaults={
-                        "token": access_token_str,
-                        "expires_at": access_token["exp"],
-                        "user": request.user,
-                    },
-                )
-                BlacklistedToken.objects.get_or_create(token=outstanding_token)
+                revoke_token(AccessToken(access_token_str))
 
             return Response(
                 {"message": "Logout successful."},
@@ -142,10 +152,23 @@ class LogoutView(APIView):
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+class RevocableTokenRefreshView(TokenRefreshView):
+    serializer_class = RevocableTokenRefreshSerializer
+
+
+def profile_etag(request):
+    # The snapshot cache's version counter already moves on every user change
+    version = get_version(version_key(request.user.pk))
+    if version is None:
+        return None
+    return request_etag(request, version)
+
+
 class ProfileView(APIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
+    @method_decorator(etag(profile_etag))
     def get(self, request, format=None):
         serializer = UserSerializer(request.user)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -153,26 +176,26 @@ class ProfileView(APIView):
     def get_serializer_context(self):
         return {'request': self.request}
 
-class ForgotPasswordView(APIView):
+class ForgotPasswordView(EarlyThrottleMixin, APIView):
     permission_classes = []
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'forgot_password'
+    throttle_identifier_fields = ('username',)
 
     def post(self, request):
         serializer = ForgotPasswordSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        username = serializer.validated_data['username']
-        user = User.objects.filter(Q(email=username) | Q(username=username)).first()
-        token = get_random_string(32)
-        user.reset_token = token
-        user.save(update_fields=['reset_token'])
-        url = f"{settings.BASE_FRONTEND_URL}/reset-password/?token={token}&username={user.username}"
-        # Send reset email
-        # send_email_message.delay(
-        send_email_message(
-            subject="Password Reset Request",
-            template_name="password-reset.html",
-            context={"reset_url": url, "email": user.email, "full_name": user.full_name},
-            recipient_list=[user.email]
-        )
+        user = serializer.validated_data['user']
+        url = user.issue_reset_token()
+        # Token and reset email commit together; the outbox dispatcher does the SMTP work
+        with transaction.atomic():
+            user.save(update_fields=['reset_token'])
+            enqueue_email(
+                subject="Password Reset Request",
+                template_name="password-reset.html",
+                context={"reset_url": url, "email": user.email, "full_name": user.full_name},
+                recipient_list=[user.email]
+            )
         return Response({"message": "Password reset instructions sent to your email."}, status=status.HTTP_200_OK)
 
 class PasswordResetView(APIView):
@@ -181,15 +204,8 @@ class PasswordResetView(APIView):
     def post(self, request):
         serializer = PasswordResetSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        username = serializer.validated_data['username']
-        token = serializer.validated_data['token']
+        user = serializer.validated_data['user']
         new_password = serializer.validated_data['new_password']
-        try:
-            user = User.objects.filter(
-                (Q(email=username) | Q(username=username)) & Q(reset_token=token)
-                ).first()
-        except User.DoesNotExist:
-            return Response({"error": "Invalid token or email/username."}, status=status.HTTP_400_BAD_REQUEST)
         user.set_password(new_password)
         user.reset_token = None
         user.save(update_fields=['password', 'reset_token'])
@@ -199,7 +215,7 @@ class PasswordResetView(APIView):
 class ProfileUpdateView(APIView):
     """API endpoint for updating user profile information"""
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     def put(self, request, format=None):
         """Update user profile (full update)"""
@@ -249,7 +265,7 @@ class ProfileUpdateView(APIView):
 class AvatarUpdateView(APIView):
     """API endpoint for updating user avatar"""
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     def put(self, request, format=None):
         """Update user avatar"""
@@ -260,23 +276,19 @@ class AvatarUpdateView(APIView):
         )
         
         if serializer.is_valid():
-            # Delete old avatar if exists
-            if request.user.avatar:
-                old_avatar = request.user.avatar
-                try:
-                    old_avatar.delete(save=False)
-                except Exception as e:
-                    auth_logger.warning(f"Failed to delete old avatar: {str(e)}")
-            
-            serializer.save()
-            auth_logger.info(f"User {request.user.username} updated their avatar")
+            if not serializer.validated_data.get('avatar'):
+                return Response({'avatar': ['No file was submitted.']}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Resizing and replacing the old files happens in tasks.process_avatar
+            stage_avatar(request.user, serializer.validated_data['avatar'])
+            auth_logger.info(f"User {request.user.username} uploaded a new avatar")
             
             # Return updated user data
             user_serializer = UserSerializer(request.user, context={'request': request})
             return Response({
                 'user': user_serializer.data,
-                'message': 'Avatar updated successfully.'
-            }, status=status.HTTP_200_OK)
+                'message': 'Avatar uploaded, it will be updated shortly.'
+            }, status=status.HTTP_202_ACCEPTED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -286,22 +298,15 @@ class AvatarUpdateView(APIView):
 
     def delete(self, request, format=None):
         """Delete user avatar"""
-        if request.user.avatar:
-            try:
-                request.user.avatar.delete(save=True)
-                auth_logger.info(f"User {request.user.username} deleted their avatar")
-                
-                # Return updated user data
-                user_serializer = UserSerializer(request.user, context={'request': request})
-                return Response({
-                    'user': user_serializer.data,
-                    'message': 'Avatar deleted successfully.'
-                }, status=status.HTTP_200_OK)
-            except Exception as e:
-                auth_logger.error(f"Failed to delete avatar: {str(e)}")
-                return Response({
-                    'error': 'Failed to delete avatar.'
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if clear_avatar(request.user):
+            auth_logger.info(f"User {request.user.username} deleted their avatar")
+            
+            # Return updated user data
+            user_serializer = UserSerializer(request.user, context={'request': request})
+            return Response({
+                'user': user_serializer.data,
+                'message': 'Avatar deleted successfully.'
+            }, status=status.HTTP_200_OK)
         
         return Response({
             'message': 'No avatar to delete.'
@@ -0,0 +1,30 @@
+"""
+Payment state access for bookings
+
+Booking numbers come from a sequence (see utils.numbering) and are easy to
+guess, so they cannot act as the credential for the public payment status and
+payment event endpoints. Those also need the booking's access token, an HMAC
+of the number that is handed out with the booking and on the Stripe return
+URLs; the owner and staff can read the status with their login instead.
+"""
+from django.core import signing
+from django.utils.crypto import constant_time_compare
+
+PAYMENT_ACCESS_SALT = 'bookings.payment-access'
+
+
+def payment_access_token(booking_number):
+    """URL-safe token granting read access to a booking's payment state"""
+    return signing.Signer(salt=PAYMENT_ACCESS_SALT).signature(booking_number)
+
+
+def is_valid_access_token(booking_number, token):
+    return bool(token) and constant_time_compare(token, payment_access_token(booking_number))
+
+
+def has_payment_access(request, booking):
+    """Whether the request may read the payment state of ``booking``"""
+    user = request.user
+    if user.is_authenticated and (user.is_staff or booking.user_id == user.id):
+        return True
+    return is_valid_access_token(booking.booking_number, request.GET.get('token'))
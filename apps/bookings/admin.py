@@ -1,8 +1,13 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
 from django.utils.html import format_html
 
-from .models import Booking, Payment
+from utils.choices import BookingStatusChoices
+from .models import Booking, Payment, Refund
 from .forms import BookingAdminForm, PaymentInlineForm
+from .refunds import enqueue_refunds
+from .search import booking_search_filter
+from .tasks import process_refund_queue
 
 class PaymentInline(admin.TabularInline):
     model = Payment
@@ -50,6 +55,8 @@ class BookingAdmin(admin.ModelAdmin):
     )
     
     date_hierarchy = 'booking_date'
+
+    actions = ['queue_refunds']
     
     def status_badge(self, obj):
         """Display status with color coding"""
@@ -84,12 +91,31 @@ class BookingAdmin(admin.ModelAdmin):
         )
     payment_status_badge.short_description = 'Payment Status'
     
+    def get_search_results(self, request, queryset, search_term):
+        """Use the trigram indexes instead of ILIKE scans over joined tables"""
+        search_term = search_term.strip()
+        if len(search_term) < settings.BOOKING_SEARCH_MIN_LENGTH:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(booking_search_filter(search_term)), False
+
     def save_model(self, request, obj, form, change):
         """Recalculate totals before saving"""
         super().save_model(request, obj, form, change)
         obj.calculate_totals()
         obj.save()
 
+    @admin.action(description='Refund selected cancelled bookings')
+    def queue_refunds(self, request, queryset):
+        """Queue Stripe refunds for the paid payments of cancelled bookings"""
+        cancelled = queryset.filter(status=BookingStatusChoices.CANCELLED)
+        skipped = queryset.count() - cancelled.count()
+        refunds = enqueue_refunds(cancelled)
+        if refunds:
+            process_refund_queue.delay()
+        self.message_user(request, f"{len(refunds)} refund(s) queued.", messages.SUCCESS)
+        if skipped:
+            self.message_user(request, f"{skipped} booking(s) skipped because they are not cancelled.", messages.WARNING)
+
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
@@ -129,3 +155,18 @@ class PaymentAdmin(admin.ModelAdmin):
             obj.get_payment_status_display()
         )
     payment_status_badge.short_description = 'Status'
+
+
+@admin.register(Refund)
+class RefundAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'booking', 'payment', 'amount', 'status', 'attempts', 'stripe_refund_id', 'created_at', 'processed_at'
+    ]
+
+    list_filter = ['status', 'created_at']
+
+    search_fields = ['booking__booking_number', 'payment__transaction_id', 'stripe_refund_id']
+
+    readonly_fields = [
+        'idempotency_key', 'stripe_refund_id', 'attempts', 'last_error', 'processed_at', 'created_at', 'updated_at'
+    ]
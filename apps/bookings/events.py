@@ -0,0 +1,181 @@
+"""
+Payment state change notifications for bookings
+
+State changes are published on a Redis pub/sub channel per booking number and
+streamed to clients as server-sent events, so the payment success page can wait
+for the webhook instead of polling the status endpoints.
+
+Django does not notice when a streaming client goes away, so an abandoned tab
+holds its stream until BOOKING_EVENTS_STREAM_TIMEOUT. Streams are therefore
+kept short and end with a ``retry`` hint for the browser's EventSource to
+reconnect, and each booking may only hold BOOKING_EVENTS_MAX_STREAMS at once.
+"""
+import asyncio
+import json
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from redis.exceptions import RedisError
+
+from utils.choices import BookingStatusChoices, PaymentStatusChoices
+from utils.redis_client import get_async_redis, get_redis
+
+payment_logger = logging.getLogger('payment_logs')
+
+# Decrement the slot counter only while it is positive: a counter that already
+# expired must not come back negative, with no TTL, lifting the cap for good
+RELEASE_SLOT_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') > 0 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+
+TERMINAL_PAYMENT_STATUSES = (
+    PaymentStatusChoices.COMPLETED,
+    PaymentStatusChoices.FAILED,
+    PaymentStatusChoices.REFUNDED,
+)
+
+
+def payment_channel(booking_number):
+    return f"bookings:{booking_number}:payment"
+
+
+def stream_slots_key(booking_number):
+    return f"bookings:{booking_number}:streams"
+
+
+def booking_payment_state(booking):
+    """Compact payload describing the payment state of a booking"""
+    return {
+        "booking_number": booking.booking_number,
+        "status": booking.status,
+        "payment_status": booking.payment_status,
+        "total_amount": str(booking.total_amount),
+    }
+
+
+def is_terminal_state(state):
+    return (
+        state["payment_status"] in TERMINAL_PAYMENT_STATUSES
+        or state["status"] == BookingStatusChoices.CANCELLED
+    )
+
+
+def publish_payment_event(booking):
+    """
+    Publish the current payment state of a booking to its channel
+
+    The state is taken now and published once the surrounding transaction
+    commits (at once outside one), so clients never see a state that is rolled
+    back. Publishing is best effort: a Redis outage must never fail the payment
+    flow that triggered it, clients fall back to the status endpoints.
+    """
+    booking_number = booking.booking_number
+    message = json.dumps(booking_payment_state(booking))
+
+    def publish():
+        try:
+            get_redis().publish(payment_channel(booking_number), message)
+        except RedisError as e:
+            payment_logger.warning(f"Failed to publish payment event: booking_number={booking_number}, error={str(e)}")
+
+    transaction.on_commit(publish)
+
+
+def format_event(state, event="payment"):
+    return f"event: {event}\ndata: {json.dumps(state)}\n\n"
+
+
+async def acquire_stream_slot(booking_number):
+    """
+    Reserve one of the booking's concurrent stream slots
+
+    The counter expires shortly after the longest possible stream, so slots of
+    a process that died without releasing them come back on their own.
+
+    Returns:
+        bool or None: True if a slot was taken, False if the booking already has
+        BOOKING_EVENTS_MAX_STREAMS open, None if Redis is unavailable (the
+        stream may go ahead, but holds no slot to release)
+    """
+    key = stream_slots_key(booking_number)
+    client = get_async_redis()
+    try:
+        pipe = client.pipeline(transaction=True)
+        pipe.incr(key)
+        pipe.expire(key, settings.BOOKING_EVENTS_STREAM_TIMEOUT + settings.BOOKING_EVENTS_KEEPALIVE)
+        count, _ = await pipe.execute()
+        if count > settings.BOOKING_EVENTS_MAX_STREAMS:
+            await client.decr(key)
+            return False
+        return True
+    except RedisError as e:
+        # The stream itself reports the outage to the client
+        payment_logger.warning(f"Failed to reserve payment event stream: booking_number={booking_number}, error={str(e)}")
+        return None
+    finally:
+        await client.aclose()
+
+
+async def release_stream_slot(client, booking_number):
+    await client.register_script(RELEASE_SLOT_SCRIPT)(keys=[stream_slots_key(booking_number)])
+
+
+async def stream_payment_events(booking_number, load_state, holds_slot=True):
+    """
+    Yield server-sent events for a booking until its payment settles
+
+    The channel is subscribed before the current state is loaded, so a change
+    published between the two cannot be missed. A slot taken with
+    ``acquire_stream_slot`` is released when the stream ends.
+
+    Args:
+        booking_number: Booking number to follow
+        load_state: Coroutine function returning the current state dict
+        holds_slot: Whether the caller took a stream slot for this stream
+
+    Yields:
+        str: SSE formatted messages
+    """
+    client = get_async_redis()
+    pubsub = client.pubsub()
+    loop = asyncio.get_running_loop()
+    try:
+        yield f"retry: {settings.BOOKING_EVENTS_RETRY_MS}\n\n"
+        await pubsub.subscribe(payment_channel(booking_number))
+        state = await load_state()
+        yield format_event(state)
+        if is_terminal_state(state):
+            return
+
+        deadline = loop.time() + settings.BOOKING_EVENTS_STREAM_TIMEOUT
+        while loop.time() < deadline:
+            timeout = min(settings.BOOKING_EVENTS_KEEPALIVE, deadline - loop.time())
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+            if message is None:
+                # Comment lines keep proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            state = json.loads(message["data"])
+            yield format_event(state)
+            if is_terminal_state(state):
+                return
+        # The client reconnects after the retry delay and gets the current state again
+        yield format_event({"booking_number": booking_number}, event="timeout")
+    except RedisError as e:
+        payment_logger.error(f"Payment event stream failed: booking_number={booking_number}, error={str(e)}")
+        yield format_event({"booking_number": booking_number}, event="error")
+    finally:
+        try:
+            if holds_slot:
+                await release_stream_slot(client, booking_number)
+        except RedisError:
+            pass
+        try:
+            await pubsub.aclose()
+            await client.aclose()
+        except RedisError:
+            pass
@@ -0,0 +1,175 @@
+"""
+iCalendar (RFC 5545) feeds of bookings
+
+Feeds are streamed: bookings are read with a chunked server-side cursor and
+written out one chunk of VEVENTs at a time, so a year of bookings never sits
+in memory. Calendar clients cannot send our JWT, so feed URLs carry a signed
+token naming the user or service they cover and the user it was issued to.
+The token never expires, so every fetch re-checks that its holder is still
+active (and still staff, for a service feed); deactivating or demoting the
+holder revokes the URL.
+"""
+import hashlib
+from datetime import datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db.models import Count, Max, Prefetch
+from django.utils import timezone
+
+from apps.cart.models import OrderItem
+from utils.choices import BookingStatusChoices
+
+from .models import Booking
+
+FEED_SALT = 'bookings.calendar-feed'
+USER_FEED = 'user'
+SERVICE_FEED = 'service'
+
+ICS_DATETIME_FORMAT = '%Y%m%dT%H%M%SZ'
+
+
+def feed_token(kind, object_id, holder_id):
+    """Signed, URL-safe token for the feed of one user or service, issued to user ``holder_id``"""
+    return signing.dumps([kind, object_id, holder_id], salt=FEED_SALT, compress=True)
+
+
+def load_feed_token(token):
+    """
+    Decode a feed token and check that its holder may still read the feed
+
+    Returns:
+        tuple: (kind, object_id)
+
+    Raises:
+        signing.BadSignature: If the token was not issued by us, or its holder
+            is no longer active (or no longer staff, for a service feed)
+    """
+    kind, object_id, *holder = signing.loads(token, salt=FEED_SALT)
+    if kind not in (USER_FEED, SERVICE_FEED):
+        raise signing.BadSignature(f"Unknown feed kind '{kind}'")
+    # Tokens issued before holders were recorded only ever covered the user's own feed
+    holder_id = holder[0] if holder else object_id if kind == USER_FEED else None
+    holders = get_user_model().objects.filter(pk=holder_id, is_active=True)
+    if kind == SERVICE_FEED:
+        holders = holders.filter(is_staff=True)
+    if holder_id is None or not holders.exists():
+        raise signing.BadSignature("Feed token has been revoked")
+    return kind, object_id
+
+
+def feed_bookings(kind, object_id):
+    """Bookings covered by a feed, from BOOKING_CALENDAR_PAST_DAYS ago onwards"""
+    since = timezone.localdate() - timedelta(days=settings.BOOKING_CALENDAR_PAST_DAYS)
+    queryset = Booking.objects.filter(booking_date__gte=since)
+    if kind == USER_FEED:
+        return queryset.filter(user_id=object_id)
+    return queryset.filter(order__in=OrderItem.objects.filter(service_id=object_id).values('order_id'))
+
+
+def feed_etag(kind, object_id):
+    """ETag from the latest change and row count, so polls with no changes get a 304"""
+    stats = feed_bookings(kind, object_id).aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    raw = f"{kind}:{object_id}:{stats['last_modified']}:{stats['count']}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def escape_text(value):
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold_line(line):
+    """Fold a content line to 75 octets as required by RFC 5545"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, start = [], 0
+    while start < len(encoded):
+        end = min(start + (75 if not parts else 74), len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:  # never split a UTF-8 sequence
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start = end
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_utc(value):
+    return value.astimezone(timezone.utc).strftime(ICS_DATETIME_FORMAT)
+
+
+def booking_event(booking, stamp):
+    """VEVENT content lines for one booking"""
+    items = booking.order.order_items.all() if booking.order else []
+    services = ', '.join(item.service.name for item in items) or 'Booking'
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{booking.booking_number}@azurehorizon',
+        f'DTSTAMP:{stamp}',
+        f'LAST-MODIFIED:{format_utc(booking.updated_at)}',
+    ]
+    if booking.booking_time:
+        start = timezone.make_aware(datetime.combine(booking.booking_date, booking.booking_time))
+        duration = max((item.service.time for item in items), default=60)
+        lines += [f'DTSTART:{format_utc(start)}', f'DTEND:{format_utc(start + timedelta(minutes=duration))}']
+    else:
+        lines += [
+            f"DTSTART;VALUE=DATE:{booking.booking_date.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{(booking.booking_date + timedelta(days=1)).strftime('%Y%m%d')}",
+        ]
+    lines += [
+        f'SUMMARY:{escape_text(services)} - Azure Horizon',
+        f'DESCRIPTION:{escape_text(f"Booking {booking.booking_number} for {booking.number_of_guests} guest(s)")}',
+        'STATUS:CANCELLED' if booking.status == BookingStatusChoices.CANCELLED else 'STATUS:CONFIRMED',
+        'END:VEVENT',
+    ]
+    return ''.join(fold_line(line) for line in lines)
+
+
+def calendar_chunks(kind, object_id, name):
+    """Yield the calendar as text, one chunk of bookings at a time"""
+    chunk_size = settings.BOOKING_CALENDAR_CHUNK_SIZE
+    stamp = timezone.now().strftime(ICS_DATETIME_FORMAT)
+    yield ''.join(fold_line(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Azure Horizon//Bookings//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{escape_text(name)}',
+    ])
+    bookings = (
+        feed_bookings(kind, object_id)
+        .select_related('order')
+        .prefetch_related(Prefetch(
+            'order__order_items', queryset=OrderItem.objects.select_related('service').only('order', 'service', 'service__name', 'service__time')
+        ))
+        .order_by('booking_date', 'id')
+        .iterator(chunk_size=chunk_size)
+    )
+    events = []
+    for booking in bookings:
+        events.append(booking_event(booking, stamp))
+        if len(events) >= chunk_size:
+            yield ''.join(events)
+            events = []
+    yield ''.join(events) + fold_line('END:VCALENDAR')
+
+
+async def stream_calendar(kind, object_id, name):
+    """
+    Async wrapper around calendar_chunks for ASGI responses
+
+    Each chunk is produced on Django's sync thread, keeping the server-side
+    cursor on one connection, while the response streams it out.
+    """
+    chunks = calendar_chunks(kind, object_id, name)
+    done = object()
+    while True:
+        chunk = await sync_to_async(next, thread_sensitive=True)(chunks, done)
+        if chunk is done:
+            break
+        yield chunk
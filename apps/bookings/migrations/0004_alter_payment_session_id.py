@@ -0,0 +1,24 @@
+# Generated by Django 4.2.3 on 2026-10-19 03:54
+
+from django.db import migrations, models
+
+
+def blank_session_ids_to_null(apps, schema_editor):
+    Payment = apps.get_model('bookings', 'Payment')
+    Payment.objects.filter(session_id='').update(session_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_alter_booking_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_session_ids_to_null, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='payment',
+            name='session_id',
+            field=models.CharField(blank=True, help_text='Stripe session ID for payment tracking', max_length=200, null=True, unique=True),
+        ),
+    ]
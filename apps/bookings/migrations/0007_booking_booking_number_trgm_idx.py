@@ -0,0 +1,19 @@
+# Generated by Django 4.2.3 on 2026-10-19 04:00
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_remove_booking_bookings_bo_user_id_0e7f91_idx_and_more'),
+        ('cart', '0004_orderdetail_order_number_trgm_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['booking_number'], name='booking_number_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-19 04:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_booking_number_trgm_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE SEQUENCE IF NOT EXISTS bookings_booking_number_seq',
+            'DROP SEQUENCE IF EXISTS bookings_booking_number_seq',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.3 on 2026-10-19 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_booking_number_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='follow_up_sent_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('reminder_sent_at__isnull', True)), fields=['booking_date', 'status'], name='booking_reminder_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('follow_up_sent_at__isnull', True)), fields=['booking_date', 'status'], name='booking_follow_up_due_idx'),
+        ),
+    ]
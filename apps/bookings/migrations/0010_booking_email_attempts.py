@@ -0,0 +1,23 @@
+# Generated by Django 4.2.3 on 2026-10-19 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_booking_follow_up_sent_at_booking_reminder_sent_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='follow_up_attempts',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='reminder_attempts',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
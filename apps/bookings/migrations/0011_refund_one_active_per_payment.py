@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-19 04:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0010_booking_email_attempts'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='refund',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('queued', 'processing', 'succeeded'))), fields=('payment',), name='refund_one_active_per_payment'),
+        ),
+    ]
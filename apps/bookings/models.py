@@ -1,10 +1,21 @@
 # Create your models here.
+import uuid
+
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
 from decimal import Decimal
 
 from apps.authentication.models import User
 from apps.cart.models import OrderDetail
-from utils import ActiveModel, TimeStampedModel, BookingStatusChoices, PaymentMethodChoices, PaymentStatusChoices
+from utils import (
+    ActiveModel, TimeStampedModel, BookingStatusChoices, PaymentMethodChoices, PaymentStatusChoices, RefundStatusChoices
+)
+from utils.numbering import next_number
+
+BOOKING_NUMBER_SEQUENCE = 'bookings_booking_number_seq'
+
+# A payment has at most one refund in these statuses; failed ones can be retried
+ACTIVE_REFUND_STATUSES = (RefundStatusChoices.QUEUED, RefundStatusChoices.PROCESSING, RefundStatusChoices.SUCCEEDED)
 
 
 class Booking(TimeStampedModel, ActiveModel):
@@ -31,14 +42,30 @@ class Booking(TimeStampedModel, ActiveModel):
     # Additional Information
     special_requests = models.TextField(null=True, blank=True)
     admin_notes = models.TextField(null=True, blank=True, help_text="Internal notes for staff")
+
+    # Scheduled emails (set when claimed, so reruns never send twice)
+    reminder_sent_at = models.DateTimeField(null=True, blank=True, editable=False)
+    follow_up_sent_at = models.DateTimeField(null=True, blank=True, editable=False)
+    reminder_attempts = models.PositiveSmallIntegerField(default=0, editable=False)
+    follow_up_attempts = models.PositiveSmallIntegerField(default=0, editable=False)
     
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['booking_number']),
-            models.Index(fields=['user']),
+            models.Index(fields=['user', '-created_at', '-id'], include=['status'], name='booking_user_created_idx'),
             models.Index(fields=['status']),
+            GinIndex(fields=['booking_number'], name='booking_number_trgm_idx', opclasses=['gin_trgm_ops']),
+            # Only bookings still waiting for an email stay in these indexes
+            models.Index(
+                fields=['booking_date', 'status'], name='booking_reminder_due_idx',
+                condition=models.Q(reminder_sent_at__isnull=True)
+            ),
+            models.Index(
+                fields=['booking_date', 'status'], name='booking_follow_up_due_idx',
+                condition=models.Q(follow_up_sent_at__isnull=True)
+            ),
         ]
     
     def __str__(self):
@@ -46,12 +73,7 @@ class Booking(TimeStampedModel, ActiveModel):
     
     def save(self, *args, **kwargs):
         if not self.booking_number:
-            # Generate unique booking number
-            import uuid
-            from datetime import datetime
-            timestamp = datetime.now().strftime('%Y%m%d')
-            unique_id = str(uuid.uuid4())[:8].upper()
-            self.booking_number = f"BK-{timestamp}-{unique_id}"
+            self.booking_number = next_number('BK', BOOKING_NUMBER_SEQUENCE)
         is_new = self.pk is None
         super().save(*args, **kwargs)
         if not is_new:
@@ -76,7 +98,7 @@ class Payment(TimeStampedModel):
     payment_status = models.CharField(max_length=24, choices=PaymentStatusChoices.choices, default=PaymentStatusChoices.INITIATED)
     
     transaction_id = models.CharField(max_length=100, null=True, blank=True)
-    session_id = models.CharField(max_length=200, null=True, blank=True, help_text="Stripe session ID for payment tracking")
+    session_id = models.CharField(max_length=200, null=True, blank=True, unique=True, help_text="Stripe session ID for payment tracking")
     payment_date = models.DateTimeField(auto_now_add=True)
     
     notes = models.TextField(null=True, blank=True)
@@ -86,3 +108,39 @@ class Payment(TimeStampedModel):
     
     def __str__(self):
         return f"Payment #{self.id} - {self.booking.booking_number} - ${self.amount}"
+
+
+def generate_idempotency_key():
+    return uuid.uuid4().hex
+
+
+class Refund(TimeStampedModel):
+    """Queued Stripe refunds, processed in batches by a Celery worker"""
+
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='refunds')
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='refunds')
+
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    reason = models.CharField(max_length=50, default='requested_by_customer')
+    status = models.CharField(max_length=24, choices=RefundStatusChoices.choices, default=RefundStatusChoices.QUEUED)
+
+    idempotency_key = models.CharField(max_length=64, unique=True, default=generate_idempotency_key, editable=False)
+    stripe_refund_id = models.CharField(max_length=100, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['payment'], condition=models.Q(status__in=ACTIVE_REFUND_STATUSES),
+                name='refund_one_active_per_payment'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Refund #{self.id} - {self.booking.booking_number} - ${self.amount} ({self.status})"
@@ -0,0 +1,147 @@
+"""
+Refund queue helpers
+
+Refunds are recorded as queued rows first and submitted to Stripe later by
+``tasks.process_refund_queue``, so cancellations never wait on Stripe.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from utils.choices import PaymentMethodChoices, PaymentStatusChoices, RefundStatusChoices
+
+from .models import ACTIVE_REFUND_STATUSES, Booking, Payment, Refund
+from .stripe_utils import create_refund
+from .transitions import transition
+
+
+def enqueue_refunds(bookings, reason='requested_by_customer'):
+    """
+    Queue full refunds for the completed Stripe payments of the given bookings
+
+    Payments that already have a queued, in-flight or successful refund are skipped.
+    Callers racing on the same payment (a cancellation and a late webhook) are
+    settled by the refund_one_active_per_payment constraint: the losing insert
+    is dropped, so only one refund ever reaches Stripe.
+
+    Args:
+        bookings: Booking queryset or iterable of bookings/IDs
+        reason: Stripe refund reason
+
+    Returns:
+        list: Created Refund instances
+    """
+    payments = Payment.objects.filter(
+        booking__in=bookings,
+        payment_method=PaymentMethodChoices.ONLINE,
+        payment_status=PaymentStatusChoices.COMPLETED,
+        transaction_id__isnull=False,
+    ).exclude(transaction_id='').exclude(refunds__status__in=ACTIVE_REFUND_STATUSES)
+    refunds = [
+        Refund(booking_id=payment.booking_id, payment=payment, amount=payment.amount, reason=reason)
+        for payment in payments
+    ]
+    if not refunds:
+        return []
+    Refund.objects.bulk_create(refunds, ignore_conflicts=True)
+    # Conflicting rows were not inserted; their idempotency keys are unknown to the table
+    return list(Refund.objects.filter(idempotency_key__in=[refund.idempotency_key for refund in refunds]))
+
+
+def claim_refunds(batch_size):
+    """
+    Mark up to ``batch_size`` queued refunds as processing and return them
+
+    Refunds left in processing by a crashed worker are claimed again after
+    REFUND_CLAIM_TIMEOUT seconds; their idempotency key makes the retry safe.
+    """
+    stale_before = timezone.now() - timedelta(seconds=settings.REFUND_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        refunds = list(
+            Refund.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('payment')
+            .filter(
+                Q(status=RefundStatusChoices.QUEUED)
+                | Q(status=RefundStatusChoices.PROCESSING, updated_at__lt=stale_before)
+            )
+            .order_by('created_at')[:batch_size]
+        )
+        Refund.objects.filter(id__in=[refund.id for refund in refunds]).update(
+            status=RefundStatusChoices.PROCESSING,
+            updated_at=timezone.now()
+        )
+    return refunds
+
+
+def submit_refunds(refunds):
+    """
+    Submit refunds to Stripe with bounded concurrency
+
+    Only the Stripe calls run in the pool; every database write stays on the
+    calling thread.
+
+    Returns:
+        list: (refund, result) pairs, result as returned by create_refund
+    """
+    def submit(refund):
+        try:
+            return create_refund(
+                refund.payment.transaction_id,
+                amount=refund.amount,
+                reason=refund.reason,
+                idempotency_key=refund.idempotency_key
+            )
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=settings.REFUND_CONCURRENCY) as executor:
+        return list(zip(refunds, executor.map(submit, refunds)))
+
+
+def record_refund_results(results):
+    """
+    Persist Stripe outcomes on refunds, payments and bookings
+
+    Failed refunds go back to the queue until REFUND_MAX_ATTEMPTS is reached.
+
+    Returns:
+        tuple: (succeeded, failed) counts
+    """
+    now = timezone.now()
+    succeeded, failed = [], []
+    for refund, result in results:
+        refund.attempts += 1
+        refund.updated_at = now
+        if result['success']:
+            refund.status = RefundStatusChoices.SUCCEEDED
+            refund.stripe_refund_id = result['refund_id']
+            refund.last_error = None
+            refund.processed_at = now
+            succeeded.append(refund)
+        else:
+            refund.last_error = result.get('error')
+            if refund.attempts >= settings.REFUND_MAX_ATTEMPTS:
+                refund.status = RefundStatusChoices.FAILED
+                refund.processed_at = now
+            else:
+                refund.status = RefundStatusChoices.QUEUED
+            failed.append(refund)
+
+    with transaction.atomic():
+        Refund.objects.bulk_update(
+            succeeded + failed,
+            ['status', 'stripe_refund_id', 'attempts', 'last_error', 'processed_at', 'updated_at']
+        )
+        transition(
+            Payment.objects.filter(id__in=[refund.payment_id for refund in succeeded]),
+            payment_status=PaymentStatusChoices.REFUNDED, updated_at=now
+        )
+        transition(
+            Booking.objects.filter(id__in=[refund.booking_id for refund in succeeded]),
+            payment_status=PaymentStatusChoices.REFUNDED, updated_at=now
+        )
+    return len(succeeded), len(failed)
@@ -0,0 +1,147 @@
+"""
+Scheduled booking emails
+
+Pre-arrival reminders and post-stay follow-ups are sent in batches by beat
+tasks. Each batch is claimed by stamping its sent marker first, then
+rendered from one compiled template and sent over one SMTP connection.
+Bookings whose email fails are released again for the next run, until
+EMAIL_MAX_ATTEMPTS sends have failed; then the marker stays set and the
+booking is given up on.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from utils.choices import BookingStatusChoices
+from utils.email import build_email_messages, send_email_batch
+from utils.metrics import increment
+
+from .models import Booking
+
+REMINDER = 'reminder'
+FOLLOW_UP = 'follow_up'
+
+SCHEDULED_EMAILS = {
+    REMINDER: {
+        'marker': 'reminder_sent_at',
+        'attempts': 'reminder_attempts',
+        'statuses': (BookingStatusChoices.CONFIRMED,),
+        'template_name': 'booking-reminder.html',
+        'subject': "Your visit is coming up | {booking_number} | Azure Horizon",
+    },
+    FOLLOW_UP: {
+        'marker': 'follow_up_sent_at',
+        'attempts': 'follow_up_attempts',
+        'statuses': (
+            BookingStatusChoices.CONFIRMED, BookingStatusChoices.IN_PROGRESS, BookingStatusChoices.COMPLETED
+        ),
+        'template_name': 'booking-follow-up.html',
+        'subject': "How was your visit? | {booking_number} | Azure Horizon",
+    },
+}
+
+
+def booking_date_window(kind, today):
+    """Range of booking dates that are due for ``kind`` on ``today``"""
+    if kind == REMINDER:
+        return today, today + timedelta(days=settings.BOOKING_REMINDER_DAYS_AHEAD)
+    return today - timedelta(days=settings.BOOKING_FOLLOW_UP_LOOKBACK_DAYS), today - timedelta(days=1)
+
+
+def claim_due_bookings(kind, batch_size, exclude_ids=()):
+    """
+    Stamp the sent marker on up to ``batch_size`` due bookings and return them
+
+    Rows locked by a concurrent run are skipped, so overlapping runs never
+    pick the same booking.
+    """
+    config = SCHEDULED_EMAILS[kind]
+    marker = config['marker']
+    with transaction.atomic():
+        bookings = list(
+            Booking.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('order', 'user')
+            .filter(
+                booking_date__range=booking_date_window(kind, timezone.localdate()),
+                status__in=config['statuses'],
+                **{f'{marker}__isnull': True, f"{config['attempts']}__lt": settings.EMAIL_MAX_ATTEMPTS}
+            )
+            .exclude(id__in=exclude_ids)
+            .order_by('booking_date', 'id')[:batch_size]
+        )
+        Booking.objects.filter(id__in=[booking.id for booking in bookings]).update(**{marker: timezone.now()})
+    return bookings
+
+
+def release_bookings(kind, bookings):
+    """
+    Record a failed send and clear the sent marker so the bookings are picked up again
+
+    Bookings that used up EMAIL_MAX_ATTEMPTS keep their marker: a permanently
+    bad address is not retried on every run.
+
+    Returns:
+        int: Number of bookings given up on
+    """
+    config = SCHEDULED_EMAILS[kind]
+    attempts = config['attempts']
+    failed = Booking.objects.filter(id__in=[booking.id for booking in bookings])
+    failed.update(**{attempts: F(attempts) + 1})
+    failed.filter(**{f'{attempts}__lt': settings.EMAIL_MAX_ATTEMPTS}).update(**{config['marker']: None})
+    return failed.filter(**{f'{attempts}__gte': settings.EMAIL_MAX_ATTEMPTS}).count()
+
+
+def email_context(booking):
+    """Per-recipient template context for a scheduled booking email"""
+    return {
+        "booking_number": booking.booking_number,
+        "guest_name": booking.order.customer_name if booking.order else booking.user.full_name,
+        "booking_date": booking.booking_date.strftime('%B %d, %Y'),
+        "booking_time": booking.booking_time.strftime('%I:%M %p') if booking.booking_time else 'N/A',
+        "number_of_guests": booking.number_of_guests,
+        "review_url": settings.BOOKING_REVIEW_URL,
+    }
+
+
+def recipient_email(booking):
+    if booking.order and booking.order.customer_email:
+        return booking.order.customer_email
+    return booking.user.email if booking.user else None
+
+
+def send_due_emails(kind, batch_size=None):
+    """
+    Send every due email of ``kind``, one batch and SMTP connection at a time
+
+    Returns:
+        dict: Counts of emails sent and failed
+    """
+    config = SCHEDULED_EMAILS[kind]
+    batch_size = batch_size or settings.BOOKING_EMAIL_BATCH_SIZE
+    summary = {'sent': 0, 'failed': 0, 'abandoned': 0}
+    failed_ids = []
+
+    while True:
+        bookings = claim_due_bookings(kind, batch_size, exclude_ids=failed_ids)
+        if not bookings:
+            break
+        recipients = [booking for booking in bookings if recipient_email(booking)]
+        messages = build_email_messages(
+            config['subject'],
+            config['template_name'],
+            [(recipient_email(booking), email_context(booking)) for booking in recipients]
+        )
+        results = send_email_batch(messages)
+        failed = [booking for booking, sent in zip(recipients, results) if not sent]
+        summary['abandoned'] += release_bookings(kind, failed)
+        failed_ids.extend(booking.id for booking in failed)
+        summary['sent'] += len(recipients) - len(failed)
+        summary['failed'] += len(failed)
+
+    increment('booking_emails_sent_total', summary['sent'], kind=kind)
+    increment('booking_emails_failed_total', summary['failed'], kind=kind)
+    increment('booking_emails_abandoned_total', summary['abandoned'], kind=kind)
+    return summary
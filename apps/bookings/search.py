@@ -0,0 +1,47 @@
+"""
+Staff booking search
+
+Matches bookings by booking number or by the order number, customer name,
+email and phone of their order, using pg_trgm GIN indexes. Each table is
+probed through its own indexes and the results are ranked by similarity.
+"""
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from apps.cart.models import OrderDetail
+from apps.cart.search import order_search_filter, order_search_rank
+
+from .models import Booking
+
+
+def booking_search_filter(term):
+    """
+    Q matching bookings by booking number or by their order's customer fields
+
+    The order side is a separate subquery so that both tables can use their
+    own trigram indexes rather than a join-wide OR.
+    """
+    matching_orders = OrderDetail.objects.filter(order_search_filter(term)).values('id')
+    return Q(booking_number__trigram_word_similar=term) | Q(order_id__in=matching_orders)
+
+
+def search_bookings(term, limit=None):
+    """
+    Bookings matching ``term``, best matches first
+
+    Args:
+        term (str): Search text, at least BOOKING_SEARCH_MIN_LENGTH characters
+        limit (int): Maximum number of results, defaults to BOOKING_SEARCH_LIMIT
+
+    Returns:
+        QuerySet: Bookings annotated with a ``rank`` between 0 and 1
+    """
+    limit = limit or settings.BOOKING_SEARCH_LIMIT
+    return (
+        Booking.objects.filter(booking_search_filter(term))
+        .select_related('order')
+        .annotate(rank=Greatest(TrigramWordSimilarity(term, 'booking_number'), order_search_rank(term, 'order__')))
+        .order_by('-rank', '-created_at')[:limit]
+    )
@@ -1,8 +1,11 @@
 from rest_framework import serializers
 from django.conf import settings
+from django.db import transaction
 
 from apps.authentication.serializers import UserSerializer
 from apps.cart.serializers import OrderDetailSerializer
+from apps.notifications.outbox import enqueue_email
+from .access import payment_access_token
 from .models import Booking, Payment
 
 
@@ -25,10 +28,25 @@ class BookingListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'booking_number', 'created_at']
 
 
+class BookingSearchSerializer(BookingListSerializer):
+    """Serializer for staff booking search results"""
+    order_number = serializers.CharField(source='order.order_number', default=None, read_only=True)
+    customer_name = serializers.CharField(source='order.customer_name', default=None, read_only=True)
+    customer_email = serializers.CharField(source='order.customer_email', default=None, read_only=True)
+    customer_phone = serializers.CharField(source='order.customer_phone', default=None, read_only=True)
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(BookingListSerializer.Meta):
+        fields = BookingListSerializer.Meta.fields + [
+            'order_number', 'customer_name', 'customer_email', 'customer_phone', 'rank'
+        ]
+
+
 class BookingDetailSerializer(serializers.ModelSerializer):
     """Serializer for booking details"""
     payments = PaymentSerializer(many=True, read_only=True)
     checkout_url = serializers.SerializerMethodField()
+    payment_token = serializers.SerializerMethodField()
     order = OrderDetailSerializer(read_only=True)
     
     class Meta:
@@ -43,6 +61,10 @@ class BookingDetailSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(f'/bookings/{obj.booking_number}/create-checkout-session/')
         return None
 
+    def get_payment_token(self, obj):
+        """Token for the payment-status and payment-events endpoints (?token=)"""
+        return payment_access_token(obj.booking_number)
+
 
 class BookingCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating bookings"""
@@ -78,6 +100,7 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         
         return attrs
     
+    @transaction.atomic
     def create(self, validated_data):
         services_data = validated_data.pop('services')
         
@@ -92,11 +115,9 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         booking.calculate_totals()
         booking.save()
         
-        # Send confirmation emails asynchronously
-        from utils import send_email_message
-        
+        # Confirmation emails commit with the booking, via the outbox
         # Email to customer
-        send_email_message.delay(
+        enqueue_email(
             subject=f"Booking Confirmation | {booking.booking_number} | Azure Horizon",
             template_name="booking-confirmation.html",
             context={
@@ -112,7 +133,7 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         )
         
         # Email to admin
-        send_email_message.delay(
+        enqueue_email(
             subject=f"New Booking Received | {booking.booking_number} | Azure Horizon",
             template_name="admin-booking-notification.html",
             context={
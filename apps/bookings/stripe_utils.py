@@ -1,15 +1,30 @@
 """
 Stripe payment integration utilities for booking system
 """
+import json
 import stripe
 from django.conf import settings
+from django.db import transaction
 from decimal import Decimal
+from redis.exceptions import RedisError
 import logging
 
+from utils.metrics import increment
+from utils.redis_client import get_redis
+
+from .access import payment_access_token
+
 logger = logging.getLogger(__name__)
 
+SESSION_CACHE_PREFIX = 'stripe:checkout-session:'
+# Sessions in these states never change again, so a stored copy stays valid
+TERMINAL_SESSION_STATUSES = ('complete', 'expired')
+
 # Configure Stripe
 stripe.api_key = settings.STRIPE_SECRET
+if settings.STRIPE_API_BASE:
+    # e.g. a local stripe-mock instance
+    stripe.api_base = settings.STRIPE_API_BASE
 
 
 def create_checkout_session(booking):
@@ -55,6 +70,8 @@ def create_checkout_session(booking):
             })
         
         # Create checkout session
+        # The return pages follow the payment through the token-protected status endpoints
+        access_token = payment_access_token(booking.booking_number)
         checkout_session = stripe.checkout.Session.create(
             payment_method_types=['card'],
             line_items=line_items,
@@ -66,8 +83,11 @@ def create_checkout_session(booking):
                 'booking_id': str(booking.id),
                 'guest_name': booking.order.customer_name,
             },
-            success_url=f"{settings.PAYMENT_SUCCESS_URL}?session_id={{CHECKOUT_SESSION_ID}}&booking_number={booking.booking_number}",
-            cancel_url=f"{settings.PAYMENT_CANCEL_URL}?booking_number={booking.booking_number}",
+            success_url=(
+                f"{settings.PAYMENT_SUCCESS_URL}?session_id={{CHECKOUT_SESSION_ID}}"
+                f"&booking_number={booking.booking_number}&token={access_token}"
+            ),
+            cancel_url=f"{settings.PAYMENT_CANCEL_URL}?booking_number={booking.booking_number}&token={access_token}",
         )
         
         logger.info(f"Stripe checkout session created for booking {booking.booking_number}: {checkout_session.id}")
@@ -110,6 +130,184 @@ def retrieve_checkout_session(session_id):
         return None
 
 
+def list_checkout_sessions(created_after, starting_after=None, limit=100):
+    """
+    List one page of Stripe Checkout Sessions created after a timestamp
+
+    Args:
+        created_after: Unix timestamp lower bound (inclusive)
+        starting_after: Last session ID of the previous page
+        limit: Page size (Stripe maximum is 100)
+
+    Returns:
+        stripe.ListObject: Page with ``data`` and ``has_more``
+    """
+    params = {'created': {'gte': created_after}, 'limit': limit}
+    if starting_after:
+        params['starting_after'] = starting_after
+    return stripe.checkout.Session.list(**params)
+
+
+def session_snapshot(session):
+    """
+    Reduce a Stripe checkout session to the fields the booking flow reads
+
+    Args:
+        session: stripe.checkout.Session or webhook event object
+
+    Returns:
+        dict: JSON serialisable session state
+    """
+    metadata = session.get('metadata') or {}
+    return {
+        'id': session.get('id'),
+        'status': session.get('status'),
+        'payment_status': session.get('payment_status'),
+        'customer_email': session.get('customer_email'),
+        'amount_total': session.get('amount_total'),
+        'payment_intent': session.get('payment_intent'),
+        'booking_number': metadata.get('booking_number'),
+    }
+
+
+def cache_checkout_session(session):
+    """
+    Store a session snapshot locally once the session reached a terminal state
+
+    Args:
+        session: stripe.checkout.Session, webhook event object or snapshot dict
+
+    Returns:
+        dict: The session snapshot
+    """
+    snapshot = session_snapshot(session)
+    if snapshot['status'] in TERMINAL_SESSION_STATUSES:
+        try:
+            get_redis().set(
+                SESSION_CACHE_PREFIX + snapshot['id'],
+                json.dumps(snapshot),
+                ex=settings.STRIPE_SESSION_CACHE_TTL
+            )
+        except RedisError as e:
+            logger.warning(f"Failed to cache Stripe session {snapshot['id']}: {str(e)}")
+    return snapshot
+
+
+def get_checkout_session(session_id):
+    """
+    Get a checkout session snapshot, served locally for terminal sessions
+
+    Falls back to a Stripe retrieve when the session is unknown or still open.
+
+    Args:
+        session_id: Stripe session ID
+
+    Returns:
+        dict or None: Session snapshot
+    """
+    try:
+        cached = get_redis().get(SESSION_CACHE_PREFIX + session_id)
+    except RedisError as e:
+        logger.warning(f"Failed to read cached Stripe session {session_id}: {str(e)}")
+        cached = None
+    if cached:
+        increment('stripe_session_cache_hits_total')
+        return json.loads(cached)
+
+    increment('stripe_session_cache_misses_total')
+    session = retrieve_checkout_session(session_id)
+    if not session:
+        return None
+    return cache_checkout_session(session)
+
+
+@transaction.atomic
+def apply_paid_checkout_session(booking, snapshot):
+    """
+    Record a paid checkout session against its booking, order and cart
+
+    Safe to call repeatedly for the same session: the payment row is keyed by the
+    session ID and every status change is a guarded transition, so the payment
+    confirmation email is queued once, by whichever path (webhook, return page
+    or reconciliation) marks the booking paid. A payment that lands on a
+    booking which was cancelled meanwhile is queued for refund.
+
+    Args:
+        booking: Booking instance (with its order)
+        snapshot: Session snapshot as returned by session_snapshot
+
+    Returns:
+        tuple: (payment_recorded, booking_paid)
+    """
+    from apps.cart.models import Cart, OrderDetail
+    from utils.choices import (
+        BookingStatusChoices, CartStatusChoices, OrderStatusChoices, PaymentMethodChoices, PaymentStatusChoices
+    )
+    from .events import publish_payment_event
+    from .models import Booking, Payment
+    from .refunds import enqueue_refunds
+    from .transitions import complete_booking_payment, transition
+
+    # Complete the payment started at checkout, or record one if there is none
+    payment_recorded = bool(transition(
+        Payment.objects.filter(session_id=snapshot['id']),
+        payment_status=PaymentStatusChoices.COMPLETED,
+        transaction_id=snapshot['payment_intent']
+    ))
+    if not payment_recorded:
+        _, payment_recorded = Payment.objects.get_or_create(
+            session_id=snapshot['id'],
+            defaults={
+                'booking': booking,
+                'amount': Decimal(snapshot['amount_total'] or 0) / 100,
+                'payment_method': PaymentMethodChoices.ONLINE,
+                'payment_status': PaymentStatusChoices.COMPLETED,
+                'transaction_id': snapshot['payment_intent'],
+                'notes': f"Stripe payment - Session ID: {snapshot['id']}",
+            }
+        )
+
+    booking_paid = complete_booking_payment(booking)
+    if booking_paid:
+        transition(
+            OrderDetail.objects.filter(pk=booking.order_id),
+            status=OrderStatusChoices.COMPLETED,
+            payment_status=PaymentStatusChoices.COMPLETED
+        )
+        Cart.objects.filter(orders=booking.order_id, status=CartStatusChoices.OPEN).update(status=CartStatusChoices.CLOSED)
+        queue_payment_confirmation(booking, snapshot)
+        publish_payment_event(booking)
+    elif payment_recorded:
+        refunds = enqueue_refunds(Booking.objects.filter(pk=booking.pk, status=BookingStatusChoices.CANCELLED))
+        logger.warning(f"Payment received for booking {booking.booking_number} that cannot take it, refunds queued: {len(refunds)}")
+    return payment_recorded, booking_paid
+
+
+def queue_payment_confirmation(booking, snapshot):
+    """
+    Queue the payment confirmation email for a booking that was just paid
+
+    Args:
+        booking: Booking instance (with its order)
+        snapshot: Session snapshot as returned by session_snapshot
+    """
+    from apps.notifications.outbox import enqueue_email
+
+    enqueue_email(
+        subject=f"Payment Confirmation | {booking.booking_number} | Azure Horizon",
+        template_name="payment-confirmation.html",
+        context={
+            "booking_number": booking.booking_number,
+            "guest_name": booking.order.customer_name,
+            "amount": str(Decimal(snapshot['amount_total'] or 0) / 100),
+            "transaction_id": snapshot['payment_intent'],
+            "payment_method": "Credit/Debit Card",
+            "booking_date": booking.booking_date.strftime('%B %d, %Y'),
+        },
+        recipient_list=[booking.order.customer_email]
+    )
+
+
 def handle_checkout_session_completed(session):
     """
     Handle successful checkout session completion
@@ -122,63 +320,28 @@ def handle_checkout_session_completed(session):
         bool: Success status
     """
     try:
-        from .models import Booking, Payment
-        
-        booking_number = session.metadata.get('booking_number')
+        from .models import Booking
+
+        snapshot = cache_checkout_session(session)
+        booking_number = snapshot['booking_number']
         
         if not booking_number:
             logger.error("No booking number in session metadata")
             return False
         
-        booking = Booking.objects.filter(booking_number=booking_number).first()
+        booking = Booking.objects.select_related('order').filter(booking_number=booking_number).first()
         
         if not booking:
             logger.error(f"Booking {booking_number} not found")
             return False
         
-        # Get payment intent to retrieve more details
-        payment_intent_id = session.payment_intent
-        
-        # Create payment record
-        payment = Payment.objects.create(
-            booking=booking,
-            amount=Decimal(session.amount_total / 100),  # Convert from cents
-            payment_method='online',
-            payment_status='completed',
-            transaction_id=payment_intent_id,
-            notes=f"Stripe payment - Session ID: {session.id}"
-        )
-        
-        # Update booking payment status
-        total_paid = sum(p.amount for p in booking.payments.filter(payment_status='completed'))
-        
-        if total_paid >= booking.total_amount:
-            booking.payment_status = 'paid'
-            booking.status = 'confirmed'
-        elif total_paid > 0:
-            booking.payment_status = 'partial'
-        
-        booking.save()
-        
-        logger.info(f"Payment recorded for booking {booking_number}: ${payment.amount}")
-        
-        # Send payment confirmation email
-        from utils import send_email_message
-        
-        send_email_message.delay(
-            subject=f"Payment Confirmation | {booking.booking_number} | Azure Horizon",
-            template_name="payment-confirmation.html",
-            context={
-                "booking_number": booking.booking_number,
-                "guest_name": booking.order.customer_name,
-                "amount": str(payment.amount),
-                "transaction_id": payment_intent_id,
-                "payment_method": "Credit/Debit Card",
-                "booking_date": booking.booking_date.strftime('%B %d, %Y'),
-            },
-            recipient_list=[booking.guest_email]
-        )
+        payment_recorded, booking_paid = apply_paid_checkout_session(booking, snapshot)
+        if not payment_recorded:
+            logger.info(f"Duplicate checkout.session.completed ignored for booking {booking_number}")
+            return True
         
+        amount = Decimal(snapshot['amount_total'] or 0) / 100  # Convert from cents
+        logger.info(f"Payment recorded for booking {booking_number}: ${amount}")
         return True
         
     except Exception as e:
@@ -186,7 +349,7 @@ def handle_checkout_session_completed(session):
         return False
 
 
-def create_refund(payment_intent_id, amount=None, reason='requested_by_customer'):
+def create_refund(payment_intent_id, amount=None, reason='requested_by_customer', idempotency_key=None):
     """
     Create a refund for a payment
     
@@ -194,6 +357,7 @@ def create_refund(payment_intent_id, amount=None, reason='requested_by_customer'
         payment_intent_id: Stripe payment intent ID
         amount: Amount to refund in dollars (None for full refund)
         reason: Refund reason
+        idempotency_key: Key making retries of the same refund safe
         
     Returns:
         dict: Refund result
@@ -207,7 +371,7 @@ def create_refund(payment_intent_id, amount=None, reason='requested_by_customer'
         if amount:
             refund_params['amount'] = int(amount * 100)  # Convert to cents
         
-        refund = stripe.Refund.create(**refund_params)
+        refund = stripe.Refund.create(**refund_params, idempotency_key=idempotency_key)
         
         logger.info(f"Refund created for payment intent {payment_intent_id}: {refund.id}")
         
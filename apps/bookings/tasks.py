@@ -0,0 +1,200 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from apps.cart.models import Cart, OrderDetail
+from utils.choices import (
+    BookingStatusChoices, CartStatusChoices, OrderStatusChoices, PaymentStatusChoices
+)
+
+from .events import publish_payment_event
+from .models import Booking, Payment
+from .reminders import FOLLOW_UP, REMINDER, send_due_emails
+from .refunds import claim_refunds, enqueue_refunds, record_refund_results, submit_refunds
+from .stripe_utils import (
+    apply_paid_checkout_session, cache_checkout_session, list_checkout_sessions, queue_payment_confirmation
+)
+from .transitions import (
+    PAYABLE_BOOKING_STATUSES, PAYMENT_STATUS_TRANSITIONS, complete_booking_payments, transition
+)
+
+payment_logger = logging.getLogger('payment_logs')
+email_logger = logging.getLogger('system_logs')
+
+OPEN_PAYMENT_STATUSES = (PaymentStatusChoices.INITIATED, PaymentStatusChoices.WAITING_FOR_CONFIRMATION)
+
+
+@shared_task
+def reconcile_stripe_sessions(lookback_hours=None):
+    """
+    Catch up on checkout sessions whose webhook never arrived
+
+    Pages through recent Stripe sessions and applies the paid/expired outcome to
+    any payment still waiting for it, one bulk lookup and update set per page.
+    Paid sessions without a payment row (booking-level checkout) are matched to
+    their booking by the booking number in the session metadata.
+
+    Returns:
+        dict: Counts of sessions seen, payments completed and payments failed
+    """
+    lookback_hours = lookback_hours or settings.STRIPE_RECONCILE_LOOKBACK_HOURS
+    created_after = int((timezone.now() - timedelta(hours=lookback_hours)).timestamp())
+    summary = {'sessions': 0, 'completed': 0, 'failed': 0}
+    starting_after = None
+
+    while True:
+        page = list_checkout_sessions(created_after, starting_after=starting_after)
+        if not page.data:
+            break
+        summary['sessions'] += len(page.data)
+        completed, failed = _reconcile_page(page.data)
+        summary['completed'] += completed
+        summary['failed'] += failed
+        if not page.has_more:
+            break
+        starting_after = page.data[-1].id
+
+    payment_logger.info(f"Stripe reconciliation finished: {summary}")
+    return summary
+
+
+@shared_task
+def process_refund_queue(batch_size=None):
+    """
+    Submit queued refunds to Stripe and record the outcome
+
+    Returns:
+        dict: Counts of refunds claimed, succeeded and failed
+    """
+    refunds = claim_refunds(batch_size or settings.REFUND_BATCH_SIZE)
+    if not refunds:
+        return {'claimed': 0, 'succeeded': 0, 'failed': 0}
+    succeeded, failed = record_refund_results(submit_refunds(refunds))
+    summary = {'claimed': len(refunds), 'succeeded': succeeded, 'failed': failed}
+    payment_logger.info(f"Refund batch processed: {summary}")
+    return summary
+
+
+@shared_task
+def send_booking_reminders():
+    """Send pre-arrival reminders for confirmed bookings coming up soon"""
+    summary = send_due_emails(REMINDER)
+    email_logger.info(f"Booking reminders sent: {summary}")
+    return summary
+
+
+@shared_task
+def send_booking_follow_ups():
+    """Send post-stay follow-ups asking guests for a review"""
+    summary = send_due_emails(FOLLOW_UP)
+    email_logger.info(f"Booking follow-ups sent: {summary}")
+    return summary
+
+
+def _reconcile_page(sessions):
+    sessions_by_id = {session.id: session for session in sessions}
+    payments = list(Payment.objects.filter(session_id__in=list(sessions_by_id)).only(
+        'id', 'booking_id', 'session_id', 'payment_status'
+    ))
+    paid, expired = [], []
+
+    for payment in payments:
+        if payment.payment_status not in OPEN_PAYMENT_STATUSES:
+            continue
+        session = sessions_by_id[payment.session_id]
+        if _is_paid(session):
+            paid.append((payment, cache_checkout_session(session)))
+        elif session.status == 'expired':
+            expired.append(payment)
+            cache_checkout_session(session)
+
+    # Booking-level checkouts create no payment row until they are paid
+    recorded_session_ids = {payment.session_id for payment in payments}
+    unrecorded = [
+        session for session in sessions
+        if session.id not in recorded_session_ids and _is_paid(session)
+        and (session.get('metadata') or {}).get('booking_number')
+    ]
+
+    completed, failed = _apply_open_payments(paid, expired) if paid or expired else (0, 0)
+    return completed + _apply_unrecorded_sessions(unrecorded), failed
+
+
+def _is_paid(session):
+    return session.status == 'complete' and session.payment_status == 'paid'
+
+
+def _apply_open_payments(paid, expired):
+    """Bulk-apply sessions to the payment rows started at cart checkout"""
+    paid_booking_ids = [payment.booking_id for payment, _ in paid]
+    expired_booking_ids = [payment.booking_id for payment in expired]
+    snapshots = {payment.booking_id: snapshot for payment, snapshot in paid}
+    with transaction.atomic():
+        # Guarded updates: a webhook that already moved a payment on wins
+        completed = transition(
+            Payment.objects.filter(id__in=[payment.id for payment, _ in paid]),
+            payment_status=PaymentStatusChoices.COMPLETED,
+            transaction_id=Case(*[
+                When(id=payment.id, then=Value(snapshot['payment_intent'])) for payment, snapshot in paid
+            ])
+        )
+        failed = transition(
+            Payment.objects.filter(id__in=[payment.id for payment in expired]),
+            payment_status=PaymentStatusChoices.FAILED
+        )
+        # Locked, these are exactly the bookings complete_booking_payments moves to paid
+        newly_paid = list(
+            Booking.objects.select_for_update().select_related('order')
+            .filter(
+                id__in=paid_booking_ids, status__in=PAYABLE_BOOKING_STATUSES,
+                payment_status__in=PAYMENT_STATUS_TRANSITIONS[PaymentStatusChoices.COMPLETED]
+            )
+        )
+        complete_booking_payments(Booking.objects.filter(id__in=paid_booking_ids))
+        transition(
+            OrderDetail.objects.filter(
+                booking__id__in=paid_booking_ids, booking__payment_status=PaymentStatusChoices.COMPLETED
+            ),
+            status=OrderStatusChoices.COMPLETED,
+            payment_status=PaymentStatusChoices.COMPLETED
+        )
+        Cart.objects.filter(
+            orders__booking__id__in=paid_booking_ids,
+            orders__booking__payment_status=PaymentStatusChoices.COMPLETED,
+            status=CartStatusChoices.OPEN
+        ).update(status=CartStatusChoices.CLOSED, updated_at=timezone.now())
+        transition(Booking.objects.filter(id__in=expired_booking_ids), payment_status=PaymentStatusChoices.FAILED)
+        # Money taken for bookings cancelled in the meantime goes straight back
+        enqueue_refunds(Booking.objects.filter(id__in=paid_booking_ids, status=BookingStatusChoices.CANCELLED))
+        for booking in newly_paid:
+            queue_payment_confirmation(booking, snapshots[booking.id])
+
+    for booking in Booking.objects.filter(id__in=paid_booking_ids + expired_booking_ids).only(
+        'booking_number', 'status', 'payment_status', 'total_amount'
+    ):
+        publish_payment_event(booking)
+    return completed, failed
+
+
+def _apply_unrecorded_sessions(sessions):
+    """Apply paid sessions that have no payment row, found by their booking number"""
+    snapshots = [cache_checkout_session(session) for session in sessions]
+    bookings = Booking.objects.select_related('order').in_bulk(
+        [snapshot['booking_number'] for snapshot in snapshots], field_name='booking_number'
+    )
+    completed = 0
+    for snapshot in snapshots:
+        booking = bookings.get(snapshot['booking_number'])
+        if booking is None:
+            payment_logger.warning(
+                f"Paid Stripe session {snapshot['id']} names unknown booking {snapshot['booking_number']}"
+            )
+            continue
+        payment_recorded, _ = apply_paid_checkout_session(booking, snapshot)
+        completed += payment_recorded
+    return completed
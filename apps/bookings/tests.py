@@ -0,0 +1,429 @@
+import asyncio
+import json
+import uuid
+from types import SimpleNamespace
+from unittest import mock
+
+import stripe
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from redis.exceptions import RedisError
+from rest_framework.test import APIClient
+
+from apps.cart.models import Cart, OrderDetail
+from apps.notifications.models import EmailOutbox
+from utils.choices import (
+    BookingStatusChoices, CartStatusChoices, OrderStatusChoices, PaymentMethodChoices, PaymentStatusChoices,
+    RefundStatusChoices
+)
+from utils.redis_client import get_async_redis, get_redis
+
+from . import ical
+from .access import payment_access_token
+from .events import (
+    acquire_stream_slot, payment_channel, publish_payment_event, stream_payment_events, stream_slots_key
+)
+from .models import Booking, Payment, Refund
+from .refunds import enqueue_refunds
+from .reminders import REMINDER, send_due_emails
+from .stripe_utils import apply_paid_checkout_session, session_snapshot
+from .tasks import reconcile_stripe_sessions
+
+
+def payment_state(booking_number, payment_status):
+    return {
+        "booking_number": booking_number,
+        "status": BookingStatusChoices.PENDING,
+        "payment_status": payment_status,
+        "total_amount": "10.50",
+    }
+
+
+@override_settings(BOOKING_EVENTS_STREAM_TIMEOUT=2, BOOKING_EVENTS_KEEPALIVE=1, BOOKING_EVENTS_MAX_STREAMS=2)
+class PaymentEventStreamTests(SimpleTestCase):
+    def setUp(self):
+        self.booking_number = f"BK-TEST-{uuid.uuid4().hex[:8]}"
+        self.addCleanup(get_redis().delete, stream_slots_key(self.booking_number))
+
+    async def collect(self, stream):
+        return [message async for message in stream]
+
+    async def test_settled_booking_ends_after_current_state(self):
+        async def load_state():
+            return payment_state(self.booking_number, PaymentStatusChoices.COMPLETED)
+
+        messages = await self.collect(stream_payment_events(self.booking_number, load_state))
+
+        self.assertTrue(messages[0].startswith("retry: "))
+        self.assertEqual(len(messages), 2)
+        self.assertIn('"payment_status": "completed"', messages[1])
+
+    async def test_published_change_is_streamed(self):
+        subscribed = asyncio.Event()
+
+        async def load_state():
+            subscribed.set()
+            return payment_state(self.booking_number, PaymentStatusChoices.INITIATED)
+
+        async def publish():
+            await subscribed.wait()
+            state = payment_state(self.booking_number, PaymentStatusChoices.COMPLETED)
+            get_redis().publish(payment_channel(self.booking_number), json.dumps(state))
+
+        messages, _ = await asyncio.gather(
+            self.collect(stream_payment_events(self.booking_number, load_state)), publish()
+        )
+
+        self.assertIn('"payment_status": "initiated"', messages[1])
+        self.assertIn('"payment_status": "completed"', messages[-1])
+        self.assertNotIn("event: timeout", "".join(messages))
+
+    async def test_idle_stream_times_out_and_releases_slot(self):
+        async def load_state():
+            return payment_state(self.booking_number, PaymentStatusChoices.INITIATED)
+
+        self.assertTrue(await acquire_stream_slot(self.booking_number))
+        messages = await self.collect(stream_payment_events(self.booking_number, load_state))
+
+        self.assertIn(": keepalive\n\n", messages)
+        self.assertTrue(messages[-1].startswith("event: timeout"))
+        self.assertEqual(int(get_redis().get(stream_slots_key(self.booking_number))), 0)
+
+    async def test_open_streams_are_capped_per_booking(self):
+        self.assertIs(await acquire_stream_slot(self.booking_number), True)
+        self.assertIs(await acquire_stream_slot(self.booking_number), True)
+        self.assertIs(await acquire_stream_slot(self.booking_number), False)
+        self.assertEqual(int(get_redis().get(stream_slots_key(self.booking_number))), 2)
+
+    async def test_release_never_drives_an_expired_counter_negative(self):
+        async def load_state():
+            return payment_state(self.booking_number, PaymentStatusChoices.COMPLETED)
+
+        # The counter expired while the stream was open
+        await self.collect(stream_payment_events(self.booking_number, load_state))
+        self.assertIsNone(get_redis().get(stream_slots_key(self.booking_number)))
+
+    async def test_stream_without_a_slot_releases_nothing(self):
+        async def load_state():
+            return payment_state(self.booking_number, PaymentStatusChoices.COMPLETED)
+
+        with mock.patch('apps.bookings.events.get_async_redis', side_effect=[FailingRedis(), get_async_redis()]):
+            self.assertIsNone(await acquire_stream_slot(self.booking_number))
+        self.assertIs(await acquire_stream_slot(self.booking_number), True)
+        await self.collect(stream_payment_events(self.booking_number, load_state, holds_slot=False))
+        self.assertEqual(int(get_redis().get(stream_slots_key(self.booking_number))), 1)
+
+
+class FailingRedis:
+    """Async Redis client whose commands fail as during an outage"""
+
+    def pipeline(self, transaction=True):
+        raise RedisError("connection refused")
+
+    async def aclose(self):
+        pass
+
+
+class PaymentEventPublishTests(TestCase):
+    def test_event_is_published_after_commit(self):
+        booking = SimpleNamespace(**payment_state('BK-PUBLISH', PaymentStatusChoices.COMPLETED))
+        with mock.patch('apps.bookings.events.get_redis') as redis:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with transaction.atomic():
+                    publish_payment_event(booking)
+                    redis.return_value.publish.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+        redis.return_value.publish.assert_called_once_with(payment_channel('BK-PUBLISH'), mock.ANY)
+
+
+def make_booking(user, session_id, **booking_fields):
+    """Booking from cart checkout, with its payment row; session_id=None for a booking-level checkout"""
+    cart = Cart.objects.create(user=user)
+    order = OrderDetail.objects.create(
+        user=user, cart=cart, customer_name='Guest', customer_email=user.email,
+        customer_phone='1', subtotal=10, tax=0.5, total_amount=10.5, checkout_date=timezone.now()
+    )
+    booking = Booking.objects.create(
+        user=user, order=order, booking_date=timezone.now().date(), total_amount=10.5, **booking_fields
+    )
+    if session_id:
+        Payment.objects.create(booking=booking, amount=10.5, session_id=session_id)
+    return booking
+
+
+def checkout_session(session_id, status, payment_status, booking_number=None):
+    """Checkout session as the Stripe client returns it"""
+    return stripe.checkout.Session.construct_from({
+        'id': session_id,
+        'object': 'checkout.session',
+        'status': status,
+        'payment_status': payment_status,
+        'customer_email': 'guest@example.com',
+        'amount_total': 1050,
+        'payment_intent': f'pi_{session_id}' if payment_status == 'paid' else None,
+        'metadata': {'booking_number': booking_number} if booking_number else {},
+    }, 'sk_test')
+
+
+def session_page(sessions, has_more=False):
+    return stripe.ListObject.construct_from({
+        'object': 'list', 'data': [session.to_dict_recursive() for session in sessions], 'has_more': has_more
+    }, 'sk_test')
+
+
+class StripeReconciliationTests(TestCase):
+    """Reconciliation and webhook handling against canned Stripe API responses"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='guest@example.com', username='guest', password='pw12345678', full_name='Guest', phone='1'
+        )
+
+    def make_booking(self, session_id, **booking_fields):
+        return make_booking(self.user, session_id, **booking_fields)
+
+    def test_reconcile_applies_missed_webhooks_across_pages(self):
+        paid = self.make_booking('cs_paid')
+        expired = self.make_booking('cs_expired')
+        still_open = self.make_booking('cs_open')
+        pages = [
+            session_page([checkout_session('cs_paid', 'complete', 'paid', paid.booking_number)], has_more=True),
+            session_page([
+                checkout_session('cs_expired', 'expired', 'unpaid', expired.booking_number),
+                checkout_session('cs_open', 'open', 'unpaid', still_open.booking_number),
+                checkout_session('cs_unknown', 'complete', 'paid'),
+            ]),
+        ]
+
+        with mock.patch('stripe.checkout.Session.list', side_effect=pages) as list_sessions:
+            summary = reconcile_stripe_sessions()
+
+        self.assertEqual(summary, {'sessions': 4, 'completed': 1, 'failed': 1})
+        self.assertEqual(list_sessions.call_args_list[1].kwargs['starting_after'], 'cs_paid')
+
+        paid.refresh_from_db()
+        self.assertEqual((paid.status, paid.payment_status), (BookingStatusChoices.CONFIRMED, PaymentStatusChoices.COMPLETED))
+        self.assertEqual(paid.payments.get().transaction_id, 'pi_cs_paid')
+        paid.order.refresh_from_db()
+        self.assertEqual(paid.order.status, OrderStatusChoices.COMPLETED)
+        self.assertEqual(paid.order.cart.status, CartStatusChoices.CLOSED)
+
+        expired.refresh_from_db()
+        self.assertEqual(expired.payment_status, PaymentStatusChoices.FAILED)
+        self.assertEqual(expired.payments.get().payment_status, PaymentStatusChoices.FAILED)
+        self.assertEqual(Booking.objects.get(pk=still_open.pk).payment_status, PaymentStatusChoices.INITIATED)
+
+        # A second run finds nothing left to do
+        with mock.patch('stripe.checkout.Session.list', return_value=session_page(pages[0].data + pages[1].data)):
+            self.assertEqual(reconcile_stripe_sessions(), {'sessions': 4, 'completed': 0, 'failed': 0})
+        self.assertEqual(
+            list(EmailOutbox.objects.values_list('context__booking_number', flat=True)), [paid.booking_number]
+        )
+
+    def test_reconcile_records_booking_checkout_without_payment_row(self):
+        booking = self.make_booking(None)
+        page = session_page([checkout_session('cs_booking', 'complete', 'paid', booking.booking_number)])
+
+        with mock.patch('stripe.checkout.Session.list', return_value=page):
+            self.assertEqual(reconcile_stripe_sessions(), {'sessions': 1, 'completed': 1, 'failed': 0})
+            self.assertEqual(reconcile_stripe_sessions(), {'sessions': 1, 'completed': 0, 'failed': 0})
+
+        booking.refresh_from_db()
+        self.assertEqual(booking.payment_status, PaymentStatusChoices.COMPLETED)
+        payment = booking.payments.get()
+        self.assertEqual((payment.session_id, payment.transaction_id), ('cs_booking', 'pi_cs_booking'))
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.template_name, 'payment-confirmation.html')
+        self.assertEqual(email.context['amount'], '10.5')
+
+    def test_paid_session_is_applied_once(self):
+        booking = self.make_booking('cs_paid')
+        snapshot = session_snapshot(checkout_session('cs_paid', 'complete', 'paid', booking.booking_number))
+
+        self.assertEqual(apply_paid_checkout_session(booking, snapshot), (True, True))
+        booking = Booking.objects.select_related('order').get(pk=booking.pk)
+        self.assertEqual(apply_paid_checkout_session(booking, snapshot), (False, False))
+        self.assertEqual(booking.payments.count(), 1)
+        self.assertEqual(booking.payment_status, PaymentStatusChoices.COMPLETED)
+
+    def test_payment_for_cancelled_booking_is_refunded(self):
+        booking = self.make_booking('cs_late', status=BookingStatusChoices.CANCELLED)
+        snapshot = session_snapshot(checkout_session('cs_late', 'complete', 'paid', booking.booking_number))
+
+        self.assertEqual(apply_paid_checkout_session(booking, snapshot), (True, False))
+        refund = booking.refunds.get()
+        self.assertEqual(refund.status, RefundStatusChoices.QUEUED)
+        self.assertEqual(refund.payment.transaction_id, 'pi_cs_late')
+
+    def test_racing_refund_requests_queue_one_refund(self):
+        booking = self.make_booking('cs_race')
+        apply_paid_checkout_session(booking, session_snapshot(
+            checkout_session('cs_race', 'complete', 'paid', booking.booking_number)
+        ))
+        payment = booking.payments.get()
+        bulk_create = Refund.objects.bulk_create
+
+        def racing_bulk_create(refunds, **kwargs):
+            # The cancel view's refund lands between this caller's check and its insert
+            Refund.objects.create(booking=booking, payment=payment, amount=payment.amount)
+            return bulk_create(refunds, **kwargs)
+
+        with mock.patch.object(Refund.objects, 'bulk_create', side_effect=racing_bulk_create):
+            self.assertEqual(enqueue_refunds([booking]), [])
+        self.assertEqual(payment.refunds.count(), 1)
+
+
+class BookingPaymentAccessTests(TestCase):
+    """Sequential booking numbers alone must not expose payment state"""
+
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pw12345678', full_name='Owner', phone='1'
+        )
+        self.other = User.objects.create_user(
+            email='other@example.com', username='other', password='pw12345678', full_name='Other', phone='2'
+        )
+        self.booking = make_booking(self.owner, 'cs_access')
+        self.url = reverse('bookings:booking-payment-status', args=[self.booking.booking_number])
+        self.client = APIClient()
+
+    def test_status_requires_token_or_owner(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'token': 'forged'}).status_code, 404)
+
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_status_with_booking_token(self):
+        token = payment_access_token(self.booking.booking_number)
+        response = self.client.get(self.url, {'token': token})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['booking_number'], self.booking.booking_number)
+        self.assertNotEqual(token, payment_access_token(make_booking(self.owner, 'cs_other').booking_number))
+
+    def test_event_stream_requires_token(self):
+        url = reverse('bookings:booking-payment-events', args=[self.booking.booking_number])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url, {'token': 'forged'}).status_code, 404)
+
+    def test_malformed_numbers_are_rejected_before_lookup(self):
+        self.client.force_authenticate(self.owner)
+        number = self.booking.booking_number
+        mistyped = number[:-1] + ('0' if number[-1] != '0' else '1')
+        for bad in (mistyped, 'BK-NOPE', 'BK-00000000-XYZ'):
+            url = f"/api/v1/bookings/{bad}/payment-status/"
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+        with mock.patch('apps.bookings.views.get_checkout_session') as get_session, self.assertNumQueries(0):
+            response = self.client.post(
+                reverse('bookings:verify-payment'), {'session_id': 'cs_x', 'booking_number': mistyped}, format='json'
+            )
+        self.assertEqual(response.status_code, 404)
+        get_session.assert_not_called()
+
+    def test_legacy_numbers_still_resolve(self):
+        Booking.objects.filter(pk=self.booking.pk).update(booking_number='BK-20260115-1A2B3C4D')
+        self.client.force_authenticate(self.owner)
+        url = reverse('bookings:booking-payment-status', args=['BK-20260115-1A2B3C4D'])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class CalendarFeedTokenTests(TestCase):
+    """Feed URLs never expire, so they stop working once their holder loses access"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='guest@example.com', username='guest', password='pw12345678', full_name='Guest', phone='1'
+        )
+        make_booking(self.user, 'cs_feed')
+
+    def fetch(self, token):
+        return self.client.get(reverse('bookings:booking-calendar-feed', args=[token]))
+
+    def test_user_feed_is_revoked_when_user_is_deactivated(self):
+        token = ical.feed_token(ical.USER_FEED, self.user.id, self.user.id)
+        self.assertEqual(self.fetch(token).status_code, 200)
+
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertEqual(self.fetch(token).status_code, 404)
+
+    def test_service_feed_is_revoked_when_holder_leaves_staff(self):
+        self.user.is_staff = True
+        self.user.save(update_fields=['is_staff'])
+        token = ical.feed_token(ical.SERVICE_FEED, 1, self.user.id)
+        self.assertEqual(self.fetch(token).status_code, 200)
+
+        self.user.is_staff = False
+        self.user.save(update_fields=['is_staff'])
+        self.assertEqual(self.fetch(token).status_code, 404)
+
+    def test_legacy_service_token_without_holder_is_rejected(self):
+        legacy = signing.dumps([ical.SERVICE_FEED, 1], salt=ical.FEED_SALT, compress=True)
+        self.assertEqual(self.fetch(legacy).status_code, 404)
+
+
+@override_settings(EMAIL_MAX_ATTEMPTS=2)
+class BookingReminderTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email='guest@example.com', username='guest', password='pw12345678', full_name='Guest', phone='1'
+        )
+        self.booking = make_booking(user, 'cs_reminder', status=BookingStatusChoices.CONFIRMED)
+
+    def test_failing_address_is_given_up_after_max_attempts(self):
+        def refuse_all(messages):
+            return [False] * len(messages)
+
+        with mock.patch('apps.bookings.reminders.send_email_batch', side_effect=refuse_all) as send:
+            self.assertEqual(send_due_emails(REMINDER), {'sent': 0, 'failed': 1, 'abandoned': 0})
+            self.booking.refresh_from_db()
+            self.assertIsNone(self.booking.reminder_sent_at)
+
+            self.assertEqual(send_due_emails(REMINDER), {'sent': 0, 'failed': 1, 'abandoned': 1})
+            self.assertEqual(send_due_emails(REMINDER), {'sent': 0, 'failed': 0, 'abandoned': 0})
+
+        self.assertEqual(send.call_count, 2)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.reminder_attempts, 2)
+        self.assertIsNotNone(self.booking.reminder_sent_at)
+
+
+class PaymentCreateViewTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.staff = User.objects.create_user(
+            email='staff@example.com', username='staff', password='pw12345678', full_name='Staff', phone='1',
+            is_staff=True
+        )
+        self.booking = make_booking(self.staff, None)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_payment_keeps_a_cancellation_that_landed_meanwhile(self):
+        stale = Booking.objects.get(pk=self.booking.pk)
+        Booking.objects.filter(pk=self.booking.pk).update(status=BookingStatusChoices.CANCELLED)
+
+        with mock.patch('apps.bookings.views.get_object_or_404', return_value=stale):
+            response = self.client.post(
+                reverse('bookings:payment-create', args=[self.booking.booking_number]),
+                {'amount': '10.50', 'payment_method': PaymentMethodChoices.CASH, 'payment_status': PaymentStatusChoices.COMPLETED},
+                format='json'
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.booking.refresh_from_db()
+        self.assertEqual(
+            (self.booking.status, self.booking.payment_status),
+            (BookingStatusChoices.CANCELLED, PaymentStatusChoices.COMPLETED)
+        )
@@ -0,0 +1,145 @@
+"""
+Booking, payment and order state machine
+
+Every status change is applied as a single conditional UPDATE:
+
+    UPDATE ... SET status = <target> WHERE id = ? AND status IN (<allowed_from>)
+
+The affected-row count tells whether the transition happened, so concurrent
+writers (e.g. a cancellation racing a payment webhook) can never move a row
+out of a state it already left, without reading it first or taking row locks.
+"""
+from django.utils import timezone
+
+from utils.choices import BookingStatusChoices, OrderStatusChoices, PaymentStatusChoices
+
+# target status -> statuses it may be reached from
+BOOKING_STATUS_TRANSITIONS = {
+    BookingStatusChoices.CONFIRMED: (BookingStatusChoices.PENDING,),
+    BookingStatusChoices.IN_PROGRESS: (BookingStatusChoices.CONFIRMED,),
+    BookingStatusChoices.COMPLETED: (BookingStatusChoices.CONFIRMED, BookingStatusChoices.IN_PROGRESS),
+    BookingStatusChoices.CANCELLED: (
+        BookingStatusChoices.PENDING, BookingStatusChoices.CONFIRMED, BookingStatusChoices.IN_PROGRESS
+    ),
+}
+
+PAYMENT_STATUS_TRANSITIONS = {
+    PaymentStatusChoices.INITIATED: (PaymentStatusChoices.FAILED,),
+    PaymentStatusChoices.WAITING_FOR_CONFIRMATION: (PaymentStatusChoices.INITIATED,),
+    PaymentStatusChoices.COMPLETED: (
+        PaymentStatusChoices.INITIATED, PaymentStatusChoices.WAITING_FOR_CONFIRMATION, PaymentStatusChoices.FAILED
+    ),
+    PaymentStatusChoices.FAILED: (PaymentStatusChoices.INITIATED, PaymentStatusChoices.WAITING_FOR_CONFIRMATION),
+    PaymentStatusChoices.REFUNDED: (PaymentStatusChoices.COMPLETED,),
+}
+
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatusChoices.PROCESSING: (OrderStatusChoices.PENDING,),
+    OrderStatusChoices.CONFIRMED: (OrderStatusChoices.PENDING, OrderStatusChoices.PROCESSING),
+    OrderStatusChoices.COMPLETED: (
+        OrderStatusChoices.PENDING, OrderStatusChoices.PROCESSING, OrderStatusChoices.CONFIRMED
+    ),
+    OrderStatusChoices.CANCELLED: (
+        OrderStatusChoices.PENDING, OrderStatusChoices.PROCESSING, OrderStatusChoices.CONFIRMED
+    ),
+}
+
+# model label -> guarded field -> transition table
+MODEL_TRANSITIONS = {
+    'bookings.Booking': {'status': BOOKING_STATUS_TRANSITIONS, 'payment_status': PAYMENT_STATUS_TRANSITIONS},
+    'bookings.Payment': {'payment_status': PAYMENT_STATUS_TRANSITIONS},
+    'cart.OrderDetail': {'status': ORDER_STATUS_TRANSITIONS, 'payment_status': PAYMENT_STATUS_TRANSITIONS},
+}
+
+# Booking statuses in which a payment can still be recorded
+PAYABLE_BOOKING_STATUSES = (
+    BookingStatusChoices.PENDING, BookingStatusChoices.CONFIRMED,
+    BookingStatusChoices.IN_PROGRESS, BookingStatusChoices.COMPLETED,
+)
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+def can_transition(model, field, current, target):
+    """Whether ``field`` of ``model`` may move from ``current`` to ``target``"""
+    table = MODEL_TRANSITIONS[model._meta.label][field]
+    return current in table.get(target, ())
+
+
+def transition(queryset, **changes):
+    """
+    Apply a guarded transition to every row of ``queryset``
+
+    Keyword arguments naming a guarded status field are transition targets and
+    add an ``<field> IN (allowed_from)`` condition; any other keyword is written
+    as a plain value alongside the transition.
+
+    Args:
+        queryset: Rows to transition, usually filtered by primary key
+        **changes: Target statuses and extra field values
+
+    Returns:
+        int: Number of rows that made the transition
+
+    Raises:
+        InvalidTransition: If a target status has no incoming transitions
+    """
+    tables = MODEL_TRANSITIONS[queryset.model._meta.label]
+    conditions = {}
+    for field, table in tables.items():
+        if field not in changes:
+            continue
+        target = changes[field]
+        if target not in table:
+            raise InvalidTransition(f"{queryset.model.__name__}.{field} cannot transition to '{target}'")
+        conditions[f'{field}__in'] = table[target]
+    changes.setdefault('updated_at', timezone.now())
+    return queryset.filter(**conditions).update(**changes)
+
+
+def transition_instance(instance, **changes):
+    """
+    Transition one row by primary key and mirror the change on ``instance``
+
+    Returns:
+        bool: True if the row made the transition
+    """
+    updated = transition(type(instance)._default_manager.filter(pk=instance.pk), **changes)
+    if updated:
+        for field, value in changes.items():
+            setattr(instance, field, value)
+    return bool(updated)
+
+
+def complete_booking_payment(booking):
+    """
+    Mark a booking as paid, confirming it if it was still pending
+
+    Returns:
+        bool: False if the booking can no longer take a payment (e.g. cancelled)
+    """
+    if transition_instance(
+        booking, status=BookingStatusChoices.CONFIRMED, payment_status=PaymentStatusChoices.COMPLETED
+    ):
+        return True
+    updated = transition(
+        type(booking)._default_manager.filter(pk=booking.pk, status__in=PAYABLE_BOOKING_STATUSES),
+        payment_status=PaymentStatusChoices.COMPLETED
+    )
+    if updated:
+        booking.payment_status = PaymentStatusChoices.COMPLETED
+    return bool(updated)
+
+
+def complete_booking_payments(queryset):
+    """
+    Bulk version of complete_booking_payment
+
+    Returns:
+        int: Number of bookings marked as paid
+    """
+    confirmed = transition(queryset, status=BookingStatusChoices.CONFIRMED, payment_status=PaymentStatusChoices.COMPLETED)
+    paid = transition(queryset.filter(status__in=PAYABLE_BOOKING_STATUSES), payment_status=PaymentStatusChoices.COMPLETED)
+    return confirmed + paid
@@ -1,11 +1,17 @@
-from django.urls import path
+from django.urls import path, register_converter
+
+from utils.numbering import BookingNumberConverter
+
 from .views import (
     BookingCreateView, BookingListView, BookingDetailView,
     BookingUpdateStatusView, BookingCancelView, PaymentCreateView,
     MyBookingsView, CreateCheckoutSessionView, VerifyPaymentView,
-    StripeWebhookView, BookingPaymentStatusView
+    StripeWebhookView, BookingPaymentStatusView, BookingPaymentEventsView, BookingSearchView,
+    BookingCalendarLinkView, BookingCalendarFeedView
 )
 
+register_converter(BookingNumberConverter, 'booking_number')
+
 app_name = 'bookings'
 
 urlpatterns = [
@@ -13,16 +19,22 @@ urlpatterns = [
     path('create/', BookingCreateView.as_view(), name='booking-create'),
     path('my-bookings/', MyBookingsView.as_view(), name='my-bookings'),
     path('list/', BookingListView.as_view(), name='booking-list'),
-    path('<str:booking_number>/details/', BookingDetailView.as_view(), name='booking-detail'),
-    path('<str:booking_number>/update-status/', BookingUpdateStatusView.as_view(), name='booking-update-status'),
-    path('<str:booking_number>/cancel/', BookingCancelView.as_view(), name='booking-cancel'),
+    path('search/', BookingSearchView.as_view(), name='booking-search'),
+
+    # Calendar feeds
+    path('calendar/', BookingCalendarLinkView.as_view(), name='booking-calendar-link'),
+    path('calendar/<str:token>.ics', BookingCalendarFeedView.as_view(), name='booking-calendar-feed'),
+    path('<booking_number:booking_number>/details/', BookingDetailView.as_view(), name='booking-detail'),
+    path('<booking_number:booking_number>/update-status/', BookingUpdateStatusView.as_view(), name='booking-update-status'),
+    path('<booking_number:booking_number>/cancel/', BookingCancelView.as_view(), name='booking-cancel'),
     
     # Payment endpoints
-    path('<str:booking_number>/payment/', PaymentCreateView.as_view(), name='payment-create'),
+    path('<booking_number:booking_number>/payment/', PaymentCreateView.as_view(), name='payment-create'),
     
     # Stripe payment endpoints
-    path('<str:booking_number>/create-checkout-session/', CreateCheckoutSessionView.as_view(), name='create-checkout-session'),
-    path('<str:booking_number>/payment-status/', BookingPaymentStatusView.as_view(), name='booking-payment-status'),
+    path('<booking_number:booking_number>/create-checkout-session/', CreateCheckoutSessionView.as_view(), name='create-checkout-session'),
+    path('<booking_number:booking_number>/payment-status/', BookingPaymentStatusView.as_view(), name='booking-payment-status'),
+    path('<booking_number:booking_number>/payment-events/', BookingPaymentEventsView.as_view(), name='booking-payment-events'),
     path('verify-payment/', VerifyPaymentView.as_view(), name='verify-payment'),
     path('stripe-webhook/', StripeWebhookView.as_view(), name='stripe-webhook'),
 ]
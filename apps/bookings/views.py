@@ -1,23 +1,39 @@
 from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
+from django.utils import timezone
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
 from django.utils.decorators import method_decorator
-from django.http import HttpResponse
+from django.views.decorators.http import condition, etag
+from django.http import HttpResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.views import View
 from rest_framework import status, generics
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
 
-from utils.choices import BookingStatusChoices, OrderStatusChoices, PaymentStatusChoices
+from utils.choices import BookingStatusChoices, PaymentStatusChoices
+from utils.numbering import is_known_number
+from utils.conditional import queryset_state, request_etag
+from utils.throttling import EarlyThrottleMixin, TokenBucketThrottle
 
 
 from .models import Booking
 from .serializers import (
     BookingListSerializer, BookingDetailSerializer, 
-    BookingCreateSerializer, PaymentSerializer
+    BookingCreateSerializer, BookingSearchSerializer, PaymentSerializer
 )
+from .refunds import enqueue_refunds
+from .search import search_bookings
+from . import ical
+from .transitions import InvalidTransition, transition_instance
+from .access import has_payment_access, is_valid_access_token
+from .events import acquire_stream_slot, booking_payment_state, publish_payment_event, stream_payment_events
 from .stripe_utils import (
-    create_checkout_session, retrieve_checkout_session,
+    apply_paid_checkout_session, create_checkout_session, get_checkout_session,
     verify_webhook_signature, handle_checkout_session_completed
 )
 import logging
@@ -26,15 +42,35 @@ booking_logger = logging.getLogger('system_logs')
 payment_logger = logging.getLogger('payment_logs')
 
 
-class BookingPagination(PageNumberPagination):
+class BookingCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id), newest first
+
+    Each page is a range scan on the (user, -created_at, -id) index instead of
+    a COUNT(*) plus an OFFSET scan.
+    """
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+def user_bookings(request):
+    """Bookings of the requesting user, optionally filtered by ?status="""
+    queryset = Booking.objects.filter(user=request.user)
+    booking_status = request.query_params.get('status')
+    if booking_status:
+        if booking_status not in BookingStatusChoices.values:
+            raise ValidationError({"status": f"Invalid booking status '{booking_status}'"})
+        queryset = queryset.filter(status=booking_status)
+    return queryset
 
 
-class BookingCreateView(generics.CreateAPIView):
+class BookingCreateView(EarlyThrottleMixin, generics.CreateAPIView):
     """Create a new booking (public or authenticated)"""
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'booking_create'
     serializer_class = BookingCreateSerializer
     
     def create(self, request, *args, **kwargs):
@@ -58,12 +94,11 @@ class BookingListView(generics.ListAPIView):
     """List all bookings for authenticated user"""
     permission_classes = [IsAuthenticated]
     serializer_class = BookingListSerializer
-    pagination_class = BookingPagination
+    pagination_class = BookingCursorPagination
     
     def get_queryset(self):
-        user = self.request.user
         # Return bookings for authenticated user
-        return Booking.objects.filter(user=user).order_by('-created_at')
+        return user_bookings(self.request)
 
 
 class BookingDetailView(generics.RetrieveAPIView):
@@ -93,13 +128,28 @@ class BookingUpdateStatusView(APIView):
         new_status = request.data.get('status')
         admin_notes = request.data.get('admin_notes') 
 
-        if new_status and new_status in dict(BookingStatusChoices.choices).keys():
-            booking.status = new_status
+        if new_status and new_status not in BookingStatusChoices.values:
+            return Response({
+                "error": f"Invalid booking status '{new_status}'"
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        if admin_notes:
+        changes = {'admin_notes': admin_notes} if admin_notes else {}
+        if new_status and new_status != booking.status:
+            current_status = booking.status
+            try:
+                updated = transition_instance(booking, status=new_status, **changes)
+            except InvalidTransition:
+                updated = False
+            if not updated:
+                booking_logger.info(f"Rejected booking status change: booking_number={booking.booking_number}, from={current_status}, to={new_status}")
+                return Response({
+                    "error": f"Cannot change booking status from {current_status} to {new_status}"
+                }, status=status.HTTP_409_CONFLICT)
+            publish_payment_event(booking)
+        elif changes:
+            Booking.objects.filter(pk=booking.pk).update(updated_at=timezone.now(), **changes)
             booking.admin_notes = admin_notes
-            
-        booking.save()
+
         booking_logger.info(f"Booking status updated: booking_number={booking.booking_number}, new_status={booking.status}, admin_id={request.user.id}")
         serializer = BookingDetailSerializer(booking)
         return Response({
@@ -127,26 +177,30 @@ class BookingCancelView(APIView):
                     "error": "Invalid email for this booking"
                 }, status=status.HTTP_403_FORBIDDEN)
             
-        if booking.status in ['completed', 'cancelled']:
-            booking_logger.info(f"Cancel attempt on completed/cancelled booking: booking_number={booking.booking_number}, status={booking.status}")
-            return Response({
-                "error": f"Cannot cancel a booking that is already {booking.status}"
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
+        changes = {}
         # Record cancellation reason into admin_notes for staff visibility
         if reason:
             existing = booking.admin_notes or ""
             note = f"Cancellation reason: {reason}"
             # keep previous admin notes and append the reason
-            booking.admin_notes = (existing + '\n' + note).strip()
+            changes['admin_notes'] = (existing + '\n' + note).strip()
+
+        if not transition_instance(booking, status=BookingStatusChoices.CANCELLED, **changes):
+            booking.refresh_from_db(fields=['status'])
+            booking_logger.info(f"Cancel attempt on completed/cancelled booking: booking_number={booking.booking_number}, status={booking.status}")
+            return Response({
+                "error": f"Cannot cancel a booking that is already {booking.status}"
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        booking.status = BookingStatusChoices.CANCELLED
-        booking.save()
-        booking_logger.info(f"Booking cancelled: booking_number={booking.booking_number}")
+        publish_payment_event(booking)
+        # Picks up payments completed at any point before the cancellation landed
+        refunds = enqueue_refunds([booking])
+        booking_logger.info(f"Booking cancelled: booking_number={booking.booking_number}, refunds_queued={len(refunds)}")
         return Response({
             "message": "Booking cancelled successfully",
             "booking_number": booking.booking_number,
-            "reason": reason
+            "reason": reason,
+            "refund_queued": bool(refunds)
         }, status=status.HTTP_200_OK)
 
 
@@ -167,12 +221,14 @@ class PaymentCreateView(generics.CreateAPIView):
         if serializer.is_valid():
             payment = serializer.save(booking=booking)
             total_paid = sum(p.amount for p in booking.payments.filter(payment_status=PaymentStatusChoices.COMPLETED))
+            target = None
             if total_paid >= booking.total_amount:
-                booking.payment_status = PaymentStatusChoices.COMPLETED
+                target = PaymentStatusChoices.COMPLETED
             elif total_paid > 0:
-                booking.payment_status = PaymentStatusChoices.FAILED
-
-            booking.save()
+                target = PaymentStatusChoices.FAILED
+            # Guarded, so a cancellation or webhook that moved the booking on meanwhile is kept
+            if target and transition_instance(booking, payment_status=target):
+                publish_payment_event(booking)
             payment_logger.info(f"Payment created: payment_id={payment.id}, booking_number={booking.booking_number}, amount={payment.amount}, user_id={request.user.id}")
             return Response({
                 "message": "Payment recorded successfully",
@@ -186,14 +242,36 @@ class PaymentCreateView(generics.CreateAPIView):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+def my_bookings_etag(request):
+    return request_etag(request, *queryset_state(user_bookings(request)))
+
+
+@method_decorator(etag(my_bookings_etag), name='get')
 class MyBookingsView(generics.ListAPIView):
     """List all bookings for the authenticated user"""
     permission_classes = [IsAuthenticated]
     serializer_class = BookingListSerializer
-    pagination_class = BookingPagination
+    pagination_class = BookingCursorPagination
     
     def get_queryset(self):
-        return Booking.objects.filter(user=self.request.user).order_by('-created_at')
+        return user_bookings(self.request)
+
+
+class BookingSearchView(generics.ListAPIView):
+    """Search bookings by booking/order number or customer name, email and phone (staff only)"""
+    permission_classes = [IsAdminUser]
+    serializer_class = BookingSearchSerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        term = self.request.query_params.get('q', '').strip()
+        if len(term) < settings.BOOKING_SEARCH_MIN_LENGTH:
+            raise ValidationError({"q": f"Enter at least {settings.BOOKING_SEARCH_MIN_LENGTH} characters to search"})
+        try:
+            limit = min(int(self.request.query_params.get('limit', settings.BOOKING_SEARCH_LIMIT)), 100)
+        except ValueError:
+            raise ValidationError({"limit": "Limit must be a number"})
+        return search_bookings(term, limit=max(limit, 1))
 
 
 # ===== Stripe Payment Views =====
@@ -251,8 +329,6 @@ class VerifyPaymentView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
-        from apps.cart.models import Cart, OrderDetail, OrderItem
-        from django.utils import timezone
         session_id = request.data.get('session_id')
         booking_number = request.data.get('booking_number')
         if not session_id:
@@ -260,32 +336,30 @@ class VerifyPaymentView(APIView):
             return Response({
                 "error": "session_id is required"
             }, status=status.HTTP_400_BAD_REQUEST)
-        session = retrieve_checkout_session(session_id)
+        if not isinstance(booking_number, str) or not is_known_number(booking_number):
+            raise Http404
+        session = get_checkout_session(session_id)
         if not session:
             payment_logger.warning(f"Verify payment failed: invalid session_id={session_id}")
             return Response({
                 "error": "Invalid session"
             }, status=status.HTTP_404_NOT_FOUND)
-        booking = get_object_or_404(Booking, booking_number=booking_number)
-        booking.status = BookingStatusChoices.CONFIRMED
-        booking.payment_status = PaymentStatusChoices.COMPLETED
-        booking.order.status = OrderStatusChoices.COMPLETED
-        booking.save()
-        cart = None
-        if booking.user:
-            cart = Cart.objects.filter(user=booking.user, status='open').order_by('-last_activity').first()
-        else:
-            cart = Cart.objects.filter(session_id=session_id, status='open').order_by('-last_activity').first()
-        if cart:
-            cart.close_cart()
+        booking = get_object_or_404(Booking.objects.select_related('order'), booking_number=booking_number)
+        if session['booking_number'] != booking.booking_number:
+            payment_logger.warning(f"Verify payment failed: session_id={session_id} does not belong to booking_number={booking_number}")
+            return Response({
+                "error": "Session does not match this booking"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if session['payment_status'] == 'paid':
+            apply_paid_checkout_session(booking, session)
         payment_logger.info(f"Payment verified: booking_number={booking.booking_number}, session_id={session_id}, user_id={getattr(booking.user, 'id', None)}")
         return Response({
             "booking_number": booking.booking_number,
-            "customer_email": session.customer_email,
-            "payment_status": session.payment_status,
+            "customer_email": session['customer_email'],
+            "payment_status": session['payment_status'],
             "booking_status": booking.status,
             "booking_payment_status": booking.payment_status,
-            "paid_amount": session.amount_total / 100,
+            "paid_amount": (session['amount_total'] or 0) / 100,
             "sub_total": booking.subtotal,
             "tax": booking.tax,
             "total_amount": booking.total_amount,
@@ -344,11 +418,14 @@ class StripeWebhookView(APIView):
 
 
 class BookingPaymentStatusView(APIView):
-    """Get payment status for a booking"""
+    """Get payment status for a booking (owner, staff or ?token= from the booking)"""
     permission_classes = [AllowAny]
     
     def get(self, request, booking_number):
         booking = get_object_or_404(Booking, booking_number=booking_number)
+        if not has_payment_access(request, booking):
+            # Same answer as an unknown number, so numbers cannot be probed
+            raise Http404("Booking not found")
         
         # Calculate payment details
         total_paid = sum(
@@ -365,4 +442,81 @@ class BookingPaymentStatusView(APIView):
             "total_paid": str(total_paid),
             "remaining": str(remaining),
             "payments": PaymentSerializer(booking.payments.all(), many=True).data
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        }, status=status.HTTP_200_OK)
+
+
+class BookingCalendarLinkView(APIView):
+    """Get the iCalendar feed URL of the user's bookings, or of a service's bookings (staff only)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        service_slug = request.query_params.get('service')
+        if service_slug:
+            if not request.user.is_staff:
+                return Response({
+                    "error": "You don't have permission to view service calendars"
+                }, status=status.HTTP_403_FORBIDDEN)
+            from apps.service.models import Service
+            service = get_object_or_404(Service, slug=service_slug)
+            token = ical.feed_token(ical.SERVICE_FEED, service.id, request.user.id)
+        else:
+            token = ical.feed_token(ical.USER_FEED, request.user.id, request.user.id)
+        return Response({
+            "url": request.build_absolute_uri(reverse('bookings:booking-calendar-feed', args=[token]))
+        }, status=status.HTTP_200_OK)
+
+
+def calendar_feed_etag(request, token):
+    try:
+        return ical.feed_etag(*ical.load_feed_token(token))
+    except signing.BadSignature:
+        return None
+
+
+class BookingCalendarFeedView(View):
+    """Stream an iCalendar feed of bookings, addressed by a signed feed token"""
+
+    @method_decorator(condition(etag_func=calendar_feed_etag))
+    def get(self, request, token):
+        try:
+            kind, object_id = ical.load_feed_token(token)
+        except signing.BadSignature:
+            raise Http404("Calendar not found")
+        name = 'Azure Horizon Bookings' if kind == ical.USER_FEED else 'Azure Horizon Service Bookings'
+        response = StreamingHttpResponse(
+            ical.stream_calendar(kind, object_id, name),
+            content_type='text/calendar; charset=utf-8'
+        )
+        response['Content-Disposition'] = 'inline; filename="bookings.ics"'
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class BookingPaymentEventsView(View):
+    """Stream payment state changes for a booking as server-sent events (ASGI, ?token= required)"""
+
+    async def get(self, request, booking_number):
+        # EventSource cannot send an Authorization header, so the token is the only credential
+        if not is_valid_access_token(booking_number, request.GET.get('token')):
+            raise Http404("Booking not found")
+        if not await Booking.objects.filter(booking_number=booking_number).aexists():
+            raise Http404("Booking not found")
+
+        async def load_state():
+            booking = await Booking.objects.only(
+                'booking_number', 'status', 'payment_status', 'total_amount'
+            ).aget(booking_number=booking_number)
+            return booking_payment_state(booking)
+
+        slot = await acquire_stream_slot(booking_number)
+        if slot is False:
+            return JsonResponse(
+                {"detail": "Too many open event streams for this booking"}, status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+        response = StreamingHttpResponse(
+            stream_payment_events(booking_number, load_state, holds_slot=slot is True),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.contrib import admin
 from .models import Cart, CartItem, OrderDetail, OrderItem
+from .search import order_search_filter
 
 
 class CartItemInline(admin.TabularInline):
@@ -66,6 +68,13 @@ class OrderDetailAdmin(admin.ModelAdmin):
         })
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        """Use the trigram indexes instead of ILIKE scans"""
+        search_term = search_term.strip()
+        if len(search_term) < settings.BOOKING_SEARCH_MIN_LENGTH:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(order_search_filter(search_term)), False
+
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.3 on 2026-10-19 04:00
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_alter_cart_id_alter_cartitem_id'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='orderdetail',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['order_number'], name='order_number_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='orderdetail',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['customer_name'], name='order_customer_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='orderdetail',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['customer_email'], name='order_customer_email_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='orderdetail',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['customer_phone'], name='order_customer_phone_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-19 04:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_orderdetail_order_number_trgm_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE SEQUENCE IF NOT EXISTS cart_order_number_seq',
+            'DROP SEQUENCE IF EXISTS cart_order_number_seq',
+        ),
+    ]
@@ -1,13 +1,17 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
 from decimal import Decimal
 from django.contrib.auth import get_user_model
 from apps.service.models import Service
 from utils.abstract_models import ActiveModel, TimeStampedModel
 from utils import CartStatusChoices
 from utils.choices import OrderStatusChoices, PaymentStatusChoices
+from utils.numbering import next_number
 
 User = get_user_model()
 
+ORDER_NUMBER_SEQUENCE = 'cart_order_number_seq'
+
 
 class Cart(TimeStampedModel, ActiveModel):
     """Shopping cart model for users to add services before booking"""
@@ -134,6 +138,11 @@ class OrderDetail(TimeStampedModel):
             models.Index(fields=['user']),
             models.Index(fields=['status']),
             models.Index(fields=['payment_status']),
+            # Trigram indexes backing the staff search (see apps/cart/search.py)
+            GinIndex(fields=['order_number'], name='order_number_trgm_idx', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['customer_name'], name='order_customer_name_trgm_idx', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['customer_email'], name='order_customer_email_trgm_idx', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['customer_phone'], name='order_customer_phone_trgm_idx', opclasses=['gin_trgm_ops']),
         ]
     
     def __str__(self):
@@ -141,12 +150,7 @@ class OrderDetail(TimeStampedModel):
     
     def save(self, *args, **kwargs):
         if not self.order_number:
-            # Generate unique order number
-            import uuid
-            from datetime import datetime
-            timestamp = datetime.now().strftime('%Y%m%d')
-            unique_id = str(uuid.uuid4())[:8].upper()
-            self.order_number = f"ORD-{timestamp}-{unique_id}"
+            self.order_number = next_number('ORD', ORDER_NUMBER_SEQUENCE)
         
         super().save(*args, **kwargs)
     
@@ -0,0 +1,31 @@
+"""
+Trigram search over orders
+
+Lookups use the pg_trgm word-similarity operator (``%>``), which is served by
+the GIN ``gin_trgm_ops`` indexes on OrderDetail instead of ``ILIKE '%q%'``
+sequential scans.
+"""
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+ORDER_SEARCH_FIELDS = ('order_number', 'customer_name', 'customer_email', 'customer_phone')
+
+
+def order_search_filter(term, prefix=''):
+    """
+    Q matching orders whose indexed fields are word-similar to ``term``
+
+    Args:
+        term (str): Search text
+        prefix (str): Lookup prefix when filtering a related model, e.g. 'order__'
+    """
+    query = Q()
+    for field in ORDER_SEARCH_FIELDS:
+        query |= Q(**{f'{prefix}{field}__trigram_word_similar': term})
+    return query
+
+
+def order_search_rank(term, prefix=''):
+    """Best word similarity of ``term`` across the indexed order fields"""
+    return Greatest(*[TrigramWordSimilarity(term, f'{prefix}{field}') for field in ORDER_SEARCH_FIELDS])
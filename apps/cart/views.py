@@ -1,11 +1,14 @@
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import etag
 from rest_framework import status, generics
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
 from utils.choices import BookingStatusChoices, PaymentMethodChoices, PaymentStatusChoices, CartStatusChoices
+from utils.conditional import queryset_state, request_etag
 
 from .models import Cart, CartItem, OrderDetail, OrderItem
 from .serializers import (
@@ -38,10 +41,25 @@ class CartDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Cart.objects.filter(user=self.request.user, is_active=True)
 
 
+def active_cart_etag(request):
+    carts = Cart.objects.filter(user=request.user, status=CartStatusChoices.OPEN, is_active=True)
+    state = queryset_state(carts, 'cart_items', 'cart_items__service')
+    if not state[0]:
+        return None  # the view creates the cart
+    return request_etag(request, *state)
+
+
+def order_list_etag(request):
+    return request_etag(
+        request, *queryset_state(OrderDetail.objects.filter(user=request.user), 'order_items', 'order_items__service')
+    )
+
+
 class ActiveCartView(APIView):
     """Get user's active cart or create one if none exists"""
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(etag(active_cart_etag))
     def get(self, request):
         try:
             cart = Cart.objects.get(user=request.user, status=CartStatusChoices.OPEN, is_active=True)
@@ -291,6 +309,7 @@ class CheckoutCartView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@method_decorator(etag(order_list_etag), name='get')
 class OrderListView(generics.ListAPIView):
     """List user's orders"""
     serializer_class = OrderDetailSerializer
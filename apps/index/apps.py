@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class IndexConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.index'
+
+    def ready(self):
+        from utils import task_metrics  # noqa: F401
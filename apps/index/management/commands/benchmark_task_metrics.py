@@ -0,0 +1,65 @@
+import time
+
+from celery.signals import before_task_publish, task_postrun, task_prerun, task_retry
+from django.core.management.base import BaseCommand, CommandError
+
+from utils import task_metrics
+from utils.tasks import test_celery_task
+
+HANDLERS = (
+    (before_task_publish, task_metrics.stamp_published_at),
+    (task_prerun, task_metrics.record_queue_wait),
+    (task_postrun, task_metrics.record_runtime),
+    (task_retry, task_metrics.record_retry),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-task cost of the Celery metrics signal handlers on test_celery_task and fail if it "
+        "exceeds --max-overhead-ms. Records real metrics for utils.tasks.test_celery_task."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=1000, help="Tasks per round")
+        parser.add_argument('--rounds', type=int, default=3, help="Rounds per mode; the fastest one counts")
+        parser.add_argument('--max-overhead-ms', type=float, default=2.0, help="Allowed overhead per task")
+
+    def run_tasks(self, iterations):
+        """Publish signal plus an in-process run, as a worker would execute the task"""
+        started = time.perf_counter()
+        for index in range(iterations):
+            headers = {}
+            before_task_publish.send(sender=test_celery_task.name, body=None, headers=headers)
+            test_celery_task.apply((index, 1), headers=headers)
+        return (time.perf_counter() - started) / iterations
+
+    def timed(self, iterations, rounds, instrumented):
+        for signal, handler in HANDLERS:
+            if instrumented:
+                signal.connect(handler)
+            else:
+                signal.disconnect(handler)
+        try:
+            return min(self.run_tasks(iterations) for _ in range(rounds))
+        finally:
+            for signal, handler in HANDLERS:
+                signal.connect(handler)
+
+    def handle(self, *args, **options):
+        iterations, rounds = options['iterations'], options['rounds']
+        self.run_tasks(min(iterations, 100))  # warm up imports, logging and the Redis connection
+
+        baseline = self.timed(iterations, rounds, instrumented=False)
+        instrumented = self.timed(iterations, rounds, instrumented=True)
+        overhead_ms = (instrumented - baseline) * 1000
+
+        self.stdout.write(
+            f"{iterations} tasks x {rounds} rounds | baseline {baseline * 1000:.3f} ms/task | "
+            f"instrumented {instrumented * 1000:.3f} ms/task | overhead {overhead_ms:.3f} ms/task"
+        )
+        if overhead_ms > options['max_overhead_ms']:
+            raise CommandError(
+                f"Task metrics overhead {overhead_ms:.3f} ms exceeds the {options['max_overhead_ms']} ms bound"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Overhead within the {options['max_overhead_ms']} ms bound"))
@@ -1,3 +1,16 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+# Shared CI runners are noisy; the 2 ms budget is enforced by running
+# `manage.py benchmark_task_metrics` on a quiet machine, not here.
+CI_MAX_OVERHEAD_MS = 50.0
+
+
+class TaskMetricsOverheadTests(SimpleTestCase):
+    def test_metrics_overhead_has_no_gross_regression(self):
+        # Raises CommandError when the signal handlers cost more than the bound
+        out = StringIO()
+        call_command('benchmark_task_metrics', iterations=200, rounds=3, max_overhead_ms=CI_MAX_OVERHEAD_MS, stdout=out)
+        self.assertIn(f"Overhead within the {CI_MAX_OVERHEAD_MS} ms bound", out.getvalue())
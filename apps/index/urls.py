@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import IndexView, HealthCheckView
+from .views import IndexView, HealthCheckView, MetricsView
 
 app_name = 'index'
 urlpatterns = [
     path('', IndexView.as_view(), name='index'),
     path('healthz/', HealthCheckView.as_view(), name='healthz'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
@@ -1,7 +1,11 @@
+from django.http import HttpResponse
+from redis.exceptions import RedisError
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
-from rest_framework.status import HTTP_200_OK
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.status import HTTP_200_OK, HTTP_503_SERVICE_UNAVAILABLE
+
+from utils.metrics import render_prometheus
 
 # Create your views here.
 
@@ -18,4 +22,16 @@ class HealthCheckView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, format=None):
-        return Response({'status': 'ok', 'application': 'Azure Horizon', "version": "0.0.1"}, status=HTTP_200_OK)
\ No newline at end of file
+        return Response({'status': 'ok', 'application': 'Azure Horizon', "version": "0.0.1"}, status=HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    """Application metrics in Prometheus text format (staff only)"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, format=None):
+        try:
+            body = render_prometheus()
+        except RedisError:
+            return Response({'status': 'unavailable'}, status=HTTP_503_SERVICE_UNAVAILABLE)
+        return HttpResponse(body, content_type='text/plain; version=0.0.4')
@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+from apps.notifications.models import EmailOutbox
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'template_name', 'status', 'attempts', 'available_at', 'sent_at', 'created_at')
+    list_filter = ('status', 'template_name')
+    search_fields = ('subject',)
+    readonly_fields = ('created_at', 'updated_at', 'sent_at')
+    # The context can hold personal data and password reset links
+    exclude = ('context',)
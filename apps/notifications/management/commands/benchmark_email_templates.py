@@ -0,0 +1,53 @@
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.utils.html import strip_tags
+
+from utils.email import get_email_templates, render_email_bodies
+
+VARIABLE_RE = re.compile(r'{{\s*([\w.]+)')
+
+
+class Command(BaseCommand):
+    help = "Report email renders per second for each template, against the old render_to_string + strip_tags path"
+
+    def add_arguments(self, parser):
+        parser.add_argument('templates', nargs='*', help="Template names, e.g. welcome.html (default: all)")
+        parser.add_argument('--iterations', type=int, default=500, help="Renders per template")
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        names = options['templates'] or sorted(
+            path.name for directory in settings.TEMPLATES[0]['DIRS'] for path in Path(directory).glob('*.html')
+        )
+        # Default cached engine without CSS inlining or text templates, as emails were rendered before
+        legacy_engine = engines['django'].engine.__class__(dirs=settings.TEMPLATES[0]['DIRS'], loaders=[
+            ('django.template.loaders.cached.Loader', ['django.template.loaders.filesystem.Loader']),
+        ])
+        self.stdout.write(f"{iterations} renders per template")
+
+        for name in names:
+            source = Path(get_email_templates(name)[0].origin.name).read_text(encoding='utf-8')
+            context = {variable.split('.')[0]: 'Sample' for variable in VARIABLE_RE.findall(source)}
+            legacy_engine.get_template(name)  # both paths start warm
+
+            started = time.perf_counter()
+            templates = get_email_templates(name)
+            for _ in range(iterations):
+                html_content, text_content = render_email_bodies(templates, context)
+            cached = iterations / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                strip_tags(legacy_engine.render_to_string(name, context))
+            legacy = iterations / (time.perf_counter() - started)
+
+            text_source = 'text template' if templates[1] else 'strip_tags'
+            self.stdout.write(self.style.SUCCESS(
+                f"{name:<36} {cached:9.1f} renders/s | legacy {legacy:8.1f} renders/s "
+                f"({cached / legacy:.1f}x) | html {len(html_content) / 1024:.1f} KiB, text from {text_source}"
+            ))
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def scrub_welcome_passwords(apps, schema_editor):
+    """Remove plaintext passwords queued by the old welcome email from stored contexts"""
+    EmailOutbox = apps.get_model('notifications', 'EmailOutbox')
+    emails = list(EmailOutbox.objects.filter(context__has_key='password'))
+    for email in emails:
+        email.context.pop('password')
+    EmailOutbox.objects.bulk_update(emails, ['context'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(scrub_welcome_passwords, migrations.RunPython.noop),
+    ]
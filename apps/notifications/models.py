@@ -0,0 +1,44 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+from utils import TimeStampedModel
+from utils.choices import EmailOutboxStatusChoices
+
+
+class EmailOutbox(TimeStampedModel):
+    """
+    Emails waiting to be sent, written in the same transaction as the data they describe
+
+    Rows are claimed and sent in batches by ``tasks.dispatch_email_outbox``.
+    """
+
+    subject = models.CharField(max_length=255)
+    template_name = models.CharField(max_length=100)
+    context = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    recipient_list = models.JSONField(default=list)
+    from_email = models.CharField(max_length=255, null=True, blank=True)
+
+    status = models.CharField(
+        max_length=16, choices=EmailOutboxStatusChoices.choices, default=EmailOutboxStatusChoices.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['available_at'], name='email_outbox_pending_idx',
+                condition=models.Q(status=EmailOutboxStatusChoices.PENDING)
+            ),
+            models.Index(
+                fields=['updated_at'], name='email_outbox_sending_idx',
+                condition=models.Q(status=EmailOutboxStatusChoices.SENDING)
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipient_list)} ({self.status})"
@@ -0,0 +1,124 @@
+"""
+Transactional email outbox
+
+``enqueue_email`` only inserts a row, so it joins whatever transaction the
+caller is in: the email exists if and only if the business data committed,
+and the request never waits on the broker or SMTP. The dispatcher claims due
+rows with ``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of workers can
+drain the table without sending a message twice.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from utils.choices import EmailOutboxStatusChoices
+from utils.email import render_email_message, send_email_batch
+from utils.metrics import increment, observe
+
+from .models import EmailOutbox
+
+email_logger = logging.getLogger('system_logs')
+
+
+def enqueue_email(subject, template_name, context, recipient_list, from_email=None):
+    """
+    Record an email for the dispatcher, same arguments as ``send_email_message``
+
+    Returns:
+        EmailOutbox: The queued row
+    """
+    return EmailOutbox.objects.create(
+        subject=subject,
+        template_name=template_name,
+        context=context,
+        recipient_list=list(recipient_list),
+        from_email=from_email
+    )
+
+
+def claim_emails(batch_size):
+    """
+    Mark up to ``batch_size`` due emails as sending and return them
+
+    Rows left in sending by a crashed worker are claimed again after
+    EMAIL_OUTBOX_CLAIM_TIMEOUT seconds.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        emails = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=EmailOutboxStatusChoices.PENDING, available_at__lte=now)
+                | Q(status=EmailOutboxStatusChoices.SENDING, updated_at__lt=stale_before)
+            )
+            .order_by('available_at')[:batch_size]
+        )
+        EmailOutbox.objects.filter(id__in=[email.id for email in emails]).update(
+            status=EmailOutboxStatusChoices.SENDING,
+            updated_at=now
+        )
+    return emails
+
+
+def send_claimed_emails(emails):
+    """
+    Render and send claimed emails over one connection and record the outcome
+
+    Failed sends go back to pending with exponential backoff until
+    EMAIL_MAX_ATTEMPTS is reached; emails that cannot be rendered fail at once.
+    The context is cleared once an email is sent or has failed for good.
+
+    Returns:
+        tuple: (sent, failed) counts
+    """
+    now = timezone.now()
+    rendered, failed = [], []
+    for email in emails:
+        try:
+            rendered.append((email, render_email_message(
+                email.subject, email.template_name, email.context, email.recipient_list, email.from_email
+            )))
+        except Exception as e:
+            email_logger.error(f"Failed to render outbox email {email.id}: {str(e)}")
+            email.status = EmailOutboxStatusChoices.FAILED
+            email.last_error = str(e)
+            email.context = {}
+            failed.append(email)
+
+    sent = []
+    results = send_email_batch([message for _, message in rendered]) if rendered else []
+    for (email, _), delivered in zip(rendered, results):
+        email.attempts += 1
+        if delivered:
+            email.status = EmailOutboxStatusChoices.SENT
+            email.sent_at = now
+            email.last_error = None
+            email.context = {}  # may carry personal data or reset links; not needed once done
+            sent.append(email)
+            continue
+        email.last_error = 'SMTP send failed'
+        if email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+            email.status = EmailOutboxStatusChoices.FAILED
+            email.context = {}
+        else:
+            email.status = EmailOutboxStatusChoices.PENDING
+            email.available_at = now + timedelta(seconds=settings.EMAIL_RETRY_DELAY * 2 ** (email.attempts - 1))
+        failed.append(email)
+
+    for email in sent:
+        # Enqueue-to-delivery time, tracked apart from request latency
+        observe('email_delivery_lag_seconds', (now - email.created_at).total_seconds(), template=email.template_name)
+        increment('emails_sent_total', template=email.template_name)
+    for email in failed:
+        increment('emails_failed_total', template=email.template_name)
+    for email in sent + failed:
+        email.updated_at = now
+    EmailOutbox.objects.bulk_update(
+        sent + failed, ['status', 'attempts', 'available_at', 'last_error', 'sent_at', 'context', 'updated_at']
+    )
+    return len(sent), len(failed)
@@ -0,0 +1,66 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from utils.choices import EmailOutboxStatusChoices
+
+from .models import EmailOutbox
+from .outbox import claim_emails, send_claimed_emails
+
+email_logger = logging.getLogger('system_logs')
+
+
+@shared_task
+def dispatch_email_outbox(batch_size=None):
+    """
+    Send due outbox emails in batches until the outbox is drained
+
+    Stops after EMAIL_OUTBOX_MAX_BATCHES batches so one run cannot hold the
+    worker forever; the next scheduled run picks up the rest.
+
+    Returns:
+        dict: Counts of emails claimed, sent and failed
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    summary = {'claimed': 0, 'sent': 0, 'failed': 0}
+    for _ in range(settings.EMAIL_OUTBOX_MAX_BATCHES):
+        emails = claim_emails(batch_size)
+        if not emails:
+            break
+        sent, failed = send_claimed_emails(emails)
+        summary['claimed'] += len(emails)
+        summary['sent'] += sent
+        summary['failed'] += failed
+        if len(emails) < batch_size:
+            break
+    if summary['claimed']:
+        email_logger.info(f"Email outbox dispatched: {summary}")
+    return summary
+
+
+@shared_task
+def purge_sent_emails(batch_size=5000):
+    """
+    Delete sent and failed outbox rows older than EMAIL_OUTBOX_RETENTION_DAYS
+
+    Returns:
+        int: Number of rows deleted
+    """
+    cutoff = timezone.now() - timedelta(days=settings.EMAIL_OUTBOX_RETENTION_DAYS)
+    deleted = 0
+    while True:
+        ids = list(
+            EmailOutbox.objects.filter(
+                Q(status=EmailOutboxStatusChoices.SENT, sent_at__lt=cutoff)
+                | Q(status=EmailOutboxStatusChoices.FAILED, updated_at__lt=cutoff)
+            )
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        deleted += EmailOutbox.objects.filter(id__in=ids).delete()[0]
+    return deleted
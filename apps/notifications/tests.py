@@ -0,0 +1,122 @@
+import socket
+from datetime import timedelta
+from unittest import mock
+
+from aiosmtpd.controller import Controller
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from utils.choices import EmailOutboxStatusChoices
+
+from .models import EmailOutbox
+from .outbox import enqueue_email
+from .tasks import dispatch_email_outbox, purge_sent_emails
+
+REFUSED = 'refused@example.com'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class RecordingHandler:
+    """SMTP handler that records recipients per connection and refuses one address"""
+
+    def __init__(self):
+        self.connections = {}
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        self.connections.setdefault(session, []).append(address)
+        if address == REFUSED:
+            return '550 mailbox unavailable'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        return '250 Message accepted for delivery'
+
+
+@override_settings(EMAIL_MAX_ATTEMPTS=3, EMAIL_RETRY_DELAY=30)
+class EmailOutboxDispatchTests(TestCase):
+    """Outbox dispatch against a local SMTP server"""
+
+    def setUp(self):
+        self.handler = RecordingHandler()
+        port = free_port()
+        controller = Controller(self.handler, hostname='127.0.0.1', port=port)
+        controller.start()
+        self.addCleanup(controller.stop)
+        smtp_settings = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=port,
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', EMAIL_TIMEOUT=5
+        )
+        smtp_settings.enable()
+        self.addCleanup(smtp_settings.disable)
+
+    def enqueue(self, address):
+        return enqueue_email(
+            subject='Thank you', template_name='contact-response.html',
+            context={'first_name': 'Guest', 'subject': 'Stay', 'message': 'Hello'}, recipient_list=[address]
+        )
+
+    def test_batch_shares_one_connection_and_refused_recipient_is_retried_alone(self):
+        accepted = [f'guest{index}@example.com' for index in range(5)]
+        for address in accepted[:2] + [REFUSED] + accepted[2:]:
+            self.enqueue(address)
+
+        self.assertEqual(dispatch_email_outbox(), {'claimed': 6, 'sent': 5, 'failed': 1})
+        self.assertEqual(len(self.handler.connections), 1)
+        self.assertCountEqual(next(iter(self.handler.connections.values())), accepted + [REFUSED])
+
+        refused = EmailOutbox.objects.get(status=EmailOutboxStatusChoices.PENDING)
+        self.assertEqual((refused.recipient_list, refused.attempts), ([REFUSED], 1))
+        self.assertGreater(refused.available_at, timezone.now() + timedelta(seconds=20))
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutboxStatusChoices.SENT).count(), 5)
+
+        # Nothing is due until the backoff has passed
+        self.assertEqual(dispatch_email_outbox()['claimed'], 0)
+
+        EmailOutbox.objects.filter(pk=refused.pk).update(available_at=timezone.now())
+        self.handler.connections.clear()
+        self.assertEqual(dispatch_email_outbox(), {'claimed': 1, 'sent': 0, 'failed': 1})
+        self.assertEqual(list(self.handler.connections.values()), [[REFUSED]])
+
+        refused.refresh_from_db()
+        self.assertEqual(refused.attempts, 2)
+        self.assertGreater(refused.available_at, timezone.now() + timedelta(seconds=50))
+
+
+@override_settings(EMAIL_MAX_ATTEMPTS=1, EMAIL_OUTBOX_RETENTION_DAYS=30)
+class EmailOutboxRetentionTests(TestCase):
+    """Contexts can hold personal data, so finished rows do not keep them"""
+
+    def enqueue(self, template_name='contact-response.html'):
+        return enqueue_email(
+            subject='Thank you', template_name=template_name,
+            context={'first_name': 'Guest', 'email': 'guest@example.com'}, recipient_list=['guest@example.com']
+        )
+
+    def test_failed_emails_drop_their_context(self):
+        unsendable = self.enqueue()
+        unrenderable = self.enqueue(template_name='missing-template.html')
+
+        with mock.patch('apps.notifications.outbox.send_email_batch', return_value=[False]):
+            self.assertEqual(dispatch_email_outbox(), {'claimed': 2, 'sent': 0, 'failed': 2})
+
+        for email in (unsendable, unrenderable):
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.context), (EmailOutboxStatusChoices.FAILED, {}))
+
+    def test_purge_removes_old_sent_and_failed_rows(self):
+        old = timezone.now() - timedelta(days=31)
+        sent, failed, pending, recent = (self.enqueue() for _ in range(4))
+        EmailOutbox.objects.filter(pk=sent.pk).update(status=EmailOutboxStatusChoices.SENT, sent_at=old)
+        EmailOutbox.objects.filter(pk=failed.pk).update(status=EmailOutboxStatusChoices.FAILED, updated_at=old)
+        EmailOutbox.objects.filter(pk=pending.pk).update(updated_at=old)
+        EmailOutbox.objects.filter(pk=recent.pk).update(status=EmailOutboxStatusChoices.FAILED)
+
+        self.assertEqual(purge_sent_emails(), 2)
+        self.assertCountEqual(EmailOutbox.objects.values_list('pk', flat=True), [pending.pk, recent.pk])
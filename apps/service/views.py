@@ -1,6 +1,6 @@
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
-from utils.email import send_email_message
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_framework.generics import ListAPIView, RetrieveAPIView, ListCreateAPIView, DestroyAPIView
 from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST
@@ -9,6 +9,8 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.notifications.outbox import enqueue_email
+
 from .models import Service, Comment, Advertisement, Favorite
 from .serializers import ServicesSerializer, CommentsSerializer, ServiceListSerializer, AdvertiseSerializer, FavoriteSerializer
 
@@ -75,12 +77,6 @@ class ReviewReplyView(APIView):
         if not reply_text:
             return Response({'detail': 'Reply text required.'}, status=HTTP_400_BAD_REQUEST)
         author = get_object_or_404(User, user_id=request.user.id)
-        Comment.objects.create(
-            content_type=ContentType.objects.get_for_model(Comment),
-            object_id=parent_comment.id,
-            message=reply_text,
-            author=author,
-        )
         # Email notification using HTML template
         users = parent_comment.author
         user_obj = get_object_or_404(User, id=users.id)
@@ -92,12 +88,20 @@ class ReviewReplyView(APIView):
             'parent_comment': str(parent_comment),
             'reply_text': reply_text,
         }
-        send_email_message(
-            subject=subject,
-            template_name='comment_reply_notification.html',
-            context=context,
-            recipient_list=[email],
-        )
+        # The notification is queued with the reply and sent by the outbox dispatcher
+        with transaction.atomic():
+            Comment.objects.create(
+                content_type=ContentType.objects.get_for_model(Comment),
+                object_id=parent_comment.id,
+                message=reply_text,
+                author=author,
+            )
+            enqueue_email(
+                subject=subject,
+                template_name='comment_reply_notification.html',
+                context=context,
+                recipient_list=[email],
+            )
         return Response({'detail': 'Reply posted.'}, status=HTTP_201_CREATED)
 
 
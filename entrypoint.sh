@@ -38,4 +38,4 @@ python manage.py collectstatic --noinput --clear
 
 # Start server with gunicorn
 echo "Starting gunicorn server..."
-exec gunicorn resortproject.wsgi:application --bind 0.0.0.0:8000 --workers 3 --timeout 120
+exec gunicorn resortproject.asgi:application -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000 --workers 3 --timeout 120
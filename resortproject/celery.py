@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from kombu import Queue
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'resortproject.settings')
@@ -13,6 +14,47 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+# Queue topology: each queue gets its own worker service in compose.yaml, with
+# a pool, concurrency and prefetch suited to its tasks, so a backlog in one
+# (e.g. avatar processing) never delays another (e.g. payment emails).
+#
+# queue -> (tasks routed to it, acks_late)
+# acks_late redelivers a task whose worker died mid-run; it is off for email,
+# where the outbox already retries and a redelivery would mean a duplicate mail.
+TASK_QUEUES = {
+    'email': ([
+        'utils.email.send_email_message',
+        'utils.tasks.send_welcome_email_task',
+        'apps.notifications.tasks.dispatch_email_outbox',
+        'apps.bookings.tasks.send_booking_reminders',
+        'apps.bookings.tasks.send_booking_follow_ups',
+    ], False),
+    'payments': ([
+        'apps.bookings.tasks.reconcile_stripe_sessions',
+        'apps.bookings.tasks.process_refund_queue',
+    ], True),
+    'media': ([
+        'apps.authentication.tasks.process_avatar',
+        'apps.authentication.tasks.delete_avatar_files',
+    ], True),
+    'maintenance': ([
+        'apps.authentication.tasks.purge_expired_tokens',
+        'apps.authentication.tasks.rebuild_identifier_filter',
+        'apps.notifications.tasks.purge_sent_emails',
+    ], True),
+}
+
+app.conf.task_default_queue = 'default'
+app.conf.task_queues = [Queue('default'), *(Queue(name) for name in TASK_QUEUES)]
+app.conf.task_routes = {
+    task: {'queue': queue} for queue, (tasks, _) in TASK_QUEUES.items() for task in tasks
+}
+app.conf.task_annotations = {
+    task: {'acks_late': acks_late} for tasks, acks_late in TASK_QUEUES.values() for task in tasks
+}
+# Workers reserve one task per process unless their service says otherwise
+app.conf.worker_prefetch_multiplier = 1
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
\ No newline at end of file
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # packages
     'rest_framework',
@@ -55,6 +56,7 @@ INSTALLED_APPS = [
     'apps.contacts',
     'apps.bookings',
     'apps.cart',
+    'apps.notifications',
 
 ]
 
@@ -106,7 +108,7 @@ JAZZMIN_SETTINGS = {
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'utils.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -125,7 +127,6 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -133,6 +134,14 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compiled templates are cached per process; email templates in DIRS
+            # get their CSS inlined once, at load time (utils.email_templates)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'utils.email_templates.InlineCSSLoader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -171,6 +180,30 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# The first hasher hashes new passwords; the others only verify old hashes,
+# which are upgraded to the preferred hasher on the next successful login.
+PASSWORD_HASHER_POLICY = {
+    'argon2': 'apps.authentication.hashers.TunedArgon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+}
+PREFERRED_PASSWORD_HASHER = config('PASSWORD_HASHER', default='argon2')
+PASSWORD_HASHERS = [PASSWORD_HASHER_POLICY[PREFERRED_PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_POLICY.items() if name != PREFERRED_PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+# Argon2id cost (defaults follow the OWASP minimum: 19 MiB, 2 iterations, 1 lane)
+ARGON2_TIME_COST = config('ARGON2_TIME_COST', default=2, cast=int)
+ARGON2_MEMORY_COST = config('ARGON2_MEMORY_COST', default=19 * 1024, cast=int)
+ARGON2_PARALLELISM = config('ARGON2_PARALLELISM', default=1, cast=int)
+
+# Bounded login hashing pool (apps.authentication.passwords), one per server
+# process: with 3 gunicorn workers, up to 3 x PASSWORD_HASH_WORKERS threads hash
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=os.cpu_count() or 1, cast=int)
+PASSWORD_HASH_QUEUE_SIZE = config('PASSWORD_HASH_QUEUE_SIZE', default=32, cast=int)
+PASSWORD_HASH_QUEUE_TIMEOUT = config('PASSWORD_HASH_QUEUE_TIMEOUT', default=5, cast=float)
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -202,12 +235,25 @@ MEDIA_URL = '/media/'
 
 # email
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
+EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
 EMAIL_HOST_USER = config('EMAIL')
 EMAIL_HOST_PASSWORD = config('EMAIL_PASSWORD')
 DEFAULT_FROM_EMAIL = config('DEFAULT_EMAIL')  # Fixed this line
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=30, cast=int)
+
+# Failed sends are retried with exponential backoff, EMAIL_RETRY_DELAY seconds
+# after the first failure, until EMAIL_MAX_ATTEMPTS
+EMAIL_MAX_ATTEMPTS = config('EMAIL_MAX_ATTEMPTS', default=4, cast=int)
+EMAIL_RETRY_DELAY = config('EMAIL_RETRY_DELAY', default=30, cast=int)
+
+# Transactional outbox (apps.notifications)
+EMAIL_OUTBOX_POLL_INTERVAL = config('EMAIL_OUTBOX_POLL_INTERVAL', default=5, cast=int)
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', default=50, cast=int)
+EMAIL_OUTBOX_MAX_BATCHES = config('EMAIL_OUTBOX_MAX_BATCHES', default=20, cast=int)
+EMAIL_OUTBOX_CLAIM_TIMEOUT = config('EMAIL_OUTBOX_CLAIM_TIMEOUT', default=300, cast=int)
+EMAIL_OUTBOX_RETENTION_DAYS = config('EMAIL_OUTBOX_RETENTION_DAYS', default=30, cast=int)
 
 
 # Default primary key field type
@@ -404,11 +450,22 @@ SESSION_COOKIE_HTTPONLY = True
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.authentication.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # Token-bucket sizes per throttle_scope (utils.throttling.TokenBucketThrottle)
+    'DEFAULT_THROTTLE_RATES': {
+        'login': config('THROTTLE_RATE_LOGIN', default='10/min'),
+        'forgot_password': config('THROTTLE_RATE_FORGOT_PASSWORD', default='5/hour'),
+        'user_check': config('THROTTLE_RATE_USER_CHECK', default='60/min'),
+        'contact': config('THROTTLE_RATE_CONTACT', default='5/min'),
+        'booking_create': config('THROTTLE_RATE_BOOKING_CREATE', default='20/min'),
+    },
+    # Reverse proxies in front of gunicorn, each appending to X-Forwarded-For.
+    # 0 (no proxy) keys throttles on REMOTE_ADDR alone
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
 
 # JWT Settings
@@ -420,6 +477,27 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Cached user lookup for JWT requests (apps.authentication.authentication)
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=60 * 10, cast=int)
+AUTH_USER_CACHE_LOCAL_TTL = config('AUTH_USER_CACHE_LOCAL_TTL', default=30, cast=int)
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=2048, cast=int)
+
+# Revoked token store (apps.authentication.revocation)
+AUTH_REVOCATION_BLOOM = config('AUTH_REVOCATION_BLOOM', default=False, cast=bool)
+AUTH_REVOCATION_BLOOM_REFRESH = config('AUTH_REVOCATION_BLOOM_REFRESH', default=30, cast=int)
+AUTH_REVOCATION_BLOOM_ERROR_RATE = config('AUTH_REVOCATION_BLOOM_ERROR_RATE', default=0.001, cast=float)
+TOKEN_PURGE_BATCH_SIZE = config('TOKEN_PURGE_BATCH_SIZE', default=5000, cast=int)
+
+# Username/email availability filter (apps.authentication.availability)
+AUTH_IDENTIFIER_BLOOM = config('AUTH_IDENTIFIER_BLOOM', default=True, cast=bool)
+AUTH_IDENTIFIER_BLOOM_CAPACITY = config('AUTH_IDENTIFIER_BLOOM_CAPACITY', default=1000000, cast=int)
+AUTH_IDENTIFIER_BLOOM_ERROR_RATE = config('AUTH_IDENTIFIER_BLOOM_ERROR_RATE', default=0.001, cast=float)
+
+# Avatar processing (apps.authentication.avatars)
+AVATAR_VARIANT_SIZES = [int(size) for size in config('AVATAR_VARIANT_SIZES', default='256,64').split(',')]
+AVATAR_WEBP_QUALITY = config('AVATAR_WEBP_QUALITY', default=82, cast=int)
+AVATAR_MAX_PIXELS = config('AVATAR_MAX_PIXELS', default=40000000, cast=int)
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS').split(',')
 CORS_ALLOW_CREDENTIALS = True
@@ -441,11 +519,81 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-stripe-sessions': {
+        'task': 'apps.bookings.tasks.reconcile_stripe_sessions',
+        'schedule': timedelta(minutes=15),
+    },
+    'process-refund-queue': {
+        'task': 'apps.bookings.tasks.process_refund_queue',
+        'schedule': timedelta(minutes=1),
+    },
+    'send-booking-reminders': {
+        'task': 'apps.bookings.tasks.send_booking_reminders',
+        'schedule': timedelta(hours=1),
+    },
+    'send-booking-follow-ups': {
+        'task': 'apps.bookings.tasks.send_booking_follow_ups',
+        'schedule': timedelta(hours=1),
+    },
+    'purge-expired-tokens': {
+        'task': 'apps.authentication.tasks.purge_expired_tokens',
+        'schedule': timedelta(hours=1),
+    },
+    # Also drops identifiers that were freed or changed since the last build
+    'rebuild-identifier-bloom': {
+        'task': 'apps.authentication.tasks.rebuild_identifier_filter',
+        'schedule': timedelta(days=1),
+    },
+    'dispatch-email-outbox': {
+        'task': 'apps.notifications.tasks.dispatch_email_outbox',
+        'schedule': timedelta(seconds=EMAIL_OUTBOX_POLL_INTERVAL),
+        'options': {'expires': EMAIL_OUTBOX_POLL_INTERVAL * 2},
+    },
+    'purge-sent-emails': {
+        'task': 'apps.notifications.tasks.purge_sent_emails',
+        'schedule': timedelta(days=1),
+    },
+}
+
+# Redis (application data: pub/sub, caches, counters)
+REDIS_URL = config('REDIS_URL', default='redis://redis:6379/1')
 
 BASE_FRONTEND_URL = config('NEXT_FRONTEND_BASE_URL', default='http://localhost:3000')
 
 # Stripe Configuration
 STRIPE_API_KEY = config('STRIPE_API_KEY')
 STRIPE_SECRET = config('STRIPE_SECRET')
+STRIPE_API_BASE = config('STRIPE_API_BASE', default='')
 PAYMENT_SUCCESS_URL = BASE_FRONTEND_URL + config('PAYMENT_SUCCESS_URL', default='/payment-success')
 PAYMENT_CANCEL_URL = BASE_FRONTEND_URL + config('PAYMENT_CANCEL_URL', default='/payment-cancel')
+STRIPE_SESSION_CACHE_TTL = config('STRIPE_SESSION_CACHE_TTL', default=60 * 60 * 24, cast=int)
+STRIPE_RECONCILE_LOOKBACK_HOURS = config('STRIPE_RECONCILE_LOOKBACK_HOURS', default=48, cast=int)
+
+# Refund queue
+REFUND_BATCH_SIZE = config('REFUND_BATCH_SIZE', default=50, cast=int)
+REFUND_CONCURRENCY = config('REFUND_CONCURRENCY', default=4, cast=int)
+REFUND_MAX_ATTEMPTS = config('REFUND_MAX_ATTEMPTS', default=5, cast=int)
+REFUND_CLAIM_TIMEOUT = config('REFUND_CLAIM_TIMEOUT', default=15 * 60, cast=int)
+
+# Scheduled booking emails
+BOOKING_REMINDER_DAYS_AHEAD = config('BOOKING_REMINDER_DAYS_AHEAD', default=1, cast=int)
+BOOKING_FOLLOW_UP_LOOKBACK_DAYS = config('BOOKING_FOLLOW_UP_LOOKBACK_DAYS', default=7, cast=int)
+BOOKING_EMAIL_BATCH_SIZE = config('BOOKING_EMAIL_BATCH_SIZE', default=100, cast=int)
+BOOKING_REVIEW_URL = BASE_FRONTEND_URL + config('BOOKING_REVIEW_URL', default='/services')
+
+# Booking calendar feeds
+BOOKING_CALENDAR_PAST_DAYS = config('BOOKING_CALENDAR_PAST_DAYS', default=365, cast=int)
+BOOKING_CALENDAR_CHUNK_SIZE = config('BOOKING_CALENDAR_CHUNK_SIZE', default=500, cast=int)
+
+# Staff booking search
+BOOKING_SEARCH_MIN_LENGTH = config('BOOKING_SEARCH_MIN_LENGTH', default=3, cast=int)
+BOOKING_SEARCH_LIMIT = config('BOOKING_SEARCH_LIMIT', default=25, cast=int)
+
+# Server-sent payment events
+# Streams are short-lived: Django cannot detect a client that went away, so an
+# abandoned stream lives until the timeout. EventSource reconnects after RETRY_MS.
+BOOKING_EVENTS_STREAM_TIMEOUT = config('BOOKING_EVENTS_STREAM_TIMEOUT', default=55, cast=int)
+BOOKING_EVENTS_KEEPALIVE = config('BOOKING_EVENTS_KEEPALIVE', default=15, cast=int)
+BOOKING_EVENTS_RETRY_MS = config('BOOKING_EVENTS_RETRY_MS', default=3000, cast=int)
+BOOKING_EVENTS_MAX_STREAMS = config('BOOKING_EVENTS_MAX_STREAMS', default=5, cast=int)
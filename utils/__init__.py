@@ -1,7 +1,8 @@
 from .abstract_models import ActiveModel, TimeStampedModel
 from .email import send_email_message
 from .choices import (
-    PaymentStatusChoices, PaymentMethodChoices, BookingStatusChoices, GenderChoices, CartStatusChoices, OrderStatusChoices
+    PaymentStatusChoices, PaymentMethodChoices, BookingStatusChoices, GenderChoices, CartStatusChoices, OrderStatusChoices,
+    RefundStatusChoices, EmailOutboxStatusChoices
 )
 
 __all__ = [
@@ -13,5 +14,7 @@ __all__ = [
     "BookingStatusChoices",
     "GenderChoices",
     "CartStatusChoices",
-    "OrderStatusChoices"
+    "OrderStatusChoices",
+    "RefundStatusChoices",
+    "EmailOutboxStatusChoices"
 ]
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""
+Running slow sync views off the ASGI request thread
+
+Under ASGI, Django runs every sync view on one thread-sensitive executor per
+process, so a view that blocks (e.g. on password hashing) serializes all sync
+views of that worker. ``off_request_thread`` turns such a view into an async
+one that runs it on the event loop's thread pool instead, where any number of
+requests can be in flight.
+
+The wrapped view manages its own database connection, the way Django does
+per request, because it no longer runs on the thread Django cleans up.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _run_view(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()  # DRF responses are rendered here instead of on the request thread
+        return response
+    finally:
+        close_old_connections()
+
+
+def off_request_thread(view):
+    """Wrap a sync view function (e.g. ``SomeAPIView.as_view()``) as an async view"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await sync_to_async(_run_view, thread_sensitive=False)(view, request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,139 @@
+"""
+Bloom filters
+
+A compact set that answers "definitely not present" or "possibly present".
+Used to skip remote lookups for keys that were never added.
+
+``BloomFilter`` lives in process memory; ``RedisBloomFilter`` keeps the same
+bit layout in a Redis bitmap so every process shares one filter.
+"""
+import hashlib
+import math
+
+
+def bloom_parameters(capacity, error_rate):
+    """
+    Bit count and hash count for ``capacity`` items at ``error_rate``
+
+    Returns:
+        tuple: (size, hash_count)
+    """
+    capacity = max(capacity, 1)
+    size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+    hash_count = max(int(round(size / capacity * math.log(2))), 1)
+    return size, hash_count
+
+
+def bloom_positions(item, size, hash_count):
+    # Double hashing: k positions from two 64-bit halves of one digest
+    digest = hashlib.blake2b(str(item).encode(), digest_size=16).digest()
+    first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big')
+    return [(first + i * second) % size for i in range(hash_count)]
+
+
+class BloomFilter:
+    """
+    Bloom filter sized for ``capacity`` items at the given false-positive rate
+
+    Args:
+        capacity (int): Expected number of items
+        error_rate (float): Acceptable false-positive probability
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size, self.hash_count = bloom_parameters(capacity, error_rate)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    @classmethod
+    def from_items(cls, items, error_rate=0.01):
+        items = list(items)
+        bloom = cls(len(items), error_rate)
+        for item in items:
+            bloom.add(item)
+        return bloom
+
+    def _positions(self, item):
+        return bloom_positions(item, self.size, self.hash_count)
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RedisBloomFilter:
+    """
+    Bloom filter stored as a Redis bitmap
+
+    The key embeds the filter dimensions, so changing ``capacity`` or
+    ``error_rate`` points readers at a new, not yet built key instead of
+    reading an old bitmap with the wrong hash positions. Until ``rebuild``
+    has populated the key, ``might_contain`` returns None ("unknown").
+
+    Args:
+        client: redis-py client
+        prefix (str): Key prefix
+        capacity (int): Expected number of items
+        error_rate (float): Acceptable false-positive probability
+    """
+
+    def __init__(self, client, prefix, capacity, error_rate=0.01):
+        self.client = client
+        self.size, self.hash_count = bloom_parameters(capacity, error_rate)
+        self.key = f'{prefix}:{self.size}:{self.hash_count}'
+
+    def _set_bits(self, pipe, key, items):
+        for item in items:
+            for position in bloom_positions(item, self.size, self.hash_count):
+                pipe.setbit(key, position, 1)
+
+    def add(self, *items):
+        """Add items, only if the filter has been built"""
+        if not items or not self.client.exists(self.key):
+            return
+        pipe = self.client.pipeline(transaction=False)
+        self._set_bits(pipe, self.key, items)
+        pipe.execute()
+
+    def might_contain(self, *items):
+        """
+        Check items in one round trip
+
+        Returns:
+            list or None: One bool per item, or None if the filter is not built
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.exists(self.key)
+        for item in items:
+            for position in bloom_positions(item, self.size, self.hash_count):
+                pipe.getbit(self.key, position)
+        results = pipe.execute()
+        if not results[0]:
+            return None
+        bits = results[1:]
+        return [all(bits[i * self.hash_count:(i + 1) * self.hash_count]) for i in range(len(items))]
+
+    def rebuild(self, batches):
+        """
+        Build the filter from scratch and swap it in atomically
+
+        Args:
+            batches: Iterable of item lists, each written in one pipeline
+
+        Returns:
+            int: Number of items added
+        """
+        building_key = f'{self.key}:building'
+        self.client.delete(building_key)
+        # Allocate the full bitmap up front so the swapped-in key always exists
+        self.client.setbit(building_key, self.size - 1, 0)
+        count = 0
+        for batch in batches:
+            pipe = self.client.pipeline(transaction=False)
+            self._set_bits(pipe, building_key, batch)
+            pipe.execute()
+            count += len(batch)
+        self.client.rename(building_key, self.key)
+        return count
@@ -32,6 +32,18 @@ class CartStatusChoices(models.TextChoices):
     CLOSED = 'closed', 'Closed'
     ABANDONED = 'abandoned', 'Abandoned'
 
+class RefundStatusChoices(models.TextChoices):
+    QUEUED = 'queued', 'Queued'
+    PROCESSING = 'processing', 'Processing'
+    SUCCEEDED = 'succeeded', 'Succeeded'
+    FAILED = 'failed', 'Failed'
+
+class EmailOutboxStatusChoices(models.TextChoices):
+    PENDING = 'pending', 'Pending'
+    SENDING = 'sending', 'Sending'
+    SENT = 'sent', 'Sent'
+    FAILED = 'failed', 'Failed'
+
 class OrderStatusChoices(models.TextChoices):
     PENDING = 'pending', 'Pending'
     PROCESSING = 'processing', 'Processing'
@@ -0,0 +1,85 @@
+"""
+Conditional GET helpers
+
+ETag functions for Django's ``etag``/``condition`` decorators. Each one
+derives a weak validator from something far cheaper than the response body,
+either one aggregate query over the rows behind the response (latest
+``updated_at`` plus a row count, so deletions change it too) or a version
+counter in Redis that writers already bump, such as the user snapshot
+version. An ``If-None-Match`` hit is answered with 304 before the view
+queries or serializes anything.
+
+Use them on DRF views with ``method_decorator`` on the handler, so
+authentication has already run and ``request.user`` is available::
+
+    @method_decorator(etag(profile_etag))
+    def get(self, request): ...
+"""
+import hashlib
+import logging
+import time
+
+from django.db.models import Count, Max
+from redis.exceptions import RedisError
+
+from utils.redis_client import get_redis
+
+logger = logging.getLogger('server')
+
+
+def weak_etag(*parts):
+    """Weak ETag over the string forms of ``parts``"""
+    digest = hashlib.blake2b(':'.join(str(part) for part in parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def request_etag(request, *parts):
+    """
+    Weak ETag for the current user and query string
+
+    Query parameters (filters, pagination cursors) select different bodies,
+    so they are always part of the validator.
+    """
+    return weak_etag(request.user.pk, request.path, request.GET.urlencode(), *parts)
+
+
+def queryset_state(queryset, *related):
+    """
+    Latest change and size of ``queryset`` and of related rows, in one query
+
+    Args:
+        queryset: Rows the response is built from
+        *related: Lookups to related models whose ``updated_at`` also shows up
+            in the response, e.g. ``'order_items'``
+
+    Returns:
+        tuple: Aggregated values, usable as ETag parts
+    """
+    aggregates = {'count': Count('pk', distinct=True), 'last': Max('updated_at')}
+    for index, lookup in enumerate(related):
+        aggregates[f'related_{index}'] = Max(f'{lookup}__updated_at')
+        aggregates[f'related_count_{index}'] = Count(lookup, distinct=True)
+    state = queryset.order_by().aggregate(**aggregates)
+    return tuple(state[key] for key in aggregates)
+
+
+def get_version(key):
+    """
+    Current value of a version counter, seeded with the clock if missing
+
+    Seeding with the time instead of starting at 0 keeps a counter that was
+    lost (e.g. Redis flushed) from repeating values clients still hold.
+
+    Returns:
+        str or None: Version, or None if Redis is unreachable
+    """
+    try:
+        client = get_redis()
+        version = client.get(key)
+        if version is None:
+            client.set(key, time.time_ns() // 1000, nx=True)
+            version = client.get(key)
+        return version
+    except RedisError as e:
+        logger.warning(f"Failed to read ETag version {key}: {str(e)}")
+        return None
@@ -1,19 +1,73 @@
 
 import logging
+import time
 email_logger = logging.getLogger('system_logs')
 
 from celery import shared_task
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
 from django.utils.html import strip_tags
 
+from utils.metrics import increment, observe
+
+
+def get_email_templates(template_name):
+    """
+    Compiled HTML template and its plain-text counterpart
+
+    The text template sits next to the HTML one with a .txt extension
+    (welcome.html -> welcome.txt). Both lookups, including a missing text
+    template, are served from the cached loader after the first call.
+
+    Returns:
+        tuple: (html_template, text_template or None)
+    """
+    html_template = get_template(template_name)
+    try:
+        text_template = get_template(template_name.rsplit('.', 1)[0] + '.txt')
+    except TemplateDoesNotExist:
+        text_template = None
+    return html_template, text_template
+
+
+def render_email_bodies(templates, context):
+    """
+    Render (html, text) bodies from ``get_email_templates`` output
+
+    Falls back to stripping tags from the HTML when there is no text template.
+    """
+    html_template, text_template = templates
+    html_content = html_template.render(context)
+    text_content = text_template.render(context) if text_template else strip_tags(html_content)
+    return html_content, text_content
+
+
+def render_email_message(subject, template_name, context, recipient_list, from_email=None):
+    """Build an HTML email with a plain-text alternative from a template"""
+    if from_email is None:
+        from_email = settings.DEFAULT_FROM_EMAIL
+    html_content, text_content = render_email_bodies(get_email_templates(template_name), context)
+    email_msg = EmailMultiAlternatives(
+        subject=subject,
+        body=text_content,
+        from_email=from_email,
+        to=recipient_list
+    )
+    email_msg.attach_alternative(html_content, "text/html")
+    return email_msg
+
 
 @shared_task(bind=True, max_retries=3)
 def send_email_message(self, subject, template_name, context, recipient_list, from_email=None):
     """
     Utility function to send HTML emails with template
 
+    Sends right away over its own connection. Application emails go through
+    the outbox (apps.notifications), which sends them in batches with
+    ``send_email_batch`` and retries failures.
+
     Args:
         subject (str): Email subject
         template_name (str): Template file name (e.g., 'welcome.html')
@@ -22,23 +76,87 @@ def send_email_message(self, subject, template_name, context, recipient_list, fr
         from_email (str): Sender email (optional)
 
     Returns:
-        bool: True if email sent successfully, False otherwise
+        bool: True if email sent successfully
     """
     try:
-        if from_email is None:
-            from_email = settings.DEFAULT_FROM_EMAIL
-        html_content = render_to_string(template_name, context)
-        text_content = strip_tags(html_content)
+        message = render_email_message(subject, template_name, context, recipient_list, from_email)
+        started = time.perf_counter()
+        message.send()
+        observe('email_smtp_send_seconds', time.perf_counter() - started, mode='direct')
+        email_logger.info(f"HTML email sent successfully to {recipient_list} | subject={subject}")
+        return True
+    except Exception as e:
+        email_logger.error(f"Failed to send HTML email: {str(e)}")
+        raise
+
+
+def build_email_messages(subject, template_name, recipients, from_email=None):
+    """
+    Render one template for many recipients
+
+    The templates are looked up once per call; only the context changes
+    between messages.
+
+    Args:
+        subject (str): Email subject, formatted with each recipient's context
+        template_name (str): Template file name (e.g., 'booking-reminder.html')
+        recipients (list): (email, context) pairs
+        from_email (str): Sender email (optional)
+
+    Returns:
+        list: EmailMultiAlternatives messages, in the order of recipients
+    """
+    if from_email is None:
+        from_email = settings.DEFAULT_FROM_EMAIL
+    templates = get_email_templates(template_name)
+    messages = []
+    for email, context in recipients:
+        html_content, text_content = render_email_bodies(templates, context)
         email_msg = EmailMultiAlternatives(
-            subject=subject,
+            subject=subject.format(**context),
             body=text_content,
             from_email=from_email,
-            to=recipient_list
+            to=[email]
         )
         email_msg.attach_alternative(html_content, "text/html")
-        email_msg.send()
-        email_logger.info(f"HTML email sent successfully to {recipient_list} | subject={subject}")
-        return True
+        messages.append(email_msg)
+    return messages
+
+
+def send_email_batch(messages):
+    """
+    Send messages over a single SMTP connection
+
+    Failures are isolated per message, so one rejected address does not stop
+    the rest of the batch.
+
+    Args:
+        messages (list): EmailMessage instances
+
+    Returns:
+        list: One bool per message, True if it was sent
+    """
+    connection = get_connection()
+    started = time.perf_counter()
+    try:
+        connection.open()
     except Exception as e:
-        email_logger.error(f"Failed to send HTML email: {str(e)}")
-        raise
\ No newline at end of file
+        email_logger.error(f"Failed to open email connection: {str(e)}")
+        increment('email_smtp_connect_failures_total')
+        return [False] * len(messages)
+    observe('email_smtp_connect_seconds', time.perf_counter() - started)
+
+    results = []
+    try:
+        for message in messages:
+            started = time.perf_counter()
+            try:
+                results.append(bool(connection.send_messages([message])))
+            except Exception as e:
+                email_logger.error(f"Failed to send HTML email to {message.to}: {str(e)}")
+                results.append(False)
+            observe('email_smtp_send_seconds', time.perf_counter() - started, mode='batch')
+    finally:
+        connection.close()
+    email_logger.info(f"Email batch sent: {sum(results)}/{len(messages)} delivered")
+    return results
@@ -0,0 +1,44 @@
+"""
+Email template loading
+
+``InlineCSSLoader`` moves the rules of ``<style>`` blocks into ``style``
+attributes while the template source is loaded. Behind Django's cached
+loader that happens once per worker process, so rendering a message is
+just a compiled template render. @media rules stay in a ``<style>`` block
+since they cannot be inlined.
+
+Template tags are swapped for HTML comments during inlining: the HTML
+parser moves stray text out of tables, which would otherwise relocate
+``{% if %}`` blocks wrapping table rows.
+"""
+import re
+
+import css_inline
+from django.template.loaders.filesystem import Loader as FilesystemLoader
+
+TEMPLATE_TAG_RE = re.compile(r'{%.*?%}|{#.*?#}', re.DOTALL)
+PLACEHOLDER_RE = re.compile(r'<!--tpl:(\d+)-->')
+
+inliner = css_inline.CSSInliner(keep_at_rules=True, load_remote_stylesheets=False)
+
+
+def inline_css(source):
+    """Inline the ``<style>`` rules of an HTML template source"""
+    tags = []
+
+    def protect(match):
+        tags.append(match.group(0))
+        return f'<!--tpl:{len(tags) - 1}-->'
+
+    inlined = inliner.inline(TEMPLATE_TAG_RE.sub(protect, source))
+    return PLACEHOLDER_RE.sub(lambda match: tags[int(match.group(1))], inlined)
+
+
+class InlineCSSLoader(FilesystemLoader):
+    """Filesystem loader that inlines CSS of HTML templates with a ``<style>`` block"""
+
+    def get_contents(self, origin):
+        contents = super().get_contents(origin)
+        if origin.name.endswith('.html') and '<style' in contents:
+            return inline_css(contents)
+        return contents
@@ -0,0 +1,74 @@
+"""
+Lightweight application metrics stored in Redis
+
+Counters and summaries are shared by every web and worker process through
+Redis hashes and exposed in Prometheus text format by the index app.
+"""
+import logging
+
+from redis.exceptions import RedisError
+
+from utils.redis_client import get_redis
+
+metrics_logger = logging.getLogger('server')
+
+COUNTERS_KEY = 'metrics:counters'
+SUMMARIES_KEY = 'metrics:summaries'
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    rendered = ','.join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f'{name}{{{rendered}}}'
+
+
+def increment(name, value=1, **labels):
+    """
+    Increment a counter
+
+    Args:
+        name (str): Metric name, e.g. 'stripe_session_cache_hits_total'
+        value (int): Amount to add
+        **labels: Optional label values
+    """
+    try:
+        get_redis().hincrby(COUNTERS_KEY, _series(name, labels), value)
+    except RedisError as e:
+        metrics_logger.warning(f"Failed to record metric {name}: {str(e)}")
+
+
+def observe(name, value, **labels):
+    """
+    Record one observation (e.g. a duration in seconds) in a summary
+
+    The summary keeps a running sum and count, which is enough to derive
+    averages and rates on the monitoring side.
+    """
+    series = _series(name, labels)
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hincrbyfloat(SUMMARIES_KEY, f'{series}|sum', value)
+        pipe.hincrby(SUMMARIES_KEY, f'{series}|count', 1)
+        pipe.execute()
+    except RedisError as e:
+        metrics_logger.warning(f"Failed to record metric {name}: {str(e)}")
+
+
+def _with_suffix(series, suffix):
+    if '{' in series:
+        name, labels = series.split('{', 1)
+        return f'{name}{suffix}{{{labels}'
+    return f'{series}{suffix}'
+
+
+def render_prometheus():
+    """Render all recorded metrics in the Prometheus text exposition format"""
+    client = get_redis()
+    lines = []
+    for series, value in sorted(client.hgetall(COUNTERS_KEY).items()):
+        lines.append(f'{series} {value}')
+    for field, value in sorted(client.hgetall(SUMMARIES_KEY).items()):
+        series, part = field.rsplit('|', 1)
+        lines.append(f'{_with_suffix(series, "_" + part)} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,104 @@
+"""
+Sequence-backed booking and order numbers
+
+Numbers are drawn from a Postgres sequence and encoded as fixed-width
+Crockford base32 followed by a Luhn mod 32 check character, e.g.
+``BK-00001Z4X``. Fixed width keeps string order equal to sequence order, so
+new numbers always land at the right-hand edge of the unique index and can
+never collide.
+
+Sequential numbers are guessable, so they are identifiers only; endpoints that
+take one from anonymous clients also check an access token
+(apps.bookings.access). Numbers issued before this scheme
+(``BK-20260115-1A2B3C4D``) are kept as they are and sort after every new one;
+that is accepted, lists are ordered by ``created_at``, never by number.
+"""
+import re
+
+from django.db import connection
+
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+NUMBER_WIDTH = 7  # 32 ** 7, about 34 billion numbers per prefix
+# PREFIX-YYYYMMDD-<8 hex digits of a uuid4>, issued before the sequence
+LEGACY_NUMBER_RE = re.compile(r'[A-Z]+-\d{8}-[0-9A-F]{8}')
+
+
+def encode_base32(value, width=NUMBER_WIDTH):
+    """Encode a non-negative integer as zero-padded Crockford base32"""
+    if value < 0 or value >= len(CROCKFORD_ALPHABET) ** width:
+        raise ValueError(f"{value} does not fit in {width} base32 characters")
+    chars = []
+    for _ in range(width):
+        value, remainder = divmod(value, len(CROCKFORD_ALPHABET))
+        chars.append(CROCKFORD_ALPHABET[remainder])
+    return ''.join(reversed(chars))
+
+
+def check_character(payload):
+    """Luhn mod 32 check character for a Crockford base32 payload"""
+    base = len(CROCKFORD_ALPHABET)
+    factor, total = 2, 0
+    for char in reversed(payload):
+        addend = factor * CROCKFORD_ALPHABET.index(char)
+        total += addend // base + addend % base
+        factor = 1 if factor == 2 else 2
+    return CROCKFORD_ALPHABET[(base - total % base) % base]
+
+
+def is_valid_number(number):
+    """
+    Whether a generated number carries a correct check character
+
+    Args:
+        number (str): Full number including its prefix, e.g. 'BK-00001Z4X'
+    """
+    encoded = number.rpartition('-')[2].upper()
+    if len(encoded) != NUMBER_WIDTH + 1 or any(char not in CROCKFORD_ALPHABET for char in encoded):
+        return False
+    return check_character(encoded[:-1]) == encoded[-1]
+
+
+def is_known_number(number):
+    """Whether ``number`` is a checked number or one in the legacy format"""
+    return is_valid_number(number) or LEGACY_NUMBER_RE.fullmatch(number) is not None
+
+
+class NumberConverter:
+    """
+    URL converter that only matches well-formed numbers
+
+    A mistyped or made-up number fails the check character and gets a 404
+    from the resolver, before any view or query runs. Subclasses set
+    ``regex`` to the number's prefix.
+    """
+    regex = '[A-Z]+-[0-9A-Za-z-]+'
+
+    def to_python(self, value):
+        if not is_known_number(value):
+            raise ValueError(f"Malformed number: {value}")
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+class BookingNumberConverter(NumberConverter):
+    regex = 'BK-[0-9A-Za-z-]+'
+
+
+def next_number(prefix, sequence):
+    """
+    Draw the next value from ``sequence`` and format it as a checked number
+
+    Args:
+        prefix (str): Human readable prefix, e.g. 'BK'
+        sequence (str): Name of the Postgres sequence to draw from
+
+    Returns:
+        str: Number such as 'BK-00001Z4X'
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT nextval(%s)', [sequence])
+        value = cursor.fetchone()[0]
+    payload = encode_base32(value)
+    return f'{prefix}-{payload}{check_character(payload)}'
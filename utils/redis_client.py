@@ -0,0 +1,30 @@
+import redis
+from django.conf import settings
+
+_client = None
+
+
+def get_redis():
+    """
+    Shared synchronous Redis client for application data
+
+    The client wraps a connection pool, so one instance per process is enough.
+
+    Returns:
+        redis.Redis: client bound to settings.REDIS_URL
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+
+def get_async_redis():
+    """
+    Create an asyncio Redis client for settings.REDIS_URL
+
+    A new client is returned on every call because asyncio connections are bound
+    to the event loop that opened them. Callers must close it with ``aclose()``.
+    """
+    from redis import asyncio as aioredis
+    return aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
@@ -0,0 +1,68 @@
+"""
+Celery task metrics
+
+Signal handlers that record, per task name:
+
+- ``celery_task_queue_wait_seconds``: publish (or ETA) to start of execution,
+  from a ``published_at`` header stamped by the publisher
+- ``celery_task_runtime_seconds``: execution time, labelled with the final state
+- ``celery_task_retries_total``: retries requested by the task
+
+Everything goes through ``utils.metrics``, so the numbers show up on the
+existing metrics endpoint next to the web ones. The handlers are connected
+by ``IndexConfig.ready`` in web and worker processes alike, and cost one Redis
+round trip at start and one at the end of each task.
+"""
+import time
+from datetime import datetime
+
+from celery.signals import before_task_publish, task_postrun, task_prerun, task_retry
+
+from utils.metrics import increment, observe
+
+PUBLISHED_AT_HEADER = 'published_at'
+
+# task_id -> perf_counter() at task_prerun; dropped again at task_postrun
+_started = {}
+
+
+def _not_before(request):
+    """Earliest time the task was meant to run, as a Unix timestamp"""
+    published_at = getattr(request, PUBLISHED_AT_HEADER, None) or (request.headers or {}).get(PUBLISHED_AT_HEADER)
+    if published_at is None:
+        return None
+    eta = request.eta
+    if eta:
+        # Countdown/ETA tasks are held back on purpose; only time past the ETA is queueing
+        eta = datetime.fromisoformat(eta).timestamp() if isinstance(eta, str) else eta.timestamp()
+        return max(published_at, eta)
+    return published_at
+
+
+@before_task_publish.connect
+def stamp_published_at(sender=None, headers=None, **kwargs):
+    if headers is not None:
+        # Overwritten, not defaulted: a retry is published again with the old headers
+        headers[PUBLISHED_AT_HEADER] = time.time()
+
+
+@task_prerun.connect
+def record_queue_wait(sender=None, task_id=None, task=None, **kwargs):
+    not_before = _not_before(task.request)
+    # Eager calls and tasks published without the header have nothing to measure
+    if not_before is not None:
+        # Clamped: publisher and worker clocks can disagree slightly
+        observe('celery_task_queue_wait_seconds', max(time.time() - not_before, 0.0), task=task.name)
+    _started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def record_runtime(sender=None, task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is not None:
+        observe('celery_task_runtime_seconds', time.perf_counter() - started, task=task.name, state=state or 'UNKNOWN')
+
+
+@task_retry.connect
+def record_retry(sender=None, **kwargs):
+    increment('celery_task_retries_total', task=sender.name)
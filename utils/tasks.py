@@ -12,7 +12,7 @@ def test_celery_task(x, y):
     return result
 
 @shared_task
-def send_welcome_email_task(user_id, password):
+def send_welcome_email_task(user_id):
     """
     Alternative task to send welcome email - more modular approach
     """
@@ -20,16 +20,15 @@ def send_welcome_email_task(user_id, password):
     celery_logger = logging.getLogger('system_logs')
     try:
         user = User.objects.get(id=user_id)
-        from utils.email import send_email_message
-        send_email_message.delay(
-            subject="Welcome to Azure Horizon | Login Details",
+        from apps.notifications.outbox import enqueue_email
+        enqueue_email(
+            subject="Welcome to Azure Horizon",
             template_name="welcome.html",
             context={
                 "user_id": user.id,
                 "username": user.username,
                 "full_name": user.full_name,
-                "email": user.email,
-                "password": password
+                "email": user.email
             },
             recipient_list=[user.email]
         )
@@ -0,0 +1,150 @@
+"""
+Redis token-bucket throttling for DRF views
+
+Each request takes one token from a bucket keyed by client IP and, when the
+request names an account (username/email), from a second bucket keyed by
+that identifier. Both buckets are checked and drained in one atomic Lua call.
+Buckets hold ``num`` tokens and refill at ``num`` per period, using DRF's
+DEFAULT_THROTTLE_RATES format ("10/min") under the view's ``throttle_scope``.
+
+The client IP comes from DRF's NUM_PROXIES setting. Behind N reverse proxies
+it is the N-th address from the right of X-Forwarded-For, the one the
+outermost trusted proxy appended; anything further left is client supplied.
+With no proxies (the default) it is REMOTE_ADDR and the header is ignored, as
+any client can set it. Without NUM_PROXIES behind a proxy, every client would
+share the proxy's bucket.
+"""
+import hashlib
+import logging
+import time
+
+from redis.exceptions import RedisError
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from utils.metrics import increment
+from utils.redis_client import get_redis
+
+throttle_logger = logging.getLogger('server')
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+# KEYS: bucket keys; ARGV: capacity, refill rate (tokens/s), now (s)
+# Returns {index of the first empty bucket or 0, seconds until a token is available}
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local ttl = math.ceil(capacity / refill) + 1
+local levels = {}
+local blocked = 0
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * refill)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / refill)
+        if blocked == 0 then blocked = i end
+    end
+end
+for i, key in ipairs(KEYS) do
+    local tokens = levels[i]
+    if blocked == 0 then tokens = tokens - 1 end
+    redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', key, ttl)
+end
+return {blocked, tostring(wait)}
+"""
+
+_script = None
+
+
+def token_bucket_script():
+    global _script
+    if _script is None:
+        _script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+    return _script
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60)"""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token-bucket throttle keyed by IP and by the account identifier in the request
+
+    View attributes:
+        throttle_scope (str): Key into DEFAULT_THROTTLE_RATES; views without a rate are not throttled
+        throttle_identifier_fields (tuple): Request fields naming the account, default ('username', 'email')
+        throttle_methods (tuple): Only throttle these HTTP methods (optional)
+    """
+    default_identifier_fields = ('username', 'email')
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_ident(self, request):
+        if not api_settings.NUM_PROXIES:
+            return request.META.get('REMOTE_ADDR')
+        return super().get_ident(request)
+
+    def get_identifier(self, request, view):
+        fields = getattr(view, 'throttle_identifier_fields', self.default_identifier_fields)
+        source = request.query_params if request.method in ('GET', 'HEAD') else request.data
+        for field in fields:
+            value = source.get(field) if hasattr(source, 'get') else None
+            if isinstance(value, str) and value.strip():
+                return hashlib.sha1(value.strip().lower().encode()).hexdigest()
+        return None
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        methods = getattr(view, 'throttle_methods', None)
+        if rate is None or (methods and request.method not in methods):
+            return True
+
+        capacity, period = parse_rate(rate)
+        keys = [f'throttle:{scope}:ip:{self.get_ident(request)}']
+        identifier = self.get_identifier(request, view)
+        if identifier:
+            keys.append(f'throttle:{scope}:id:{identifier}')
+
+        try:
+            blocked, wait = token_bucket_script()(keys=keys, args=[capacity, capacity / period, time.time()])
+        except RedisError as e:
+            throttle_logger.warning(f"Throttle check failed for scope={scope}: {str(e)}")
+            return True
+        if not blocked:
+            return True
+
+        self.wait_seconds = float(wait)
+        increment('throttle_rejections_total', scope=scope, key='ip' if blocked == 1 else 'identifier')
+        return False
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class EarlyThrottleMixin:
+    """
+    Run throttles before authentication and permission checks
+
+    A throttled request is refused before anything else about it is resolved,
+    so it never reaches the database.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        self.check_throttles(request)
+        self._throttles_checked = True
+        super().initial(request, *args, **kwargs)
+
+    def check_throttles(self, request):
+        if not getattr(self, '_throttles_checked', False):
+            super().check_throttles(request)